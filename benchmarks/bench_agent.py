@@ -0,0 +1,76 @@
+# Repeated CLI scans of one switch over fresh SSH connections and over warm sessions from the agent
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from bench_scan import SIM_PASSWORD, SIM_USERNAME, SSH_CONNECT, load_cli, run_cli
+from ios_simulator import IOSSimulator, SyntheticSwitch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from patchfinder_core.agent import SessionPool, agent_request, serve_agent
+
+
+def start_agent(simulator):
+    """Runs the agent on a temporary socket, connecting to the simulator's port"""
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="patchfinder-agent-"), "agent.sock")
+    pool = SessionPool(connect=functools.partial(SSH_CONNECT, port=simulator.port, device_type="cisco_ios"))
+    ready = threading.Event()
+    threading.Thread(target=serve_agent, args=(socket_path, pool, ready.set), daemon=True).start()
+    ready.wait()
+    return socket_path
+
+
+def time_scans(patchfinder, simulator, collection, runs):
+    """Scans the simulator once per run, as separate CLI invocations would, and returns each run's time"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_cli(patchfinder, simulator, collection, incremental=False)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Scan latency with and without the session agent")
+    arg_parser.add_argument("--ports", type=int, default=48)
+    arg_parser.add_argument("--collection", default="bulk")
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per command (default: 0.02)")
+    arg_parser.add_argument("--runs", type=int, default=10, help="Scans per case (default: 10)")
+    args = arg_parser.parse_args()
+
+    patchfinder = load_cli()
+    patchfinder.scan_timings = patchfinder.ScanTimings()
+
+    outputs = SyntheticSwitch(args.ports).outputs()
+    with IOSSimulator(outputs, username=SIM_USERNAME, password=SIM_PASSWORD, latency=args.latency) as simulator:
+        direct = time_scans(patchfinder, simulator, args.collection, args.runs)
+
+        patchfinder.agent_socket = start_agent(simulator)
+        commands_before = simulator.commands_served
+        agent = time_scans(patchfinder, simulator, args.collection, args.runs)
+        reused = patchfinder.scan_timings.counts.get("agent sessions reused", 0)
+        status = agent_request(patchfinder.agent_socket, "status")
+        agent_request(patchfinder.agent_socket, "stop")
+
+    for name, timings in (("direct", direct), ("agent", agent)):
+        print(f"{name:<7} first {timings[0]:>7.3f}s   median {statistics.median(timings):>7.3f}s   "
+              f"min {min(timings):>7.3f}s")
+    print(f"{reused} of {args.runs} agent scans reused a warm session, {len(status['idle'])} left idle, "
+          f"{(simulator.commands_served - commands_before) // args.runs} commands/scan")
+
+    if reused != args.runs - 1 or status["lent"] != 0:
+        print("[-] The agent did not hand back and reuse its session")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Authenticated request throughput for the web app, with and without the user cache
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_ROOT = os.path.join(REPO_ROOT, "webapp", "backend")
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark"
+
+
+def load_app(users_path):
+    """Imports the FastAPI app with its users table in a temporary database"""
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, BACKEND_ROOT)
+    from sqlalchemy import create_engine
+    from fastapi.testclient import TestClient
+    from app import auth, main as backend, models
+
+    engine = create_engine(f"sqlite:///{users_path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    models.SessionLocal.configure(bind=engine)
+
+    with models.SessionLocal() as db:
+        db.add(models.User(username=USERNAME, hashed_password=auth.get_password_hash(PASSWORD)))
+        db.commit()
+
+    return auth, TestClient(backend.app)
+
+
+def requests_per_second(function, duration):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        function()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def resolve(coroutine):
+    """Runs a coroutine that never suspends, without event loop overhead"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("Coroutine suspended")
+
+
+def check_revocation(auth, client, token):
+    """Logging out must reject the token straight away, and deleting a user must reject their other tokens"""
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/logout", headers=headers).status_code == 200
+    assert client.get("/api/jobs/missing", headers=headers).status_code == 401
+
+    other = client.post("/api/token", data={"username": USERNAME, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {other}"}
+    assert client.get("/api/jobs/missing", headers=headers).status_code == 404
+
+    with auth.SessionLocal() as db:
+        db.query(auth.User).filter(auth.User.username == USERNAME).delete()
+        db.commit()
+    os.utime(auth.user_cache.path, ns=(0, time.time_ns() + 1))
+    assert client.get("/api/jobs/missing", headers=headers).status_code == 401
+
+
+def check_add_user():
+    """add_user.py must run from webapp/backend/app as documented, where only that directory is on the path"""
+    app_copy = tempfile.mkdtemp(prefix="patchfinder-add-user-")
+    for name in os.listdir(os.path.join(BACKEND_ROOT, "app")):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(BACKEND_ROOT, "app", name), app_copy)
+    environment = {name: value for name, value in os.environ.items()
+                   if name not in ("PYTHONPATH", "RUNNING_IN_DOCKER")}
+
+    def add_user(*arguments, answers=""):
+        # A new session has no terminal, so getpass reads the password from stdin
+        return subprocess.run([sys.executable, "add_user.py", *arguments], cwd=app_copy, env=environment,
+                              input=answers, capture_output=True, text=True, start_new_session=True)
+
+    added = add_user(answers=f"{USERNAME}\n{PASSWORD}\n{PASSWORD}\n")
+    assert added.returncode == 0 and "added successfully" in added.stdout, added.stderr
+    with sqlite3.connect(os.path.join(app_copy, "users.db")) as db:
+        assert db.execute("SELECT COUNT(*) FROM users WHERE username = ?", (USERNAME,)).fetchone()[0] == 1
+
+    deleted = add_user("--delete", USERNAME)
+    assert deleted.returncode == 0 and "deleted" in deleted.stdout, deleted.stderr
+    shutil.rmtree(app_copy)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Authenticated request throughput")
+    arg_parser.add_argument("--duration", type=float, default=3, help="Seconds per measurement (default: 3)")
+    args = arg_parser.parse_args()
+
+    users_path = os.path.join(tempfile.mkdtemp(prefix="patchfinder-auth-"), "users.db")
+    auth, client = load_app(users_path)
+
+    token = client.post("/api/token", data={"username": USERNAME, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def authenticate():
+        return await auth.get_current_user(await auth.get_token_claims(token))
+
+    # A TTL of 0 loads the user from SQLite on every request, as before the cache existed
+    for name, ttl in (("uncached", 0), ("cached", auth.USER_CACHE_TTL)):
+        auth.user_cache = auth.UserCache(ttl=ttl, path=users_path)
+        # 404 for an unknown job: everything but authentication is a dictionary lookup
+        http = requests_per_second(lambda: client.get("/api/jobs/missing", headers=headers), args.duration)
+        dependency = requests_per_second(lambda: resolve(authenticate()), args.duration)
+        print(f"{name:<9} {http:>8.0f} requests/s   {dependency:>8.0f} authentications/s")
+
+    check_revocation(auth, client, token)
+    print("Logout and user deletion reject tokens immediately")
+
+    check_add_user()
+    print("add_user.py adds and deletes users from webapp/backend/app")
+
+
+if __name__ == "__main__":
+    main()
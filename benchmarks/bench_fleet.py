@@ -0,0 +1,78 @@
+# Query latency benchmarks for the fleet free-port index shared by patchfinder.py and the web app
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SITES = ["hq", "north", "south", "warehouse"]
+VLANS = ["1", "10", "20", "30", "99"]
+
+# (description, FleetIndex.query arguments), as 'patchfinder.py find' and /api/fleet/ports pass them
+QUERIES = [
+    ("any", {}),
+    ("site+vlan", {"site": "north", "vlan": "20"}),
+    ("vlan+poe", {"vlan": "20", "min_poe_free_watts": 100.0}),
+    ("site+vlan+poe+idle", {"site": "hq", "vlan": "20", "min_poe_free_watts": 50.0, "min_idle_days": 30}),
+]
+
+
+def synthetic_switch(rng, members, ports_per_member):
+    """Builds the not-connect ports and PoE budgets of one scanned stack"""
+    from patchfinder_core import PoeBudget, PortRecord
+
+    ports = []
+    for member in range(1, members + 1):
+        for port_no in range(1, ports_per_member + 1):
+            if rng.random() < 0.3:
+                last_input = rng.choice(["never", "00:00:05", f"{rng.randint(1, 52)}w{rng.randint(0, 6)}d"])
+                ports.append(PortRecord(f"Gi{member}/0/{port_no}", f"desk-{port_no}", rng.choice(VLANS), last_input,
+                                        None, None, round(rng.random() * 10, 2)))
+
+    poe = [PoeBudget(str(member), "370.0", "0.0", f"{rng.uniform(0, 370):.1f}") for member in range(1, members + 1)]
+    return ports, poe
+
+
+def time_query(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(results)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Fleet index query benchmarks")
+    arg_parser.add_argument("--switches", type=int, default=500)
+    arg_parser.add_argument("--members", type=int, default=4, help="Stack members per switch (default: 4)")
+    arg_parser.add_argument("--ports", type=int, default=48, help="Ports per stack member (default: 48)")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from patchfinder_core import FleetIndex
+
+    fleet_index = FleetIndex(os.path.join(tempfile.mkdtemp(prefix="patchfinder-fleet-"), "fleet.db"))
+    rng = random.Random(1)
+
+    started = time.perf_counter()
+    for switch_no in range(args.switches):
+        ports, poe = synthetic_switch(rng, args.members, args.ports)
+        fleet_index.update(f"10.0.{switch_no // 256}.{switch_no % 256}", f"SW-{switch_no:04d}",
+                           SITES[switch_no % len(SITES)], ports, poe)
+    print(f"Indexed {args.switches} switches in {time.perf_counter() - started:.2f}s")
+
+    for name, query in QUERIES:
+        query_time, count = time_query(lambda: fleet_index.query(**query), args.repeat)
+        print(f"{name:<22} {query_time * 1000:>7.2f}ms ({count} ports)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Equivalence checks and timings for PatchFinder's native parsers against the TextFSM templates
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import sys
+import time
+
+from netmiko.utilities import get_structured_data_textfsm
+
+from ios_simulator import SyntheticSwitch, load_recordings
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rows the synthetic switch never produces but real switches do
+EXTRA_STATUS_ROWS = [
+    "Gi9/0/1      uplink to core     connected    trunk      a-full a-1000 10/100/1000BaseTX",
+    "Gi9/0/2      bpdu guard tripped err-disabled 20           auto   auto 10/100/1000BaseTX  ",
+    "Te9/1/1                         notconnect   routed       full    10G Not Present",
+    "Po1          core-lag           connected    trunk      a-full a-10G ",
+    "Gi9/0/3      voice              connected    1,20       a-full  a-100 10/100/1000BaseTX",
+]
+
+# TextFSM command name for each native parser; the fields compared are the ones the native parser returns
+PARSED_COMMANDS = {
+    "show interfaces status": ("parse_interface_status", "sh int status"),
+    "show interfaces": ("parse_show_interfaces", "show interfaces"),
+    "show version": ("parse_show_version", "sh version"),
+}
+
+
+def load_parsers():
+    """Returns the parser namespaces to check; the CLI and the backend share patchfinder_core's parsers"""
+    sys.path.insert(0, REPO_ROOT)
+    from patchfinder_core import parsers
+    return {"core": parsers}
+
+
+def textfsm_fields(records, fields):
+    return [{field: record.get(field) for field in fields} for record in records]
+
+
+def time_call(function, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def check(outputs_by_case, repeat):
+    """Compares every native parser against TextFSM and prints timings; returns the number of mismatches"""
+    mismatches = 0
+    parser_modules = load_parsers()
+
+    for case, outputs in outputs_by_case.items():
+        for command, (parser_name, textfsm_command) in PARSED_COMMANDS.items():
+            output = outputs[command]
+            expected = get_structured_data_textfsm(output, platform="cisco_ios", command=textfsm_command)
+            textfsm_time = time_call(get_structured_data_textfsm, output, "cisco_ios", textfsm_command, repeat=repeat)
+
+            for front_end, module in parser_modules.items():
+                native_parser = getattr(module, parser_name)
+                parsed = native_parser(output)
+
+                if parsed is None or parsed != textfsm_fields(expected, parsed[0].keys()):
+                    mismatches += 1
+                    print(f"[-] {front_end} {parser_name} differs from TextFSM on {case}")
+                    continue
+
+                native_time = time_call(native_parser, output, repeat=repeat)
+                print(f"{case:<10} {command:<24} {front_end:<4} {len(parsed):>5} records   "
+                      f"native {native_time * 1000:>8.2f}ms   textfsm {textfsm_time * 1000:>8.2f}ms   "
+                      f"x{textfsm_time / native_time:.1f}")
+
+    for front_end, module in parser_modules.items():
+        for command, (parser_name, _) in PARSED_COMMANDS.items():
+            if getattr(module, parser_name)("% Invalid input detected at '^' marker.") is not None:
+                mismatches += 1
+                print(f"[-] {front_end} {parser_name} accepted unrecognised output instead of falling back to TextFSM")
+
+    return mismatches
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Native parser equivalence checks and benchmarks")
+    arg_parser.add_argument("--ports", nargs="+", type=int, default=[48, 200, 500])
+    arg_parser.add_argument("--recordings", nargs="*", default=[], help="Directories of recorded command output")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    outputs_by_case = {}
+    for port_count in args.ports:
+        outputs = SyntheticSwitch(port_count).outputs()
+        outputs["show interfaces status"] += "\n" + "\n".join(EXTRA_STATUS_ROWS)
+        outputs_by_case[f"{port_count}-port"] = outputs
+    for directory in args.recordings:
+        outputs_by_case[os.path.basename(os.path.normpath(directory))] = load_recordings(directory, SyntheticSwitch().outputs())
+
+    mismatches = check(outputs_by_case, args.repeat)
+    if mismatches:
+        print(f"[-] {mismatches} parser mismatches against TextFSM")
+        sys.exit(1)
+    print("[+] Native parsers match TextFSM")
+
+
+if __name__ == "__main__":
+    main()
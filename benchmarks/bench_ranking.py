@@ -0,0 +1,84 @@
+# Usage ranking time per switch and across a fleet, against a full sort
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from patchfinder_core import FleetRanking, PortRecord, SwitchScan
+
+
+def synthetic_fleet(switches, ports, seed=0):
+    """Builds unranked scans with random counters, about a third of each switch's ports notconnect"""
+    generator = random.Random(seed)
+    scans = []
+    for number in range(switches):
+        counters = {}
+        notconnect = []
+        for index in range(ports):
+            port = f"Gi{index // 48 + 1}/0/{index % 48 + 1}"
+            input_packets, output_packets = generator.randrange(10 ** 9), generator.randrange(10 ** 9)
+            counters[port] = input_packets + output_packets
+            if generator.random() < 1 / 3:
+                notconnect.append(PortRecord(port, "", "1", "never", input_packets, output_packets))
+        scans.append(SwitchScan(f"10.0.{number // 256}.{number % 256}", f"SW-{number}", "", notconnect, None, counters))
+    return scans
+
+
+def full_sort(scans, k):
+    """Ranks the way scans used to: a percentage per port, every (percentage, port) pair sorted, then sliced"""
+    ranked = []
+    for scan in scans:
+        for port in scan.ports:
+            port.usage_percentage = round(scan.counters[port.port] / int(max(scan.counters.values())) * 100, 2)
+    top = max(max(scan.counters.values()) for scan in scans)
+    for scan in scans:
+        ranked.extend((round(scan.counters[port.port] / top * 100, 2), scan.host, port.port) for port in scan.ports)
+    return sorted(ranked)[:k]
+
+
+def top_k(scans, k):
+    fleet = FleetRanking(k)
+    for scan in scans:
+        scan.rank()
+        fleet.add(scan)
+    return [(percentage, host, port.port) for host, _, port, percentage in fleet.least_used()]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Usage ranking time")
+    arg_parser.add_argument("--switches", nargs="+", type=int, default=[1, 100, 1000])
+    arg_parser.add_argument("--ports", type=int, default=192, help="Ports per switch (default: 192, a four-member stack)")
+    arg_parser.add_argument("-k", type=int, default=10, help="Least-used ports to select (default: 10)")
+    args = arg_parser.parse_args()
+
+    mismatches = 0
+    for switches in args.switches:
+        scans = synthetic_fleet(switches, args.ports)
+        sort_time, expected = timed(full_sort, scans, args.k)
+        rank_time, selected = timed(top_k, scans, args.k)
+        line = (f"{switches:>5} switches x {args.ports} ports   full sort {sort_time * 1000:>8.1f}ms"
+                f"   top-k {rank_time * 1000:>8.1f}ms")
+        # Rounding can tie ports that differ in raw packets, so compare the percentages selected
+        if [row[0] for row in selected] != [row[0] for row in expected]:
+            mismatches += 1
+            line += " [MISMATCH]"
+        print(line)
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# End-to-end scan latency benchmarks for patchfinder.main() and /api/connect against the IOS simulator
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import functools
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import netmiko
+
+from ios_simulator import IOSSimulator, SyntheticSwitch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_ROOT = os.path.join(REPO_ROOT, "webapp", "backend")
+
+SIM_USERNAME = "admin"
+SIM_PASSWORD = "admin"
+
+SSH_CONNECT = netmiko.ConnectHandler
+
+
+def load_cli():
+    """Imports patchfinder.py with console output and the export prompt silenced"""
+    sys.path.insert(0, REPO_ROOT)
+    import patchfinder
+
+    from rich.console import Console
+    from rich.prompt import Prompt
+    patchfinder.rich_console = Console(file=io.StringIO())
+    Prompt.ask = staticmethod(lambda *args, **kwargs: "n")
+    patchfinder.PORT_CACHE_FILE = os.path.join(tempfile.mkdtemp(prefix="patchfinder-bench-"), "port_cache.json")
+    return patchfinder
+
+
+def load_api():
+    """Imports the FastAPI app with authentication bypassed for a fixed benchmark user"""
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, BACKEND_ROOT)
+    from fastapi.testclient import TestClient
+    from app import main as backend
+    from app.auth import get_current_user
+
+    backend.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(username="benchmark")
+    return backend, TestClient(backend.app)
+
+
+def run_cli(patchfinder, simulator, collection, incremental, channels=1):
+    # patchfinder.py imports ConnectHandler from netmiko on each scan, so point that at the simulator
+    netmiko.ConnectHandler = functools.partial(SSH_CONNECT, port=simulator.port)
+    patchfinder.switches[simulator.host] = [SIM_USERNAME, SIM_PASSWORD]
+    patchfinder.scan_channels = channels
+    patchfinder.main(simulator.host, collection, cache_ttl=3600 if incremental else None)
+
+
+def run_api(api, simulator, collection, incremental, channels=1):
+    backend, client = api
+    backend.session_manager._open = functools.partial(_open_on_port, backend.session_manager, simulator.port)
+
+    response = client.post("/api/connect", json={
+        "ip": simulator.host,
+        "username": SIM_USERNAME,
+        "password": SIM_PASSWORD,
+        "collection": collection,
+        "incremental": incremental,
+        "channels": channels,
+        # Scan every run rather than answering from the result cache
+        "refresh": True,
+    })
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    while client.get(f"/api/jobs/{job_id}").json()["status"] in ("queued", "running"):
+        time.sleep(0.01)
+    client.get(f"/api/jobs/{job_id}/result").raise_for_status()
+
+    # Measure cold scans: drop the pooled session so every run pays the SSH handshake
+    backend.session_manager.close_session("benchmark")
+
+
+def _open_on_port(session_manager, port, host, username, password):
+    return SSH_CONNECT(host=host, port=port, username=username, password=password, device_type="cisco_ios")
+
+
+def benchmark(targets, port_counts, collections, latency, repeat, incremental=False, channel_counts=(1,)):
+    """Runs every (target, port count, collection, channels) case and returns timing results"""
+    runners = {}
+    if "cli" in targets:
+        runners["cli"] = functools.partial(run_cli, load_cli())
+    if "api" in targets:
+        runners["api"] = functools.partial(run_api, load_api())
+
+    results = []
+
+    for port_count in port_counts:
+        outputs = SyntheticSwitch(port_count).outputs()
+
+        with IOSSimulator(outputs, username=SIM_USERNAME, password=SIM_PASSWORD, latency=latency) as simulator:
+            for target, runner in runners.items():
+                for collection in collections:
+                    for channels in channel_counts:
+                        timings = []
+                        commands_before = simulator.commands_served
+
+                        if incremental:
+                            # Warm the port cache so every timed run is a rescan
+                            runner(simulator, collection, incremental, channels)
+                            commands_before = simulator.commands_served
+
+                        for _ in range(repeat):
+                            started = time.perf_counter()
+                            runner(simulator, collection, incremental, channels)
+                            timings.append(time.perf_counter() - started)
+
+                        mode = f"{collection}+incremental" if incremental else collection
+                        if channels > 1:
+                            mode += f"x{channels}"
+                        result = {
+                            "case": f"{target}/{mode}/{port_count}",
+                            "target": target,
+                            "collection": collection,
+                            "ports": port_count,
+                            "channels": channels,
+                            "min_s": round(min(timings), 4),
+                            "median_s": round(statistics.median(timings), 4),
+                            "commands": (simulator.commands_served - commands_before) // repeat,
+                        }
+                        results.append(result)
+                        print(f"{result['case']:<32} min {result['min_s']:>8.3f}s   median {result['median_s']:>8.3f}s"
+                              f"   {result['commands']:>5} commands/scan", flush=True)
+
+    return results
+
+
+def find_regressions(results, baseline_path, tolerance):
+    """Compares median timings against a saved baseline and returns the cases that got slower"""
+    with open(baseline_path, "rt", encoding="utf-8") as baseline_file:
+        baseline = {result["case"]: result for result in json.load(baseline_file)["results"]}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["case"])
+        if previous and result["median_s"] > previous["median_s"] * (1 + tolerance):
+            regressions.append((result["case"], previous["median_s"], result["median_s"]))
+
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="PatchFinder scan latency benchmarks")
+    arg_parser.add_argument("--target", nargs="+", choices=["cli", "api"], default=["cli", "api"])
+    arg_parser.add_argument("--ports", nargs="+", type=int, default=[48, 200, 500])
+    arg_parser.add_argument("--collection", nargs="+", default=["per-port", "bulk", "counters"])
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per command (default: 0.02)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Runs per case (default: 3)")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="Time rescans that reuse cached per-port detail, after one warm-up scan")
+    arg_parser.add_argument("--channels", nargs="+", type=int, default=[1],
+                            help="SSH sessions per scan to share out per-port detail over (default: 1)")
+    arg_parser.add_argument("--json", help="Write results to this JSON file")
+    arg_parser.add_argument("--baseline", help="Fail if any case is slower than this earlier --json result")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed slowdown against --baseline as a fraction (default: 0.25)")
+    args = arg_parser.parse_args()
+
+    results = benchmark(args.target, args.ports, args.collection, args.latency, args.repeat, args.incremental,
+                        args.channels)
+
+    if args.json:
+        with open(args.json, "wt", encoding="utf-8") as json_file:
+            json.dump({"latency": args.latency, "repeat": args.repeat, "results": results}, json_file, indent=2)
+
+    if args.baseline:
+        regressions = find_regressions(results, args.baseline, args.tolerance)
+        for case, previous, current in regressions:
+            print(f"[-] Regression in {case}: {previous:.3f}s -> {current:.3f}s")
+        if regressions:
+            sys.exit(1)
+        print("[+] No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# SNMP collection against SSH scraping of the same synthetic switch: results must agree, then compare time and round trips
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import netmiko
+
+from bench_scan import SIM_PASSWORD, SIM_USERNAME, _open_on_port
+from ios_simulator import IOSSimulator, SyntheticSwitch, split_interface_blocks
+from snmp_simulator import UPTIME_SECONDS, SNMPSimulator, age_seconds
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from patchfinder_core import ScanObserver, scan_switch
+from patchfinder_core.snmp import format_age, snmp_scan
+
+
+class RoundTrips(ScanObserver):
+    def __init__(self):
+        self.count = 0
+
+    def command(self, label, seconds):
+        self.count += 1
+
+
+def ssh_scan(simulator, collection, observer):
+    connection = netmiko.ConnectHandler(host=simulator.host, port=simulator.port, username=SIM_USERNAME,
+                                        password=SIM_PASSWORD, device_type="cisco_ios")
+    try:
+        scan = scan_switch(connection, collection, observer=observer)
+    finally:
+        connection.disconnect()
+    scan.rank()
+    return scan
+
+
+def snmp_collect(simulator, observer):
+    scan = snmp_scan(simulator.host, simulator.community, simulator.port, observer=observer)
+    scan.rank()
+    return scan
+
+
+def expected_last_input(last_input):
+    """ifLastChange stops at the last reboot, so SNMP reports a port down since before then as down for the uptime"""
+    if last_input == "never":
+        return last_input
+    return format_age(min(age_seconds(last_input), UPTIME_SECONDS))
+
+
+def compare(ssh, snmp):
+    """Lists where the SNMP scan disagrees with the SSH scan"""
+    problems = []
+    if (ssh.hostname, ssh.uptime) != (snmp.hostname, snmp.uptime):
+        problems.append(f"switch: {ssh.hostname!r} {ssh.uptime!r} != {snmp.hostname!r} {snmp.uptime!r}")
+
+    expected = {port.port: port for port in ssh.ports}
+    actual = {port.port: port for port in snmp.ports}
+    if expected.keys() != actual.keys():
+        problems.append(f"notconnect ports differ: {sorted(expected.keys() ^ actual.keys())}")
+    for name in expected.keys() & actual.keys():
+        fields = ("description", "vlan", "last_input", "input_packets", "output_packets", "usage_percentage")
+        for field in fields:
+            wanted, got = getattr(expected[name], field), getattr(actual[name], field)
+            if field == "last_input":
+                wanted = expected_last_input(wanted)
+            if wanted != got:
+                problems.append(f"{name} {field}: {wanted!r} != {got!r}")
+
+    if max(ssh.counters.values()) != max(snmp.counters.values()):
+        problems.append("busiest port counters differ")
+
+    # pethMainPseConsumptionPower is whole watts, so allow for rounding of the used and free figures
+    ssh_poe = [(budget.member, float(budget.available), float(budget.used)) for budget in ssh.poe or []]
+    snmp_poe = [(budget.member, float(budget.available), float(budget.used)) for budget in snmp.poe or []]
+    if len(ssh_poe) != len(snmp_poe) or any(
+            a[:2] != b[:2] or abs(a[2] - b[2]) > 0.5 for a, b in zip(ssh_poe, snmp_poe)):
+        problems.append(f"PoE budgets: {ssh_poe} != {snmp_poe}")
+    return problems
+
+
+def time_scans(scan, runs):
+    timings = []
+    for _ in range(runs):
+        observer = RoundTrips()
+        started = time.perf_counter()
+        result = scan(observer)
+        timings.append(time.perf_counter() - started)
+    return timings, observer.count, result
+
+
+def check_history(port_count=48, delta=1000):
+    """Alternates SSH and SNMP scans of one switch through the API; only the SSH scans may move its counter history.
+
+    The SNMP switch counts extra packets on every port, as IF-MIB totals count different packets to 'show interfaces',
+    so any SNMP snapshot in the history shows up as a delta no SSH scan saw.
+    """
+    history_path = tempfile.mkdtemp(prefix="patchfinder-history-")
+    os.environ.setdefault("COUNTER_DB_PATH", os.path.join(history_path, "counters.db"))
+    os.environ.setdefault("FLEET_DB_PATH", os.path.join(history_path, "fleet.db"))
+    from bench_scan import load_api
+    backend, client = load_api()
+    from app import collection
+
+    ssh_switch, snmp_switch = SyntheticSwitch(port_count), SyntheticSwitch(port_count)
+    for port in snmp_switch.ports:
+        port["input_packets"] += 7 * delta
+        port["output_packets"] += 7 * delta
+
+    problems = []
+    with IOSSimulator(ssh_switch.outputs(), username=SIM_USERNAME, password=SIM_PASSWORD) as ssh_sim, \
+            SNMPSimulator(snmp_switch) as snmp_sim:
+        backend.session_manager._open = functools.partial(_open_on_port, backend.session_manager, ssh_sim.port)
+        collection.SNMP_PORT = snmp_sim.port
+
+        def scan(body):
+            job = client.post("/api/connect", json={"ip": ssh_sim.host, "refresh": True, **body}).json()["job_id"]
+            while client.get(f"/api/jobs/{job}").json()["status"] in ("queued", "running"):
+                time.sleep(0.01)
+            assert client.get(f"/api/jobs/{job}/result").status_code == 200
+            # Snapshots are taken to the second
+            time.sleep(1.1)
+
+        def advance_ssh():
+            for port in ssh_switch.ports:
+                port["input_packets"] += delta
+                port["output_packets"] += delta
+            ssh_sim.outputs = ssh_switch.outputs()
+            ssh_sim.interface_blocks = split_interface_blocks(ssh_sim.outputs["show interfaces"])
+
+        ssh = {"username": SIM_USERNAME, "password": SIM_PASSWORD}
+        snmp = {"backend": "snmp", "community": snmp_sim.community}
+        steps = [("ssh", ssh, None), ("snmp", snmp, None), ("ssh", ssh, advance_ssh), ("snmp", snmp, None)]
+        for step, (name, body, before) in enumerate(steps):
+            if before:
+                before()
+            scan(body)
+            # Only the second SSH scan sees the counters move, by delta in each direction
+            expected = 2 * delta if step >= 2 else None
+            deltas = {usage.packets for usage in backend.counter_history.usage(ssh_sim.host, 3600).values()}
+            if deltas != ({expected} if expected else set()):
+                problems.append(f"after {name} scan {step + 1}: history deltas {sorted(deltas)[:5]}, expected "
+                                f"{expected or 'none'}")
+    return problems
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="SNMP collection against SSH scraping")
+    arg_parser.add_argument("--ports", nargs="+", type=int, default=[48, 192])
+    arg_parser.add_argument("--collection", default="bulk", help="SSH collection mode to compare with (default: bulk)")
+    arg_parser.add_argument("--latency", type=float, default=0.02,
+                            help="Simulated seconds per SSH command (default: 0.02); snmpsim answers at once")
+    arg_parser.add_argument("--runs", type=int, default=3, help="Scans per case (default: 3)")
+    args = arg_parser.parse_args()
+
+    failures = 0
+    for port_count in args.ports:
+        switch = SyntheticSwitch(port_count)
+        with IOSSimulator(switch.outputs(), username=SIM_USERNAME, password=SIM_PASSWORD, latency=args.latency) as ssh_sim, \
+                SNMPSimulator(switch) as snmp_sim:
+            ssh_times, ssh_trips, ssh = time_scans(lambda observer: ssh_scan(ssh_sim, args.collection, observer), args.runs)
+            snmp_times, snmp_trips, snmp = time_scans(lambda observer: snmp_collect(snmp_sim, observer), args.runs)
+
+        print(f"{port_count:>4} ports   ssh ({args.collection}) median {statistics.median(ssh_times):>7.3f}s "
+              f"{ssh_trips:>4} commands   snmp median {statistics.median(snmp_times):>7.3f}s {snmp_trips:>4} requests   "
+              f"{len(snmp.ports)} notconnect")
+        for problem in compare(ssh, snmp):
+            failures += 1
+            print(f"  [MISMATCH] {problem}")
+
+    history_problems = check_history()
+    print("Alternating SSH and SNMP scans", "corrupt" if history_problems else "keep", "the counter history")
+    for problem in history_problems:
+        failures += 1
+        print(f"  [MISMATCH] {problem}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Cold start times for patchfinder.py paths that never open an SSH connection
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATCHFINDER = os.path.join(REPO_ROOT, "patchfinder.py")
+
+# Modules that must not be imported before a switch is scanned
+HEAVY_MODULES = ("netmiko", "paramiko", "textfsm", "dotenv")
+
+
+def time_run(arguments, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=REPO_ROOT)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def heavy_imports_on_import():
+    """Lists the heavy modules loaded by importing patchfinder without running anything"""
+    check = ("import sys, patchfinder; "
+             f"print(' '.join(module for module in {HEAVY_MODULES!r} if module in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, cwd=REPO_ROOT, check=True)
+    return output.stdout.split()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="patchfinder.py cold start times")
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    arg_parser.add_argument("--budget", type=float,
+                            help="Fail if any case takes more than this many milliseconds over a bare interpreter")
+    args = arg_parser.parse_args()
+
+    # An empty index, so 'find' renders a table without any scan results
+    index_path = os.path.join(tempfile.mkdtemp(prefix="patchfinder-startup-"), "fleet.db")
+    sqlite3.connect(index_path).close()
+
+    cases = [
+        ("--help", [PATCHFINDER, "--help"]),
+        ("invalid argument", [PATCHFINDER, "--collection", "invalid"]),
+        ("find", [PATCHFINDER, "find", "--index", index_path]),
+        ("import", ["-c", "import patchfinder"]),
+    ]
+
+    interpreter = time_run([sys.executable, "-c", "pass"], args.repeat)
+    print(f"{'python -c pass':<18} {interpreter * 1000:>8.1f}ms")
+
+    over_budget = []
+    for name, arguments in cases:
+        elapsed = time_run([sys.executable, *arguments], args.repeat)
+        overhead = (elapsed - interpreter) * 1000
+        print(f"{name:<18} {elapsed * 1000:>8.1f}ms   +{overhead:.1f}ms over the interpreter")
+        if args.budget is not None and overhead > args.budget:
+            over_budget.append(name)
+
+    heavy = heavy_imports_on_import()
+    if heavy:
+        print(f"[-] Importing patchfinder loads {', '.join(heavy)}")
+    if over_budget:
+        print(f"[-] Over the {args.budget:.0f}ms budget: {', '.join(over_budget)}")
+    if heavy or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+# An offline stand-in for a Cisco IOS switch that Netmiko can connect to over SSH
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import logging
+import math
+import os
+import random
+import re
+import socket
+import threading
+import time
+
+import paramiko
+
+VOCABULARY = ["show", "interfaces", "status", "counters", "version", "running-config", "include",
+              "power", "inline", "terminal", "length", "width", "exit", "logout", "hostname"]
+
+# Recording file names for each canonical command (see SyntheticSwitch.outputs)
+RECORDING_FILES = {
+    "show running-config | include hostname": "show_run_hostname.txt",
+    "show version": "show_version.txt",
+    "show interfaces status": "show_interfaces_status.txt",
+    "show interfaces counters": "show_interfaces_counters.txt",
+    "show interfaces": "show_interfaces.txt",
+    "show power inline": "show_power_inline.txt",
+}
+
+INTERFACE_PREFIXES = {"gi": "GigabitEthernet", "te": "TenGigabitEthernet", "fa": "FastEthernet",
+                      "po": "Port-channel", "vl": "Vlan"}
+
+INTERFACE_BLOCK_HEADER = re.compile(r"^(\S+) is .+?, line protocol is ", re.MULTILINE)
+
+# Clients dropping their session are routine here, so keep paramiko's server-side errors quiet
+SERVER_LOG_CHANNEL = "ios_simulator.transport"
+logging.getLogger(SERVER_LOG_CHANNEL).setLevel(logging.CRITICAL)
+
+
+def canonical_command(line):
+    """Expands IOS-style abbreviations (sh int stat) into the full command (show interfaces status)"""
+    words = []
+
+    for token in line.split():
+        expansions = [word for word in VOCABULARY if word.startswith(token.lower())]
+        words.append(expansions[0] if len(expansions) == 1 else token)
+
+    return " ".join(words)
+
+
+def full_interface_name(interface):
+    """Converts a short interface name (Gi1/0/1) to its full form (GigabitEthernet1/0/1)"""
+    match = re.match(r"([A-Za-z-]+)(.*)", interface)
+    if not match:
+        return interface
+
+    prefix, number = match.groups()
+    for short_prefix, full_prefix in INTERFACE_PREFIXES.items():
+        if full_prefix.lower().startswith(prefix.lower()) or prefix.lower() == short_prefix:
+            return full_prefix + number
+    return interface
+
+
+class SyntheticSwitch:
+    """Generates deterministic show-command output for a stack with the given number of access ports"""
+
+    def __init__(self, port_count=48, hostname=None, seed=1):
+        self.port_count = port_count
+        self.hostname = hostname or f"SIM-{port_count}"
+        self.members = max(1, math.ceil(port_count / 48))
+        self.ports = self._build_ports(random.Random(seed))
+
+    def _build_ports(self, rng):
+        ports = []
+
+        for index in range(self.port_count):
+            member, number = divmod(index, 48)
+            status = rng.choices(["connected", "notconnect", "disabled"], weights=[60, 35, 5])[0]
+
+            if status == "connected":
+                input_packets = rng.randint(10_000, 2_000_000_000)
+                last_input = f"00:00:{rng.randint(0, 59):02d}"
+            elif rng.random() < 0.5:
+                input_packets = 0
+                last_input = "never"
+            else:
+                input_packets = rng.randint(0, 50_000_000)
+                last_input = f"{rng.randint(1, 52)}w{rng.randint(0, 6)}d"
+
+            output_packets = input_packets * rng.randint(1, 3) if input_packets else rng.randint(0, 500)
+            ports.append({
+                "port": f"Gi{member + 1}/0/{number + 1}",
+                "name": rng.choice(["", f"desk-{index + 1}", f"AP-{index + 1}", "printer", "spare"]),
+                "status": status,
+                "vlan": rng.choice(["1", "10", "20", "30", "99"]),
+                "input_packets": input_packets,
+                "output_packets": output_packets,
+                "last_input": last_input,
+                "poe_watts": round(rng.choice([0.0, 0.0, 4.0, 6.5, 15.4]), 1) if status == "connected" else 0.0,
+            })
+
+        return ports
+
+    def outputs(self):
+        """Returns the output for every supported command, keyed by canonical command"""
+        return {
+            "show running-config | include hostname": f"hostname {self.hostname}",
+            "show version": self.show_version(),
+            "show interfaces status": self.show_interfaces_status(),
+            "show interfaces counters": self.show_interfaces_counters(),
+            "show interfaces": "\n".join(self.interface_block(port) for port in self.ports) + "\n" + self.vlan_block(),
+            "show power inline": self.show_power_inline(),
+        }
+
+    def show_version(self):
+        return "\n".join([
+            "Cisco IOS Software, C2960X Software (C2960X-UNIVERSALK9-M), Version 15.2(7)E4, RELEASE SOFTWARE (fc2)",
+            "Technical Support: http://www.cisco.com/techsupport",
+            "Copyright (c) 1986-2021 by Cisco Systems, Inc.",
+            "",
+            "ROM: Bootstrap program is C2960X boot loader",
+            f"{self.hostname} uptime is 12 weeks, 3 days, 4 hours, 5 minutes",
+            "System returned to ROM by power-on",
+            'System image file is "flash:c2960x-universalk9-mz.152-7.E4.bin"',
+            "",
+            f"cisco WS-C2960X-48FPD-L (APM86XXX) processor (revision B0) with 524288K bytes of memory.",
+            "Processor board ID FOC0000X0XX",
+            "",
+            "Configuration register is 0xF",
+        ])
+
+    def show_interfaces_status(self):
+        lines = ["", "Port         Name               Status       Vlan       Duplex  Speed Type"]
+
+        for port in self.ports:
+            duplex, speed = ("a-full", "a-1000") if port["status"] == "connected" else ("auto", "auto")
+            lines.append(f"{port['port']:<13}{port['name'][:18]:<19}{port['status']:<13}{port['vlan']:<11}"
+                         f"{duplex:>6} {speed:>6} 10/100/1000BaseTX")
+
+        return "\n".join(lines)
+
+    def show_interfaces_counters(self):
+        inbound = ["", "Port            InOctets    InUcastPkts    InMcastPkts    InBcastPkts"]
+        outbound = ["", "Port           OutOctets   OutUcastPkts   OutMcastPkts   OutBcastPkts"]
+
+        for port in self.ports:
+            for lines, packets in ((inbound, port["input_packets"]), (outbound, port["output_packets"])):
+                multicast, broadcast = packets // 20, packets // 50
+                unicast = packets - multicast - broadcast
+                lines.append(f"{port['port']:<16}{packets * 512:>12}{unicast:>15}{multicast:>15}{broadcast:>15}")
+
+        return "\n".join(inbound + outbound)
+
+    def interface_block(self, port):
+        up = port["status"] == "connected"
+        link = "up" if up else ("administratively down" if port["status"] == "disabled" else "down")
+        protocol = "up (connected)" if up else f"down ({port['status']})"
+        lines = [
+            f"{full_interface_name(port['port'])} is {link}, line protocol is {protocol} ",
+            "  Hardware is Gigabit Ethernet, address is 00a1.b2c3.0001 (bia 00a1.b2c3.0001)",
+        ]
+        if port["name"]:
+            lines.append(f"  Description: {port['name']}")
+        lines += [
+            "  MTU 1500 bytes, BW 1000000 Kbit/sec, DLY 10 usec, ",
+            "     reliability 255/255, txload 1/255, rxload 1/255",
+            "  Encapsulation ARPA, loopback not set",
+            "  Keepalive set (10 sec)",
+            "  Full-duplex, 1000Mb/s, media type is 10/100/1000BaseTX" if up
+            else "  Auto-duplex, Auto-speed, media type is 10/100/1000BaseTX",
+            "  input flow-control is off, output flow-control is unsupported ",
+            "  ARP type: ARPA, ARP Timeout 04:00:00",
+            f"  Last input {port['last_input']}, output 00:00:01, output hang never",
+            '  Last clearing of "show interface" counters never',
+            "  Input queue: 0/75/0/0 (size/max/drops/flushes); Total output drops: 0",
+            "  Queueing strategy: fifo",
+            "  Output queue: 0/40 (size/max)",
+            "  5 minute input rate 0 bits/sec, 0 packets/sec",
+            "  5 minute output rate 0 bits/sec, 0 packets/sec",
+            f"     {port['input_packets']} packets input, {port['input_packets'] * 512} bytes, 0 no buffer",
+            "     Received 0 broadcasts (0 multicasts)",
+            "     0 runts, 0 giants, 0 throttles ",
+            "     0 input errors, 0 CRC, 0 frame, 0 overrun, 0 ignored",
+            "     0 watchdog, 0 multicast, 0 pause input",
+            "     0 input packets with dribble condition detected",
+            f"     {port['output_packets']} packets output, {port['output_packets'] * 512} bytes, 0 underruns",
+            "     0 output errors, 0 collisions, 1 interface resets",
+            "     0 unknown protocol drops",
+            "     0 babbles, 0 late collision, 0 deferred",
+            "     0 lost carrier, 0 no carrier, 0 pause output",
+            "     0 output buffer failures, 0 output buffers swapped out",
+        ]
+        return "\n".join(lines)
+
+    def vlan_block(self):
+        return "\n".join([
+            "Vlan1 is up, line protocol is up ",
+            "  Hardware is EtherSVI, address is 00a1.b2c3.00ff (bia 00a1.b2c3.00ff)",
+            "  Internet address is 192.0.2.10/24",
+            "  MTU 1500 bytes, BW 1000000 Kbit/sec, DLY 10 usec, ",
+            "  Last input 00:00:00, output 00:00:00, output hang never",
+            "     1822040 packets input, 160523412 bytes, 0 no buffer",
+            "     1523049 packets output, 201349862 bytes, 0 underruns",
+        ])
+
+    def show_power_inline(self):
+        lines = [
+            "Module   Available     Used     Remaining",
+            "          (Watts)     (Watts)    (Watts) ",
+            "------   ---------   --------   ---------",
+        ]
+
+        for member in range(1, self.members + 1):
+            used = sum(port["poe_watts"] for port in self.ports if port["port"].startswith(f"Gi{member}/"))
+            lines.append(f"{member:<9}{740.0:>10.1f}{used:>11.1f}{740.0 - used:>12.1f}")
+
+        lines += [
+            "Interface Admin  Oper       Power   Device              Class Max",
+            "                            (Watts)                            ",
+            "--------- ------ ---------- ------- ------------------- ----- ----",
+        ]
+        for port in self.ports:
+            oper = "on" if port["poe_watts"] else "off"
+            lines.append(f"{port['port']:<10}auto   {oper:<11}{port['poe_watts']:<8}{'n/a':<20}{'n/a':<6}30.0")
+
+        return "\n".join(lines)
+
+
+def load_recordings(directory, base_outputs=None):
+    """Overlays recorded command output (see RECORDING_FILES) on top of base_outputs"""
+    outputs = dict(base_outputs or {})
+
+    for command, file_name in RECORDING_FILES.items():
+        path = os.path.join(directory, file_name)
+        if os.path.isfile(path):
+            with open(path, "rt", encoding="utf-8") as recording:
+                outputs[command] = recording.read().replace("\r\n", "\n").rstrip("\n")
+
+    return outputs
+
+
+def split_interface_blocks(show_interfaces):
+    """Splits 'show interfaces' output into a {full interface name: block} mapping"""
+    headers = list(INTERFACE_BLOCK_HEADER.finditer(show_interfaces))
+    blocks = {}
+
+    for position, header in enumerate(headers):
+        end = headers[position + 1].start() if position + 1 < len(headers) else len(show_interfaces)
+        blocks[header.group(1).lower()] = show_interfaces[header.start():end].rstrip("\n")
+
+    return blocks
+
+
+class _SimulatedServer(paramiko.ServerInterface):
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.shell_requested = threading.Event()
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_auth_password(self, username, password):
+        if username == self.username and password == self.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell_requested.set()
+        return True
+
+
+class IOSSimulator:
+    """A threaded SSH server answering PatchFinder's show commands like a cisco_ios device"""
+
+    def __init__(self, outputs, hostname=None, username="admin", password="admin", host="127.0.0.1", port=0,
+                 latency=0.0, command_latency=None):
+        self.outputs = outputs
+        self.hostname = hostname or outputs["show running-config | include hostname"].split()[1]
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.command_latency = command_latency or {}
+        self.interface_blocks = split_interface_blocks(outputs.get("show interfaces", ""))
+        self.commands_served = 0
+        self._host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.create_server((host, port))
+        self.host, self.port = self._socket.getsockname()[:2]
+        self._stopped = threading.Event()
+        self._transports = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts accepting SSH connections on a background thread"""
+        threading.Thread(target=self._accept_loop, name="ios-simulator", daemon=True).start()
+
+    def stop(self):
+        """Stops accepting connections and closes every open session"""
+        self._stopped.set()
+        self._socket.close()
+        with self._lock:
+            for transport in self._transports:
+                transport.close()
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        transport.set_log_channel(SERVER_LOG_CHANNEL)
+        transport.add_server_key(self._host_key)
+        server = _SimulatedServer(self.username, self.password)
+
+        with self._lock:
+            self._transports.append(transport)
+
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(timeout=10)
+            if channel is None or not server.shell_requested.wait(10):
+                return
+            self._shell(channel)
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+        finally:
+            transport.close()
+            with self._lock:
+                self._transports.remove(transport)
+
+    def _shell(self, channel):
+        prompt = f"{self.hostname}#"
+        channel.sendall(f"\r\n{prompt}")
+        pending = ""
+
+        while not self._stopped.is_set():
+            data = channel.recv(4096)
+            if not data:
+                return
+
+            pending += data.decode("utf-8", errors="replace").replace("\x00", "").replace("\r\n", "\n").replace("\r", "\n")
+            while "\n" in pending:
+                line, pending = pending.split("\n", 1)
+                command = canonical_command(line)
+                if command in ("exit", "logout"):
+                    channel.close()
+                    return
+
+                output = self.respond(command)
+                channel.sendall(f"{line}\r\n" + (output.replace("\n", "\r\n") + "\r\n" if output else "") + prompt)
+
+    def respond(self, command):
+        """Returns the device output for a canonical command, sleeping for its configured latency"""
+        if not command:
+            return ""
+
+        self.commands_served += 1
+        time.sleep(self.command_latency.get(command, self.latency))
+
+        if command.startswith("terminal "):
+            return ""
+        if command in self.outputs:
+            return self.outputs[command]
+        if command.startswith("show interfaces "):
+            block = self.interface_blocks.get(full_interface_name(command.split()[2]).lower())
+            if block:
+                return block
+
+        return "                 ^\n% Invalid input detected at '^' marker."
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline Cisco IOS switch simulator for PatchFinder")
+    arg_parser.add_argument("--listen", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    arg_parser.add_argument("--port", type=int, default=2222, help="SSH port to listen on (default: 2222)")
+    arg_parser.add_argument("--ports", type=int, default=48, help="Number of synthetic access ports (default: 48)")
+    arg_parser.add_argument("--hostname", help="Device hostname (default: SIM-<ports>)")
+    arg_parser.add_argument("--recordings", help="Directory of recorded command output to serve instead")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every response")
+    arg_parser.add_argument("--command-latency", action="append", default=[], metavar="COMMAND=SECONDS",
+                            help="Latency override for one canonical command, e.g. 'show interfaces=1.5'")
+    arg_parser.add_argument("--username", default="admin")
+    arg_parser.add_argument("--password", default="admin")
+    args = arg_parser.parse_args()
+
+    outputs = SyntheticSwitch(args.ports, args.hostname).outputs()
+    if args.recordings:
+        outputs = load_recordings(args.recordings, outputs)
+
+    command_latency = {}
+    for override in args.command_latency:
+        command, _, seconds = override.rpartition("=")
+        command_latency[canonical_command(command)] = float(seconds)
+
+    with IOSSimulator(outputs, username=args.username, password=args.password, host=args.listen, port=args.port,
+                      latency=args.latency, command_latency=command_latency) as simulator:
+        print(f"[+] Simulating {simulator.hostname} on {simulator.host}:{simulator.port} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print("\n[!] Stopping simulator")
+
+
+if __name__ == "__main__":
+    main()
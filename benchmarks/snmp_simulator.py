@@ -0,0 +1,190 @@
+# Serves a SyntheticSwitch over SNMPv2c with snmpsim, for checking SNMP collection against the SSH simulator
+# https://github.com/Elliot-Potts/PatchFinder
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from ios_simulator import SyntheticSwitch
+
+# snmprec value tags (see the snmpsim documentation)
+INTEGER, OCTET_STRING, GAUGE32, TIMETICKS, COUNTER64 = 2, 4, 66, 67, 70
+
+# 12 weeks, 3 days, 4 hours, 5 minutes, as 'show version' reports it
+UPTIME_SECONDS = ((12 * 7 + 3) * 24 + 4) * 3600 + 5 * 60
+
+# Cisco numbers physical ports from 10101 on the first stack member, 10201 on the second, and so on
+PORT_INDEX_BASE = 10100
+VLAN1_INDEX = 1
+
+IF_TYPE_ETHERNET, IF_TYPE_SVI = 6, 53
+STATUS_UP, STATUS_DOWN = 1, 2
+
+
+def age_seconds(last_input):
+    """Converts a 'Last input' age such as 5w2d or 00:00:12 to seconds"""
+    if ":" in last_input:
+        hours, minutes, seconds = (int(part) for part in last_input.split(":"))
+        return hours * 3600 + minutes * 60 + seconds
+    weeks, days = last_input.rstrip("d").split("w")
+    return (int(weeks) * 7 + int(days)) * 86400
+
+
+def snmp_records(switch):
+    """Builds (oid, tag, value) rows for the MIB objects SNMP collection reads"""
+    uptime_ticks = UPTIME_SECONDS * 100
+    records = [
+        ("1.3.6.1.2.1.1.3.0", TIMETICKS, uptime_ticks),
+        ("1.3.6.1.2.1.1.5.0", OCTET_STRING, f"{switch.hostname}.example.net"),
+    ]
+
+    interfaces = []
+    for index, port in enumerate(switch.ports):
+        member, number = divmod(index, 48)
+        interfaces.append((PORT_INDEX_BASE + member * 100 + number + 1, port))
+
+    def add_interface(if_index, if_type, admin, oper, last_change, name, alias, input_packets, output_packets):
+        records.extend([
+            (f"1.3.6.1.2.1.2.2.1.3.{if_index}", INTEGER, if_type),
+            (f"1.3.6.1.2.1.2.2.1.7.{if_index}", INTEGER, admin),
+            (f"1.3.6.1.2.1.2.2.1.8.{if_index}", INTEGER, oper),
+            (f"1.3.6.1.2.1.2.2.1.9.{if_index}", TIMETICKS, last_change),
+            (f"1.3.6.1.2.1.31.1.1.1.1.{if_index}", OCTET_STRING, name),
+            (f"1.3.6.1.2.1.31.1.1.1.18.{if_index}", OCTET_STRING, alias),
+        ])
+        # Split the same way as 'show interfaces counters', so the columns add back up to the packet totals
+        for base, packets in ((7, input_packets), (11, output_packets)):
+            multicast, broadcast = packets // 20, packets // 50
+            for offset, count in enumerate((packets - multicast - broadcast, multicast, broadcast)):
+                records.append((f"1.3.6.1.2.1.31.1.1.1.{base + offset}.{if_index}", COUNTER64, count))
+
+    add_interface(VLAN1_INDEX, IF_TYPE_SVI, STATUS_UP, STATUS_UP, 0, "Vl1", "", 1822040, 1523049)
+    for if_index, port in interfaces:
+        admin = STATUS_DOWN if port["status"] == "disabled" else STATUS_UP
+        oper = STATUS_UP if port["status"] == "connected" else STATUS_DOWN
+        last_change = 0 if port["last_input"] == "never" else uptime_ticks - age_seconds(port["last_input"]) * 100
+        add_interface(if_index, IF_TYPE_ETHERNET, admin, oper, max(0, last_change), port["port"], port["name"],
+                      port["input_packets"], port["output_packets"])
+        records.append((f"1.3.6.1.4.1.9.9.68.1.2.2.1.2.{if_index}", INTEGER, int(port["vlan"])))
+
+    for member in range(1, switch.members + 1):
+        used = sum(port["poe_watts"] for port in switch.ports if port["port"].startswith(f"Gi{member}/"))
+        records.extend([
+            (f"1.3.6.1.2.1.105.1.3.1.1.2.{member}", GAUGE32, 740),
+            # The MIB reports whole watts; 'show power inline' has a decimal place
+            (f"1.3.6.1.2.1.105.1.3.1.1.4.{member}", GAUGE32, round(used)),
+        ])
+
+    return sorted(records, key=lambda record: tuple(int(part) for part in record[0].split(".")))
+
+
+def write_snmprec(switch, path):
+    with open(path, "wt", encoding="utf-8") as snmprec:
+        for oid, tag, value in snmp_records(switch):
+            snmprec.write(f"{oid}|{tag}|{value}\n")
+
+
+def free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class SNMPSimulator:
+    """Runs snmpsim-command-responder for one switch on a free localhost UDP port; use as a context manager"""
+
+    def __init__(self, switch, community="public", host="127.0.0.1", port=0, startup_timeout=30):
+        self.switch = switch
+        self.community = community
+        self.host = host
+        self.port = port or free_udp_port()
+        self.startup_timeout = startup_timeout
+        self._process = None
+        self._workdir = None
+
+    def start(self):
+        responder = shutil.which("snmpsim-command-responder")
+        if responder is None:
+            raise RuntimeError("snmpsim is not installed (pip install snmpsim)")
+
+        self._workdir = tempfile.mkdtemp(prefix="patchfinder-snmpsim-")
+        data_dir, cache_dir = os.path.join(self._workdir, "data"), os.path.join(self._workdir, "cache")
+        os.makedirs(data_dir)
+        os.makedirs(cache_dir)
+        # The data file name is the community the responder answers to
+        write_snmprec(self.switch, os.path.join(data_dir, f"{self.community}.snmprec"))
+
+        command = [responder, f"--data-dir={data_dir}", f"--cache-dir={cache_dir}",
+                   f"--agent-udpv4-endpoint={self.host}:{self.port}", "--logging-method=stdout"]
+        if getattr(os, "geteuid", lambda: -1)() == 0:
+            # snmpsim refuses to run as root, and the unprivileged user it drops to must read and index the data
+            command += ["--process-user=nobody", "--process-group=nogroup"]
+            for directory in (self._workdir, data_dir, cache_dir):
+                os.chmod(directory, 0o777)
+
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        ready = threading.Event()
+        output = []
+
+        def drain():
+            for line in self._process.stdout:
+                output.append(line)
+                if "Listening at" in line:
+                    ready.set()
+            ready.set()
+
+        threading.Thread(target=drain, daemon=True).start()
+        if not ready.wait(self.startup_timeout) or self._process.poll() is not None:
+            self.stop()
+            raise RuntimeError("snmpsim did not start:\n" + "".join(output[-20:]))
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve a synthetic switch over SNMPv2c")
+    arg_parser.add_argument("--ports", type=int, default=48)
+    arg_parser.add_argument("--community", default="public")
+    arg_parser.add_argument("--port", type=int, default=1161, help="UDP port (default: 1161)")
+    arg_parser.add_argument("--write", metavar="PATH", help="Write the .snmprec file instead of serving it")
+    args = arg_parser.parse_args()
+
+    switch = SyntheticSwitch(args.ports)
+    if args.write:
+        write_snmprec(switch, args.write)
+        return
+
+    with SNMPSimulator(switch, args.community, port=args.port) as simulator:
+        print(f"Serving {switch.hostname} ({args.ports} ports) on {simulator.host}:{simulator.port}, "
+              f"community '{simulator.community}'. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,130 @@
 # https://github.com/Elliot-Potts/PatchFinder
 
 import argparse
+import contextlib
+import csv
+import importlib.util
+import functools
+import json
+import random
 import sys
 import os
+import threading
+import time
 
-try:
-    from netmiko import ConnectHandler, exceptions
-    from dotenv import load_dotenv
-    from rich.console import Console
-    from rich.prompt import Prompt
-    from rich.table import Table
-except ModuleNotFoundError:
-    print("[-] You do not have the dependencies installed (Netmiko, python-dotenv, Rich)")
-    sys.exit(1)
+from patchfinder_core import (MAX_CHANNELS, FleetIndex, FleetRanking, ObserverGroup, ScanObserver, poe_free_watts,
+                              reference_credentials, scan_switch as collect_switch, status_signature)
+
+# [lazy] Netmiko (with paramiko, cryptography and TextFSM), Rich and python-dotenv are imported where they are
+# first needed, so --help, argument errors and 'find' start without loading them
+DEPENDENCIES = ("netmiko", "dotenv", "rich")
+
+
+class LazyConsole:
+    """Creates the Rich console on first use, so runs that print nothing never import Rich"""
 
+    def __init__(self, **options):
+        self._options = options
+        self._console = None
 
-rich_console = Console(highlight=False)
+    def __getattr__(self, name):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(highlight=False, **self._options)
+        return getattr(self._console, name)
+
+
+rich_console = LazyConsole()
+
+# Not-connect ports of every scanned switch, queried by the 'find' subcommand without connecting to anything
+FLEET_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".patchfinder_fleet.db")
+
+# Unix socket of the local agent that keeps switch sessions warm between runs
+AGENT_SOCKET_FILE = os.path.join(os.path.expanduser("~"), ".patchfinder_agent.sock")
 
 arg_parser = argparse.ArgumentParser(description="Switch connection details")
-arg_parser.add_argument('-i', '--ip', help="IP address of the Cisco switch")
+arg_parser.add_argument('-i', '--ip', nargs="+", help="IP address(es) of the Cisco switch(es)")
 arg_parser.add_argument('-u', "--username", help="Username (leave empty to use .env)")
 arg_parser.add_argument('-p', '--password', help="Password (leave empty to use .env)")
-cli_args = arg_parser.parse_args()
+arg_parser.add_argument('-c', '--collection', choices=["per-port", "bulk", "counters"], default="per-port",
+                        help="Interface collection mode: one 'show int' per port, one bulk 'show interfaces', "
+                             "or the 'show interfaces counters' table plus detail for not-connect ports only")
+arg_parser.add_argument('--concurrent', action="store_true",
+                        help="Scan all switches in parallel without prompts and print a merged report")
+arg_parser.add_argument('-w', '--workers', type=int, default=8, help="Maximum switches scanned at once (default: 8)")
+arg_parser.add_argument('-t', '--timeout', type=int, default=300, help="Per-switch scan timeout in seconds (default: 300)")
+arg_parser.add_argument('--channels', type=int, choices=range(1, MAX_CHANNELS + 1), default=1, metavar="N",
+                        help=f"SSH sessions per switch that share out its per-port 'show int' commands (default: 1, max: {MAX_CHANNELS})")
+arg_parser.add_argument('--incremental', action="store_true",
+                        help="Reuse cached per-port detail for ports whose status, VLAN and description are unchanged")
+arg_parser.add_argument('--cache-ttl', type=int, default=900,
+                        help="Maximum age in seconds of cached per-port detail used by --incremental (default: 900)")
+arg_parser.add_argument('--index', nargs="?", const=FLEET_INDEX_FILE, metavar="PATH",
+                        help="Add scanned not-connect ports to the fleet index (default: ~/.patchfinder_fleet.db)")
+arg_parser.add_argument('--site', help="Site recorded for the scanned switches in the fleet index")
+arg_parser.add_argument('--inventory', metavar="PATH",
+                        help="Scan every switch in a YAML or CSV inventory (host, site, credentials) with no prompts")
+arg_parser.add_argument('--summary', metavar="PATH", help="Write a JSON summary of every switch's result and duration")
+arg_parser.add_argument('--rate', type=float, help="Maximum new SSH connections per second across all workers")
+arg_parser.add_argument('--retries', type=int, default=0, help="Retries per switch after a timeout (default: 0)")
+arg_parser.add_argument('--backoff', type=float, default=5,
+                        help="Seconds before the first retry, doubling for each one after (default: 5)")
+arg_parser.add_argument('-o', '--output', metavar="PATH",
+                        help="Write one row per not-connect port of every switch to this file ('-' for stdout), without prompts")
+arg_parser.add_argument('--timings', action="store_true",
+                        help="Print connect, command, parse and render timings at the end of the run")
+arg_parser.add_argument('--top', type=int, metavar="K",
+                        help="List the K least-used not-connect ports across every scanned switch")
+arg_parser.add_argument('--agent', nargs="?", const=AGENT_SOCKET_FILE, metavar="SOCKET",
+                        help="Borrow warm sessions from a running 'patchfinder.py agent' (default: ~/.patchfinder_agent.sock)")
+arg_parser.add_argument('-f', '--format', choices=["jsonl", "csv", "parquet"],
+                        help="Format for --output (default: from the file extension, otherwise jsonl)")
+arg_parser.add_argument('-b', '--backend', choices=["ssh", "snmp"], default="ssh",
+                        help="Collect with show commands over SSH, or IF-MIB and POWER-ETHERNET-MIB over SNMPv2c (default: ssh)")
+arg_parser.add_argument('--community', help="SNMP community for --backend snmp (leave empty to use .env)")
+arg_parser.add_argument('--snmp-port', type=int, default=161, help="UDP port for --backend snmp (default: 161)")
+arg_parser.add_argument('--profile', action="store_true",
+                        help="Print wall time and memory allocated per phase of each switch's scan, and its slowest ports")
+arg_parser.add_argument('--profile-dump', metavar="PATH",
+                        help="With --profile, also write a profile file per switch ({host} in PATH is replaced by its IP)")
+arg_parser.add_argument('--profile-format', choices=["collapsed", "pstats"], default="collapsed",
+                        help="--profile-dump format: collapsed stacks for flame graphs, or cProfile stats (default: collapsed)")
+
+subcommands = arg_parser.add_subparsers(dest="command")
+find_parser = subcommands.add_parser("find", help="Find free ports across the fleet index without connecting to any switch")
+find_parser.add_argument('--index', default=FLEET_INDEX_FILE, metavar="PATH", help="Fleet index to query (default: ~/.patchfinder_fleet.db)")
+find_parser.add_argument('--site', help="Only ports on switches at this site")
+find_parser.add_argument('--vlan', help="Only ports in this VLAN")
+find_parser.add_argument('--min-poe', type=float, help="Minimum free PoE watts on the port's stack member")
+find_parser.add_argument('--min-idle-days', type=float, help="Minimum days since the port last received input")
+find_parser.add_argument('--max-usage', type=float, help="Maximum percentage use")
+find_parser.add_argument('-n', '--limit', type=int, default=10, help="Number of candidates to show (default: 10)")
+agent_parser = subcommands.add_parser("agent", help="Run a local agent that keeps switch sessions warm for --agent scans")
+agent_parser.add_argument('--socket', default=AGENT_SOCKET_FILE, metavar="PATH", help="Socket to listen on (default: ~/.patchfinder_agent.sock)")
+agent_parser.add_argument('--idle-timeout', type=int, default=300, help="Seconds before an unused session is closed (default: 300)")
+agent_parser.add_argument('--keepalive', type=int, default=30, help="Seconds between SSH keepalives and idle checks (default: 30)")
+agent_parser.add_argument('--status', action="store_true", help="Show the sessions held by a running agent")
+agent_parser.add_argument('--stop', action="store_true", help="Stop a running agent and close its sessions")
 
 switches = {}
+switch_sites = {}
+# Switches collected over SNMP, with their community; every other switch is scanned over SSH with switches[host]
+snmp_communities = {}
+snmp_port = 161
+# Sessions each SSH scan may open to its switch for per-port detail
+scan_channels = 1
+connection_limiter = None
+scan_timings = None
+# (dump path, format) while --profile is on, and the profile of the switch being scanned
+profile_options = None
+scan_profile = None
+fleet_ranking = None
+agent_socket = None
+
+# Last 'sh int status' row and per-port detail of every switch, for --incremental rescans
+PORT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".patchfinder_cache.json")
+port_cache_lock = threading.Lock()
+
 
 
 def confirm_environment():
@@ -36,12 +137,38 @@ def confirm_environment():
     sys.exit(1)
 
 
-def auth_handler(ip_addresses):
+def confirm_snmp():
+    """Confirms pysnmp is installed before any switch is scanned over SNMP"""
+    if importlib.util.find_spec("pysnmp"):
+        return True
+
+    rich_console.print("[bold red][-][/] SNMP collection needs pysnmp (pip install pysnmp)")
+    sys.exit(1)
+
+
+def environment_community():
+    """Returns PF_COMMUNITY, exiting if it is not set"""
+    if os.environ.get("PF_COMMUNITY"):
+        return os.environ["PF_COMMUNITY"]
+
+    rich_console.print("[bold red][-][/] SNMP community environment variable not found [italic](PF_COMMUNITY)[/italic].")
+    sys.exit(1)
+
+
+def auth_handler(ip_addresses, backend="ssh"):
     """Handles the credential input/storage for each switch"""
+    from rich.prompt import Prompt
     rich_console.print("[grey54 italic]\nLeave empty to use environment variables")
+    if backend == "snmp":
+        confirm_snmp()
 
     for ip in ip_addresses:
         rich_console.print(f"[bold]{ip}")
+        if backend == "snmp":
+            snmp_communities[ip] = Prompt.ask("[bold][>][/bold] Enter SNMP community ", password=True) or environment_community()
+            rich_console.print(f"[bold green][+][/] Switch {ip} added for SNMP collection")
+            continue
+
         get_username = Prompt.ask("[bold][>][/bold] Enter SSH username ")
 
         if get_username:
@@ -56,10 +183,167 @@ def auth_handler(ip_addresses):
                 rich_console.print(f"[bold green][+][/] Switch {ip} added with environment username '{env_username}'")
 
 
+def load_inventory(inventory_path, default_backend="ssh"):
+    """Reads an inventory file into switches, exiting if a credential reference is not set"""
+    if inventory_path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ModuleNotFoundError:
+            rich_console.print("[bold red][-][/] YAML inventories need PyYAML (pip install pyyaml)")
+            sys.exit(1)
+
+        with open(inventory_path, "rt", encoding="utf-8") as inventory_file:
+            inventory = yaml.safe_load(inventory_file) or []
+        if isinstance(inventory, dict):
+            inventory = inventory.get("switches", [])
+    else:
+        with open(inventory_path, "rt", encoding="utf-8", newline="") as inventory_file:
+            inventory = list(csv.DictReader(inventory_file))
+
+    missing_references = set()
+    hosts = []
+
+    for entry in inventory:
+        host = str(entry.get("host") or "").strip()
+        if not host:
+            continue
+
+        reference = str(entry.get("credentials") or "").strip()
+        backend = str(entry.get("backend") or default_backend).strip().lower()
+        if backend not in ("ssh", "snmp"):
+            rich_console.print(f"[bold red][-][/] Unknown backend '{backend}' for {host} (expected ssh or snmp)")
+            sys.exit(1)
+
+        # [credentials] 'core' -> PF_CORE_USERNAME / PF_CORE_PASSWORD, or PF_CORE_COMMUNITY for SNMP
+        credentials = reference_credentials(reference, backend)
+        if not all(credentials.values()):
+            missing_references.add(reference or "(default)")
+            continue
+        if backend == "snmp":
+            snmp_communities[host] = credentials["community"]
+        else:
+            switches[host] = [credentials["username"], credentials["password"]]
+
+        hosts.append(host)
+        if entry.get("site"):
+            switch_sites[host] = str(entry["site"])
+
+    if missing_references:
+        rich_console.print(f"[bold red][-][/] No PF_*_USERNAME / PF_*_PASSWORD (or PF_*_COMMUNITY for SNMP) set for credential references: {', '.join(sorted(missing_references))}")
+        sys.exit(1)
+    if snmp_communities:
+        confirm_snmp()
+
+    return list(dict.fromkeys(hosts))
+
+
+class ConnectionRateLimiter:
+    """Spaces new SSH connections at least 1/rate seconds apart across every worker thread"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+
+class ScanTimings(ScanObserver):
+    """Collects durations and counts from every worker thread for the --timings summary"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, category, seconds):
+        with self._lock:
+            self.durations.setdefault(category, []).append(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def time(self, category):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, time.perf_counter() - started)
+
+    # [observer] Timings reported by the shared scanner
+    def command(self, label, seconds):
+        self.record(f"command: {label}", seconds)
+
+    def parse(self, label, parser, seconds):
+        self.record(f"parse ({parser}): {label}", seconds)
+
+    def ports(self, count):
+        self.count("ports scanned", count)
+
+
+@contextlib.contextmanager
+def timed(category):
+    """Times a block into the --timings summary and the --profile phases, or does nothing when both are off"""
+    with scan_timings.time(category) if scan_timings else contextlib.nullcontext(), \
+            scan_profile.phase(category) if scan_profile else contextlib.nullcontext():
+        yield
+
+
+def scan_observer():
+    """The observer scans report to: --timings, the --profile of the switch being scanned, both or neither"""
+    return ObserverGroup(scan_timings, scan_profile) if scan_profile else scan_timings
+
+
+@contextlib.contextmanager
+def profiled(ip_address):
+    """Profiles one switch's scan and report for --profile, then prints the phases and writes any dump"""
+    global scan_profile
+    if not profile_options:
+        yield
+        return
+
+    # [lazy] tracemalloc, cProfile and the sampler are only loaded for --profile
+    from patchfinder_core.profiling import ScanProfile
+    dump_path, dump_format = profile_options
+    scan_profile = ScanProfile(cprofile=bool(dump_path) and dump_format == "pstats",
+                               stacks=bool(dump_path) and dump_format == "collapsed")
+    try:
+        with scan_profile:
+            yield
+    finally:
+        profile, scan_profile = scan_profile, None
+        rich_console.print(build_profile_table(profile, ip_address))
+        if profile.outliers():
+            rich_console.print(build_port_outliers_table(profile))
+        if dump_path:
+            path = dump_path.replace("{host}", ip_address)
+            if dump_format == "pstats":
+                with open(path, "wb") as dump:
+                    dump.write(profile.pstats_data())
+            else:
+                with open(path, "wt", encoding="utf-8") as dump:
+                    dump.write(profile.collapsed_stacks())
+            rich_console.print(f"[bold green][+][/] Wrote {dump_format} profile to [bold]{path}[/]")
+
+
+def count_timing(name, amount=1):
+    if scan_timings:
+        scan_timings.count(name, amount)
+
+
 def text_exporter(ip, hostname, uptime, interfaces, poe, lowest_int):
     """Builds a TXT file summary with relevant information"""
     export_filename = f"{hostname}.txt"
 
+    from rich.console import Console
+
     with open(export_filename, "wt", encoding="utf-8") as export_file:
         export_console = Console(file=export_file)
         export_console.print("-" * 103)
@@ -77,89 +361,264 @@ def text_exporter(ip, hostname, uptime, interfaces, poe, lowest_int):
     rich_console.print(f"[bold][green][+][/green][/bold] Summary exported to [bold]{export_filename}[/bold]")
 
 
-def main(ip_address):
-    """Main function for connecting to a switch and gathering information"""
+# Columns of --output exports, one row per not-connect port
+EXPORT_FIELDS = ["ip", "hostname", "uptime", "port", "description", "vlan", "last_input",
+                 "input_packets", "output_packets", "usage_percentage", "poe_free_watts"]
+EXPORT_EXTENSIONS = {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+
+def export_rows(result):
+    """Yields the export rows of a scanned switch"""
+    for port in result.ports:
+        yield {
+            "ip": result.host,
+            "hostname": result.hostname,
+            "uptime": result.uptime,
+            "port": port.port,
+            "description": port.description,
+            "vlan": port.vlan,
+            "last_input": port.last_input,
+            "input_packets": port.input_packets,
+            "output_packets": port.output_packets,
+            "usage_percentage": port.usage_percentage,
+            "poe_free_watts": poe_free_watts(result.poe, port.port),
+        }
+
+
+class ScanExporter:
+    """Writes export rows to a JSON Lines, CSV or Parquet file (or stdout) as each switch finishes"""
+
+    def __init__(self, path, export_format=None):
+        self.path = path
+        self.format = export_format or EXPORT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "jsonl")
+        self.rows_written = 0
+        self._parquet_writer = None
+
+        if self.format == "parquet":
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ModuleNotFoundError:
+                rich_console.print("[-] Parquet export needs pyarrow (pip install pyarrow)")
+                sys.exit(1)
+
+            self._pyarrow = pyarrow
+            self._schema = pyarrow.schema([
+                (field, pyarrow.int64() if field.endswith("_packets") else
+                 pyarrow.float64() if field in ("usage_percentage", "poe_free_watts") else pyarrow.string())
+                for field in EXPORT_FIELDS
+            ])
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(sys.stdout.buffer if path == "-" else path, self._schema)
+            self._file = None
+        else:
+            self._file = sys.stdout if path == "-" else open(path, "wt", encoding="utf-8", newline="")
+            if self.format == "csv":
+                self._csv_writer = csv.DictWriter(self._file, fieldnames=EXPORT_FIELDS)
+                self._csv_writer.writeheader()
+
+    def write_switch(self, result):
+        """Writes the rows of one scanned switch; only that switch's rows are held in memory"""
+        if self._parquet_writer:
+            # [parquet] One row group per switch, so memory stays bounded by the largest switch
+            rows = list(export_rows(result))
+            if rows:
+                self._parquet_writer.write_table(self._pyarrow.Table.from_pylist(rows, schema=self._schema))
+            self.rows_written += len(rows)
+            return
+
+        for row in export_rows(result):
+            if self.format == "csv":
+                self._csv_writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row) + "\n")
+            self.rows_written += 1
+        self._file.flush()
+
+    def close(self):
+        if self._parquet_writer:
+            self._parquet_writer.close()
+        elif self._file is not sys.stdout:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_port_cache(ip_address):
+    """Loads the cached per-port detail of a switch"""
+    with port_cache_lock:
+        try:
+            with open(PORT_CACHE_FILE, "rt", encoding="utf-8") as cache_file:
+                return json.load(cache_file).get(ip_address, {})
+        except (OSError, ValueError):
+            return {}
+
+
+def save_port_cache(ip_address, cached_ports):
+    """Replaces the cached per-port detail of a switch, keeping every other switch's"""
+    with port_cache_lock:
+        try:
+            with open(PORT_CACHE_FILE, "rt", encoding="utf-8") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            cache = {}
+
+        cache[ip_address] = cached_ports
+        temporary_file = f"{PORT_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(temporary_file, "wt", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temporary_file, PORT_CACHE_FILE)
+
+
+class IncrementalPortCache:
+    """The cached per-port detail of one switch during a scan; only ports seen in the scan are saved"""
+
+    def __init__(self, ip_address, ttl):
+        self.ip_address = ip_address
+        self.ttl = ttl
+        self.cached_ports = load_port_cache(ip_address)
+        self.scanned_ports = {}
+        self.scan_started = time.time()
+
+    def get(self, interface):
+        cached_port = self.cached_ports.get(interface['port'])
+        if cached_port and tuple(cached_port["status"]) == status_signature(interface) \
+                and self.scan_started - cached_port["fetched_at"] < self.ttl:
+            self.scanned_ports[interface['port']] = cached_port
+            return cached_port["stats"]
+        return None
+
+    def put(self, interface, stats):
+        self.scanned_ports[interface['port']] = {"status": status_signature(interface),
+                                                 "fetched_at": self.scan_started,
+                                                 "stats": stats}
+
+    def save(self):
+        save_port_cache(self.ip_address, self.scanned_ports)
+
+
+def connect_switch(ip_address, timeout=None):
+    """Opens a session to a switch, borrowing a warm one from the agent when --agent is given"""
+    global agent_socket
+    from netmiko import ConnectHandler
+    from patchfinder_core.agent import AgentError, AgentSession
+
+    username, password = switches[ip_address]
+    if agent_socket:
+        try:
+            session = AgentSession(agent_socket, ip_address, username, password, timeout)
+        except AgentError as exc:
+            # [agent] Scans carry on over direct connections rather than failing with the agent
+            rich_console.print(f"[bold yellow][!][/] {exc}, connecting directly")
+            agent_socket = None
+        else:
+            if session.reused:
+                count_timing("agent sessions reused")
+            return session
+
+    connection_options = {"conn_timeout": timeout} if timeout else {}
+    return ConnectHandler(
+        host=ip_address,
+        username=username,
+        password=password,
+        device_type="cisco_ios",
+        **connection_options
+    )
+
+
+def scan_switch(ip_address, collection="per-port", timeout=None, cache_ttl=None):
+    """Connects to a switch and gathers its information without rendering anything"""
+    from netmiko import exceptions
+
+    if ip_address in snmp_communities:
+        # [snmp] A few GETBULK walks of the interface tables replace the session and every show command
+        from patchfinder_core.snmp import snmp_scan
+        scan = snmp_scan(ip_address, snmp_communities[ip_address], snmp_port, observer=scan_observer())
+        with timed("rank"):
+            scan.rank()
+        return scan
+
+    if connection_limiter:
+        connection_limiter.wait()
     try:
-        switch_connection = ConnectHandler(
-            host=ip_address,
-            username=switches[ip_address][0],
-            password=switches[ip_address][1],
-            device_type="cisco_ios"
-        )
+        with timed("connect"):
+            switch_connection = connect_switch(ip_address, timeout)
     except exceptions.NetmikoAuthenticationException:
-        rich_console.print(f"\n[bold red][-][/] Invalid username or password ({ip_address}).")
-        return
+        count_timing("connection failures (authentication)")
+        raise
     except exceptions.NetmikoTimeoutException:
-        rich_console.print(f"\n[bold red][-][/] Connection timeout ({ip_address}).")
-        return
+        count_timing("connection failures (timeout)")
+        raise
+    except Exception:
+        count_timing("connection failures (other)")
+        raise
 
-    switch_hostname = switch_connection.send_command("sh run | include hostname").split()[1]
-    rich_console.print(f"[bold green][+][/bold green] Connected to {ip_address}  ([italic green]{switch_hostname}[/])\n")
-    switch_uptime = switch_connection.send_command("sh version", use_textfsm=True)[0]['uptime']
-    switch_power = switch_connection.send_command("sh power inline").replace("-", "").split()
-    int_status = switch_connection.send_command("sh int status", use_textfsm=True)
+    # [watchdog] Closing the channel aborts any read still in flight once the scan overruns
+    timed_out = threading.Event()
+    watchdog = None
+    channel_connections = []
 
-    switch_power_parsed = []
+    if timeout:
+        def expire():
+            timed_out.set()
+            switch_connection.disconnect()
+            for channel_connection in channel_connections:
+                channel_connection.disconnect()
 
-    for item in range(7, switch_power.index("Interface")):
-        if switch_power[item].isdigit():
-            switch_power_parsed.append(switch_power[item:item+4])
+        watchdog = threading.Timer(timeout, expire)
+        watchdog.daemon = True
+        watchdog.start()
 
-    if not switch_power_parsed:
-        if switch_power[0].startswith("Available") and switch_power[1].startswith("Used") and switch_power[2].startswith("Remaining"):
-            get_available = switch_power[0].split(":")[1].replace("(w)", "")
-            get_used = switch_power[1].split(":")[1].replace("(w)", "")
-            get_remaining = switch_power[2].split(":")[1].replace("(w)", "")
-            switch_power_parsed.append(["System Total", get_available, get_used, get_remaining])
-        else:
-            rich_console.print(f"[bold red][-][/] Unable to fetch PoE details for ({ip_address}).")
-
-    if len(switch_power_parsed) > 0:
-        poe_table = Table(show_header=True, header_style="bold white")
-        poe_table.add_column("Switch No.")
-        poe_table.add_column("Available")
-        poe_table.add_column("Used")
-        poe_table.add_column("Free")
-
-        for switch in switch_power_parsed:
-            if switch[3] == "n/a" or switch[3] == "0.0":
-                poe_free = f"[red]{switch[3]}[/]"
-            else:
-                poe_free = switch[3]
-
-            poe_table.add_row(
-                switch[0],
-                switch[1],
-                switch[2],
-                poe_free
-            )
-
-    all_stats = []
-    disconnected_switchports = {}
-
-    for interface in int_status:
-        get_int_stats = switch_connection.send_command(f'show int {interface['port']}', use_textfsm=True)[0]
-
-        if interface['status'] == "notconnect":
-            # [get_vlan] Handle 'vlan' vs 'vlan_id' caveat via TextFSM
-            get_vlan = interface.get('vlan') or interface.get('vlan_id')
-            disconnected_switchports[interface['port']] = [get_int_stats["input_packets"],
-                                                           get_int_stats["output_packets"],
-                                                           interface['name'],
-                                                           get_vlan,
-                                                           get_int_stats['last_input']]
+    # [channels] Extra sessions each take a shard of the per-port detail; a shard whose session fails to open falls
+    # back to the main session, so --channels never fails a scan that would otherwise succeed
+    @contextlib.contextmanager
+    def open_channel():
+        if connection_limiter:
+            connection_limiter.wait()
+        if timed_out.is_set():
+            raise exceptions.NetmikoTimeoutException(f"Scan exceeded {timeout}s")
+        channel_connection = connect_switch(ip_address, timeout)
+        channel_connections.append(channel_connection)
+        count_timing("extra channels opened")
         try:
-            stats_total = int(get_int_stats['input_packets']) + int(get_int_stats['output_packets'])
-            all_stats.append(stats_total)
-        except ValueError:
-            # rich_console.print(f"[bold red][-][/bold red] Unable to calculate stats for interface [red]{interface['port']}[/red]. Likely a manegement interface...\n")
-            pass
+            yield channel_connection
+        finally:
+            if not timed_out.is_set():
+                channel_connection.disconnect()
 
-    interface_percentages = []
+    # [incremental] Detail is reused while a port's status row is unchanged and younger than cache_ttl
+    port_cache = IncrementalPortCache(ip_address, cache_ttl) if cache_ttl else None
 
-    rich_console.print(f"[bold]Switch uptime:[/bold] {switch_uptime}")
-    rich_console.print("\n[bold]Not-connect Switchports[/]")
+    try:
+        scan = collect_switch(switch_connection, collection, port_cache, scan_observer(), scan_channels,
+                              open_channel if scan_channels > 1 else None)
+    except Exception as exc:
+        if timed_out.is_set():
+            raise exceptions.NetmikoTimeoutException(f"Scan exceeded {timeout}s") from exc
+        raise
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        if not timed_out.is_set():
+            switch_connection.disconnect()
+
+    if timed_out.is_set():
+        raise exceptions.NetmikoTimeoutException(f"Scan exceeded {timeout}s")
+
+    if port_cache:
+        port_cache.save()
+
+    with timed("rank"):
+        scan.rank()
+    return scan
 
+
+def build_interface_table(ports):
+    """Builds the rich table of not-connect switchports"""
+    from rich.table import Table
     table = Table(show_header=True, header_style="bold white")
     table.add_column("Port")
     table.add_column("Port Description")
@@ -169,46 +628,246 @@ def main(ip_address):
     table.add_column("Output Packets")
     table.add_column("Percentage Use (%)")
 
-    for dc_switchport, values in disconnected_switchports.items():
-        in_packets = values[0]
-        out_packets = values[1]
-        port_desc = values[2]
-        port_vlan = values[3]
-        last_input = values[4]
+    for port in ports:
+        if port.usage_percentage is None:
+            percentage_string = "[red]n/a[/]"
+        elif port.usage_percentage == 0:
+            percentage_string = f"[green]{port.usage_percentage}[/]"
+        else:
+            percentage_string = str(port.usage_percentage)
+
+        table.add_row(
+            f"[grey]{port.port}[/]",
+            f"[grey54]{port.description}[/]",
+            f"[grey54]{port.vlan}[/]",
+            f"[grey54]{port.last_input}[/]",
+            f"[grey54]{'n/a' if port.input_packets is None else port.input_packets}[/]",
+            f"[grey54]{'n/a' if port.output_packets is None else port.output_packets}[/]",
+            percentage_string
+        )
 
-        try:
-            make_percentage = round(((int(in_packets)+int(out_packets)) / int(max(all_stats))) * 100, 2)
-        except ValueError:
-            rich_console.print(f"\n[bold red][-][/bold red] Unable to calculate stats for interface [red]{dc_switchport}[/red]. Likely a manegement interface...\n")
+    return table
+
+
+def build_poe_table(budgets):
+    """Builds the rich table of PoE budgets per switch"""
+    from rich.table import Table
+    poe_table = Table(show_header=True, header_style="bold white")
+    poe_table.add_column("Switch No.")
+    poe_table.add_column("Available")
+    poe_table.add_column("Used")
+    poe_table.add_column("Free")
 
-        if make_percentage == 0:
-            percentage_string = f"[green]{make_percentage}[/]"
+    for budget in budgets or []:
+        if budget.free == "n/a" or budget.free == "0.0":
+            poe_free = f"[red]{budget.free}[/]"
         else:
-            percentage_string = str(make_percentage)
+            poe_free = budget.free
+
+        poe_table.add_row(
+            budget.member,
+            budget.available,
+            budget.used,
+            poe_free
+        )
+
+    return poe_table
+
+
+def lowest_interface_summary(lowest):
+    """Describes the least-used not-connect interface"""
+    if not lowest:
+        return "\nNo not-connect interfaces with usable counters found.\n"
+    return f"\nInterface [bold green] {lowest.port} [/] has [bold green] {lowest.usage_percentage}% [/] the usage of the highest on the switch.\n"
+
 
+def build_candidates_table(candidates):
+    """Builds the rich table of free port candidates from the fleet index"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold white", title="Free Port Candidates")
+    table.add_column("Switch IP")
+    table.add_column("Hostname")
+    table.add_column("Site")
+    table.add_column("Interface")
+    table.add_column("Description")
+    table.add_column("VLAN")
+    table.add_column("Percentage Use (%)")
+    table.add_column("Last Input")
+    table.add_column("PoE Free (W)")
+
+    for candidate in candidates:
         table.add_row(
-            f"[grey]{dc_switchport}[/]",
-            f"[grey54]{port_desc}[/]",
-            f"[grey54]{port_vlan}[/]",
-            f"[grey54]{last_input}[/]",
-            f"[grey54]{in_packets}[/]",
-            f"[grey54]{out_packets}[/]",
-            percentage_string
+            candidate.ip,
+            f"[green]{candidate.hostname}[/]",
+            candidate.site or "-",
+            f"[bold]{candidate.port}[/]",
+            f"[grey54]{candidate.description}[/]",
+            f"[grey54]{candidate.vlan}[/]",
+            str(candidate.usage_percentage),
+            f"[grey54]{candidate.last_input}[/]",
+            "-" if candidate.poe_free_watts is None else str(candidate.poe_free_watts)
         )
 
-        interface_percentages.append([make_percentage, dc_switchport])
+    return table
 
-    interface_percentages = sorted(interface_percentages, key=lambda x: x[0])
 
-    rich_console.print(table)
+def build_fleet_ranking_table(ranking):
+    """Builds the rich table of the least-used not-connect ports across every scanned switch"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold white",
+                  title=f"Least-used Ports Across {ranking.switches} Switch{'es' if ranking.switches != 1 else ''}")
+    table.add_column("Switch IP")
+    table.add_column("Hostname")
+    table.add_column("Interface")
+    table.add_column("Description")
+    table.add_column("VLAN")
+    table.add_column("Last Input")
+    table.add_column("Fleet Use (%)")
+    table.add_column("Switch Use (%)")
+
+    for host, hostname, port, fleet_percentage in ranking.least_used():
+        table.add_row(
+            host,
+            f"[green]{hostname}[/]",
+            f"[bold]{port.port}[/]",
+            f"[grey54]{port.description}[/]",
+            f"[grey54]{port.vlan}[/]",
+            f"[grey54]{port.last_input}[/]",
+            str(fleet_percentage),
+            f"[grey54]{port.usage_percentage}[/]"
+        )
+
+    return table
+
 
-    if len(switch_power_parsed) > 0:
-        rich_console.print("\n[bold]PoE Details[/]")
-        rich_console.print(poe_table)
+def build_agent_table(status):
+    """Builds the rich table of sessions idling in the agent"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold white",
+                  title=f"Agent Sessions ({status['lent']} in use)")
+    table.add_column("Switch IP")
+    table.add_column("Idle (s)")
+
+    for session in sorted(status["idle"], key=lambda session: (session["host"], session["idle_s"])):
+        table.add_row(session["host"], str(session["idle_s"]))
 
-    lowest_interface = f"\nInterface [bold green] {interface_percentages[0][1]} [/] has [bold green] {interface_percentages[0][0]}% [/] the usage of the highest on the switch.\n"
+    return table
 
-    rich_console.print(lowest_interface)
+
+def build_timings_table(timings):
+    """Builds the rich table of --timings durations per category, slowest total first"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold white", title="Timings")
+    table.add_column("Category")
+    table.add_column("Count")
+    table.add_column("Total (s)")
+    table.add_column("Mean (ms)")
+    table.add_column("p95 (ms)")
+    table.add_column("Max (ms)")
+
+    for category, durations in sorted(timings.durations.items(), key=lambda item: -sum(item[1])):
+        ordered = sorted(durations)
+        total = sum(ordered)
+        table.add_row(
+            category,
+            str(len(ordered)),
+            f"{total:.2f}",
+            f"{total / len(ordered) * 1000:.1f}",
+            f"{ordered[round(0.95 * (len(ordered) - 1))] * 1000:.1f}",
+            f"{ordered[-1] * 1000:.1f}"
+        )
+
+    for name, value in sorted(timings.counts.items()):
+        table.add_row(f"[grey54]{name}[/]", str(value), "", "", "", "")
+
+    return table
+
+
+def build_profile_table(profile, ip_address):
+    """Builds the rich table of --profile phases in the order they ran"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold white",
+                  title=f"Profile of {ip_address} ({profile.wall_seconds:.2f}s)")
+    table.add_column("Phase")
+    table.add_column("Calls")
+    table.add_column("Time (s)")
+    table.add_column("Share (%)")
+    table.add_column("Net Allocated (KiB)")
+    table.add_column("Peak (KiB)")
+
+    for phase in profile.phases.values():
+        table.add_row(
+            phase.name,
+            str(phase.calls),
+            f"{phase.seconds:.3f}",
+            f"{phase.seconds / profile.wall_seconds * 100:.1f}" if profile.wall_seconds else "",
+            f"{phase.allocated / 1024:.1f}",
+            f"{phase.peak / 1024:.1f}"
+        )
+
+    return table
+
+
+def build_port_outliers_table(profile):
+    """Builds the rich table of ports whose detail took much longer than the median"""
+    from statistics import median
+    from rich.table import Table
+    typical = median(seconds for _, seconds in profile.port_timings)
+    table = Table(show_header=True, header_style="bold white",
+                  title=f"Slow Ports (median {typical * 1000:.1f}ms over {len(profile.port_timings)})")
+    table.add_column("Port")
+    table.add_column("Time (ms)")
+    table.add_column("x Median")
+
+    for port, seconds in profile.outliers():
+        table.add_row(port, f"{seconds * 1000:.1f}", f"{seconds / typical:.1f}" if typical else "")
+
+    return table
+
+
+def print_switch_report(result):
+    """Prints the uptime, not-connect, PoE and least-used sections for a scanned switch"""
+    with timed("render"):
+        rich_console.print(f"[bold]Switch uptime:[/bold] {result.uptime}")
+        rich_console.print("\n[bold]Not-connect Switchports[/]")
+        rich_console.print(build_interface_table(result.ports))
+
+        if result.poe:
+            rich_console.print("\n[bold]PoE Details[/]")
+            rich_console.print(build_poe_table(result.poe))
+        else:
+            rich_console.print(f"[bold red][-][/] Unable to fetch PoE details for ({result.host}).")
+
+        rich_console.print(lowest_interface_summary(result.lowest))
+
+
+def main(ip_address, collection="per-port", cache_ttl=None, prompt_export=True):
+    """Main function for connecting to a switch and gathering information"""
+    from netmiko import exceptions
+    from rich.prompt import Prompt
+    from patchfinder_core.agent import AgentError
+    from patchfinder_core.snmp import SnmpError
+
+    with profiled(ip_address):
+        try:
+            with rich_console.status(f"Scanning {ip_address}..."):
+                result = scan_switch(ip_address, collection, cache_ttl=cache_ttl)
+        except exceptions.NetmikoAuthenticationException:
+            rich_console.print(f"\n[bold red][-][/] Invalid username or password ({ip_address}).")
+            return
+        except exceptions.NetmikoTimeoutException:
+            rich_console.print(f"\n[bold red][-][/] Connection timeout ({ip_address}).")
+            return
+        except (SnmpError, AgentError) as exc:
+            rich_console.print(f"\n[bold red][-][/] {exc} ({ip_address}).")
+            return
+
+        switch_hostname = result.hostname
+        rich_console.print(f"[bold green][+][/bold green] Connected to {ip_address}  ([italic green]{switch_hostname}[/])\n")
+        print_switch_report(result)
+
+    if not prompt_export:
+        return result
 
     export_question = Prompt.ask(f"[bold][?][/bold] Would you like to export a text file summary for {switch_hostname}?", choices=['y', 'n'])
 
@@ -216,46 +875,274 @@ def main(ip_address):
         text_exporter(
             ip_address,
             switch_hostname,
-            switch_uptime,
-            table,
-            poe_table,
-            lowest_interface
+            result.uptime,
+            build_interface_table(result.ports),
+            build_poe_table(result.poe),
+            lowest_interface_summary(result.lowest)
         )
     else:
         rich_console.print("[bold]Exiting without text file export.[/]")
 
+    return result
+
+
+def record_scan_result(result, exporter=None, index_path=None, site=None):
+    """Exports and indexes a scanned switch as soon as it finishes; failed scans (None) are skipped"""
+    if result is None:
+        return
+    if exporter:
+        exporter.write_switch(result)
+    if fleet_ranking:
+        fleet_ranking.add(result)
+    if index_path:
+        FleetIndex(index_path).update(result.host, result.hostname, switch_sites.get(result.host, site), result.ports,
+                                      result.poe)
+
+
+def scan_concurrently(ip_addresses, collection="per-port", workers=8, timeout=300, cache_ttl=None, on_result=None,
+                      report=True, retries=0, backoff=5):
+    """Scans several switches on a bounded worker pool, prints a merged report and returns each switch's outcome"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from netmiko import exceptions
+    from rich.table import Table
+    from patchfinder_core.snmp import SnmpTimeout
+
+    # [report] Without the merged report only summary rows are kept, so memory does not grow with the fleet
+    results = {}
+    summaries = {}
+    failures = {}
+    durations = {}
+    attempts = {}
+
+    def timed_scan(ip_address):
+        started = time.monotonic()
+        try:
+            for attempt in range(retries + 1):
+                attempts[ip_address] = attempt + 1
+                try:
+                    return scan_switch(ip_address, collection, timeout, cache_ttl)
+                except (exceptions.NetmikoTimeoutException, exceptions.ReadTimeout, SnmpTimeout):
+                    if attempt == retries:
+                        raise
+                    # [backoff] Exponential with jitter, so retried switches do not reconnect in lockstep
+                    time.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+        finally:
+            durations[ip_address] = time.monotonic() - started
+
+    rich_console.print(f"[bold][>][/bold] Scanning {len(ip_addresses)} switches with up to {workers} workers\n")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(timed_scan, ip): ip for ip in ip_addresses}
+
+        for future in as_completed(pending):
+            ip_address = pending[future]
+            try:
+                result = future.result()
+            except exceptions.NetmikoAuthenticationException:
+                failures[ip_address] = "Invalid username or password"
+            except (exceptions.NetmikoTimeoutException, exceptions.ReadTimeout):
+                failures[ip_address] = "Connection timeout"
+            except Exception as exc:
+                failures[ip_address] = str(exc) or type(exc).__name__
+            else:
+                lowest = result.lowest
+                summaries[ip_address] = (result.hostname, len(result.ports),
+                                         [lowest.usage_percentage, lowest.port] if lowest else None)
+                if report:
+                    results[ip_address] = result
+                if on_result:
+                    on_result(result)
+
+            if ip_address in summaries:
+                rich_console.print(f"[bold green][+][/] {ip_address} ([italic green]{summaries[ip_address][0]}[/]) scanned in {durations[ip_address]:.1f}s")
+            else:
+                rich_console.print(f"[bold red][-][/] {ip_address} failed: {failures[ip_address]}")
+
+    for ip_address in ip_addresses:
+        if ip_address in results:
+            rich_console.rule(f"[bold]{results[ip_address].hostname}[/] ({ip_address})")
+            print_switch_report(results[ip_address])
+
+    summary_table = Table(show_header=True, header_style="bold white", title="Scan Summary")
+    summary_table.add_column("Switch IP")
+    summary_table.add_column("Hostname")
+    summary_table.add_column("Not-connect")
+    summary_table.add_column("Least-used Interface")
+    summary_table.add_column("Duration (s)")
+    summary_table.add_column("Result")
+
+    outcomes = []
+
+    for ip_address in ip_addresses:
+        duration = f"{durations.get(ip_address, 0):.1f}"
+        outcome = {
+            "ip": ip_address,
+            "site": switch_sites.get(ip_address),
+            "status": "ok" if ip_address in summaries else "failed",
+            "hostname": None,
+            "not_connect": None,
+            "lowest": None,
+            "error": failures.get(ip_address),
+            "attempts": attempts.get(ip_address, 0),
+            "duration_s": round(durations.get(ip_address, 0), 3),
+        }
+
+        if ip_address in summaries:
+            hostname, not_connect, lowest_interface = summaries[ip_address]
+            outcome.update(hostname=hostname, not_connect=not_connect, lowest=lowest_interface)
+            lowest = f"{lowest_interface[1]} ({lowest_interface[0]}%)" if lowest_interface else "-"
+            summary_table.add_row(ip_address, hostname, str(not_connect), lowest, duration, "[green]OK[/]")
+        else:
+            summary_table.add_row(ip_address, "-", "-", "-", duration, f"[red]{failures[ip_address]}[/]")
+
+        outcomes.append(outcome)
+
+    rich_console.print(summary_table)
+
+    return outcomes
+
+
+def write_scan_summary(summary_path, outcomes, started_at):
+    """Writes a JSON summary of a multi-switch run for tooling and cron jobs"""
+    summary = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(started_at)),
+        "duration_s": round(time.time() - started_at, 3),
+        "succeeded": sum(outcome["status"] == "ok" for outcome in outcomes),
+        "failed": sum(outcome["status"] == "failed" for outcome in outcomes),
+        "switches": outcomes,
+    }
+
+    with open(summary_path, "wt", encoding="utf-8") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+    rich_console.print(f"[bold green][+][/] Summary written to [bold]{summary_path}[/]")
+
 
 if __name__ == "__main__":
-    load_dotenv()
+    cli_args = arg_parser.parse_args()
+
+    if cli_args.command is None and cli_args.output == "-":
+        # Keep stdout for the export stream
+        rich_console = LazyConsole(stderr=True)
+
+    # find_spec locates the packages without importing them
+    if not all(importlib.util.find_spec(module) for module in DEPENDENCIES):
+        print("[-] You do not have the dependencies installed (Netmiko, python-dotenv, Rich)")
+        sys.exit(1)
+
+    if cli_args.command is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    cache_ttl = cli_args.cache_ttl if cli_args.incremental else None
+    exporter = ScanExporter(cli_args.output, cli_args.format) if cli_args.command is None and cli_args.output else None
+    on_result = functools.partial(record_scan_result, exporter=exporter, index_path=cli_args.index, site=cli_args.site)
+    run_started = time.time()
+    outcomes = None
+
+    if cli_args.rate:
+        connection_limiter = ConnectionRateLimiter(cli_args.rate)
+    if cli_args.timings:
+        scan_timings = ScanTimings()
+    if cli_args.profile or cli_args.profile_dump:
+        if cli_args.inventory or cli_args.concurrent or (cli_args.ip and len(cli_args.ip) > 1):
+            # [profile] Phases and allocations would mix across switches scanned at the same time
+            rich_console.print("[bold red][-][/] --profile scans one switch at a time; pass a single IP without --concurrent")
+            sys.exit(1)
+        profile_options = (cli_args.profile_dump, cli_args.profile_format)
+    if cli_args.top:
+        fleet_ranking = FleetRanking(cli_args.top)
+    if cli_args.command is None:
+        agent_socket = cli_args.agent
+        snmp_port = cli_args.snmp_port
+        scan_channels = cli_args.channels
 
     try:
-        if cli_args.ip and cli_args.username and cli_args.password:
-            switches[cli_args.ip] = [cli_args.username, cli_args.password]
-            main(cli_args.ip)
+        if cli_args.command == "find":
+            if not os.path.exists(cli_args.index):
+                rich_console.print(f"[bold red][-][/] No fleet index at {cli_args.index}. Scan switches with --index first.")
+                sys.exit(1)
+
+            query_started = time.perf_counter()
+            candidates = FleetIndex(cli_args.index).query(cli_args.site, cli_args.vlan, cli_args.min_poe,
+                                                          cli_args.min_idle_days, cli_args.max_usage, cli_args.limit)
+            rich_console.print(build_candidates_table(candidates))
+            rich_console.print(f"[grey54 italic]{len(candidates)} candidates in {(time.perf_counter() - query_started) * 1000:.1f}ms")
+        elif cli_args.command == "agent":
+            # [lazy] socket and hashlib are only needed to run or reach the agent
+            from patchfinder_core.agent import AgentError, SessionPool, agent_request, serve_agent
+            try:
+                if cli_args.status or cli_args.stop:
+                    agent_reply = agent_request(cli_args.socket, "stop" if cli_args.stop else "status")
+                    if cli_args.stop:
+                        rich_console.print(f"[bold green][+][/] Agent on {cli_args.socket} stopped")
+                    else:
+                        rich_console.print(build_agent_table(agent_reply))
+                else:
+                    serve_agent(cli_args.socket, SessionPool(cli_args.idle_timeout, cli_args.keepalive), lambda: rich_console.print(
+                        f"[bold][>][/bold] Agent listening on [bold]{cli_args.socket}[/] (Ctrl+C to stop)"))
+            except AgentError as exc:
+                rich_console.print(f"[bold red][-][/] {exc}")
+                sys.exit(1)
+        elif cli_args.inventory:
+            # [batch] Headless: no prompts or per-switch reports, failures are recorded and the run carries on
+            inventory_hosts = load_inventory(cli_args.inventory, cli_args.backend)
+            outcomes = scan_concurrently(inventory_hosts, cli_args.collection, cli_args.workers, cli_args.timeout, cache_ttl,
+                                         on_result, report=False, retries=cli_args.retries, backoff=cli_args.backoff)
         elif cli_args.ip:
-            # TODO - Remove the username and password check, direct to manual input
-            if cli_args.username and cli_args.password: # obsolete? 
-                switches[cli_args.ip] = [cli_args.username, cli_args.password]
-            else:
-                if confirm_environment():
-                    environment_username = os.environ.get("PF_USERNAME")
-                    environment_password = os.environ.get("PF_PASSWORD")
-                    switches[cli_args.ip] = [environment_username, environment_password]
-                    rich_console.print(f"[bold green][+][/] Using environment variable username '{environment_username}'")
+            if cli_args.backend == "snmp":
+                confirm_snmp()
+                cli_community = cli_args.community or environment_community()
+                for address in cli_args.ip:
+                    snmp_communities[address] = cli_community
+            elif cli_args.username and cli_args.password:
+                cli_credentials = [cli_args.username, cli_args.password]
+            elif confirm_environment():
+                environment_username = os.environ.get("PF_USERNAME")
+                environment_password = os.environ.get("PF_PASSWORD")
+                cli_credentials = [environment_username, environment_password]
+                rich_console.print(f"[bold green][+][/] Using environment variable username '{environment_username}'")
 
-            main(cli_args.ip)
+            if cli_args.backend == "ssh":
+                for address in cli_args.ip:
+                    switches[address] = cli_credentials
+
+            if cli_args.concurrent or len(cli_args.ip) > 1:
+                outcomes = scan_concurrently(cli_args.ip, cli_args.collection, cli_args.workers, cli_args.timeout, cache_ttl,
+                                             on_result, exporter is None, cli_args.retries, cli_args.backoff)
+            else:
+                on_result(main(cli_args.ip[0], cli_args.collection, cache_ttl, prompt_export=exporter is None))
         else:
+            from rich.prompt import Prompt
             rich_console.print("[grey54 italic]You can enter multiple IPs seperated by a space")
             get_ip_address = Prompt.ask("[bold][>][/bold] Enter switch IP(s) ").split()
 
             if get_ip_address:
-                auth_handler(get_ip_address)
+                auth_handler(get_ip_address, cli_args.backend)
+                get_ip_address = list(dict.fromkeys(get_ip_address))
 
-                for address in switches:
-                    Prompt.ask(f"\n[grey54]Press [bold][ENTER][/] to connect to [bold]{address}[/]")                
-                    main(address)
+                if cli_args.concurrent:
+                    outcomes = scan_concurrently(get_ip_address, cli_args.collection, cli_args.workers, cli_args.timeout, cache_ttl,
+                                                 on_result, exporter is None, cli_args.retries, cli_args.backoff)
+                else:
+                    for address in get_ip_address:
+                        Prompt.ask(f"\n[grey54]Press [bold][ENTER][/] to connect to [bold]{address}[/]")
+                        on_result(main(address, cli_args.collection, cache_ttl, prompt_export=exporter is None))
             else:
                 rich_console.print("[bold red][-][/] No input provided.")
-                sys.exit(1)        
+                sys.exit(1)
     except KeyboardInterrupt:
         rich_console.print("\n\n[bold red][!][/] Exiting via keyboard input.")
+    finally:
+        if exporter:
+            exporter.close()
+            rich_console.print(f"[bold green][+][/] Exported {exporter.rows_written} ports to [bold]{'stdout' if exporter.path == '-' else exporter.path}[/]")
+        if outcomes is not None and cli_args.summary:
+            write_scan_summary(cli_args.summary, outcomes, run_started)
+        if fleet_ranking and fleet_ranking.switches:
+            rich_console.print(build_fleet_ranking_table(fleet_ranking))
+        if scan_timings and scan_timings.durations:
+            rich_console.print(build_timings_table(scan_timings))
+
+    if cli_args.inventory and (outcomes is None or any(outcome["status"] == "failed" for outcome in outcomes)):
+        sys.exit(1)
@@ -0,0 +1,27 @@
+"""Switch scanning shared by patchfinder.py and the web app backend"""
+
+from .collection import (
+    ObserverGroup,
+    ScanObserver,
+    bulk_interface_stats,
+    command_label,
+    port_stats,
+    send_parsed,
+    status_signature,
+    stream_command,
+    timed_command,
+)
+from .credentials import credential_prefix, reference_credentials
+from .engine import (
+    COLLECTIONS,
+    MAX_CHANNELS,
+    ChannelFactory,
+    PortDetailCache,
+    cached_port_stats,
+    poe_budgets,
+    port_details,
+    scan_switch,
+)
+from .fleet import FleetIndex, FleetPort
+from .ranking import FleetRanking, least_used, rank_ports, usage_percentages
+from .records import PoeBudget, PortRecord, SwitchScan, poe_free_watts
@@ -0,0 +1,353 @@
+"""Local agent that keeps authenticated switch sessions warm between CLI runs.
+
+The agent listens on a Unix socket. A client borrows a pooled session for the length of its socket connection and
+drives it through the same calls a Netmiko connection offers, so scans run unchanged against an AgentSession.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
+
+AGENT_IDLE_TIMEOUT = 300
+AGENT_KEEPALIVE_INTERVAL = 30
+
+# Netmiko exceptions by the name the agent reports them under, so clients re-raise the original type
+NETMIKO_ERRORS = {
+    "authentication": "NetmikoAuthenticationException",
+    "timeout": "NetmikoTimeoutException",
+    "read_timeout": "ReadTimeout",
+}
+
+PoolKey = Tuple[str, str]
+
+
+class AgentError(Exception):
+    """The agent could not be reached, or broke off a session"""
+
+
+def _credential_fingerprint(username: str, password: str) -> str:
+    return hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
+
+
+def _error_kind(exc: Exception) -> str:
+    from netmiko import exceptions
+    if isinstance(exc, exceptions.NetmikoAuthenticationException):
+        return "authentication"
+    if isinstance(exc, exceptions.ReadTimeout):
+        return "read_timeout"
+    if isinstance(exc, exceptions.NetmikoTimeoutException):
+        return "timeout"
+    return "other"
+
+
+class SessionPool:
+    """Idle authenticated sessions by (switch, credentials); a session is lent to one client at a time"""
+    def __init__(
+        self,
+        idle_timeout: int = AGENT_IDLE_TIMEOUT,
+        keepalive_interval: int = AGENT_KEEPALIVE_INTERVAL,
+        connect: Optional[Callable[..., "BaseConnection"]] = None,
+    ):
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._connect = connect
+        self._idle: Dict[PoolKey, List[Tuple["BaseConnection", float]]] = {}
+        self._lent = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, host: str, username: str, password: str, timeout: Optional[int] = None) -> Tuple["BaseConnection", bool]:
+        """Lend a session to host, reusing an idle one that is still alive; returns (session, reused)"""
+        key = (host, _credential_fingerprint(username, password))
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                # Most recently used first, so older sessions age out when demand drops
+                connection = idle.pop()[0] if idle else None
+                if connection is not None:
+                    self._lent += 1
+            if connection is None:
+                break
+            if connection.is_alive():
+                return connection, True
+            self.discard(connection)
+
+        connection = self._open(host, username, password, timeout)
+        with self._lock:
+            self._lent += 1
+        return connection, False
+
+    def checkin(self, host: str, username: str, password: str, connection: "BaseConnection") -> None:
+        """Take a session back for reuse"""
+        key = (host, _credential_fingerprint(username, password))
+        with self._lock:
+            self._lent -= 1
+            self._idle.setdefault(key, []).append((connection, time.monotonic()))
+
+    def discard(self, connection: "BaseConnection", lent: bool = True) -> None:
+        """Close a session whose state is unknown, e.g. after a client went away mid-command"""
+        if lent:
+            with self._lock:
+                self._lent -= 1
+        try:
+            # Don't send logout command as it can hang
+            connection.disconnect()
+        except Exception:
+            pass
+
+    def sessions(self) -> Dict[str, Any]:
+        """Describe the idle sessions per switch and how many are lent out"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [{"host": host, "idle_s": round(now - last_used, 1)}
+                    for (host, _), sessions in self._idle.items() for _, last_used in sessions]
+            return {"idle": idle, "lent": self._lent}
+
+    def reap(self) -> None:
+        """Close sessions idle for longer than idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for key in list(self._idle):
+                expired.extend(connection for connection, last_used in self._idle[key] if last_used < cutoff)
+                self._idle[key] = [entry for entry in self._idle[key] if entry[1] >= cutoff]
+                if not self._idle[key]:
+                    del self._idle[key]
+        for connection in expired:
+            self.discard(connection, lent=False)
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections = [connection for sessions in self._idle.values() for connection, _ in sessions]
+            self._idle.clear()
+        for connection in connections:
+            self.discard(connection, lent=False)
+
+    def _open(self, host: str, username: str, password: str, timeout: Optional[int]) -> "BaseConnection":
+        if self._connect:
+            return self._connect(host=host, username=username, password=password)
+
+        from netmiko import ConnectHandler
+        connection_options = {"conn_timeout": timeout} if timeout else {}
+        return ConnectHandler(
+            host=host,
+            username=username,
+            password=password,
+            device_type="cisco_ios",
+            keepalive=self.keepalive_interval,
+            **connection_options
+        )
+
+
+def _serve_client(pool: SessionPool, client: socket.socket, stop: Callable[[], None]) -> None:
+    """Answer one client's requests; a borrowed session goes back to the pool only on a clean release"""
+    connection = None
+    credentials = None
+    healthy = True
+
+    with client, client.makefile("rwb") as stream:
+        try:
+            for line in stream:
+                request = json.loads(line)
+                operation = request.pop("op")
+                reply: Dict[str, Any] = {}
+                try:
+                    if operation == "open" and connection is None:
+                        credentials = (request["host"], request["username"], request["password"])
+                        connection, reused = pool.checkout(*credentials, request.get("timeout"))
+                        reply = {"reused": reused, "return": connection.RETURN}
+                    elif operation == "release" and connection is not None:
+                        if healthy:
+                            pool.checkin(*credentials, connection)
+                        else:
+                            pool.discard(connection)
+                        connection = None
+                    elif operation == "send_command" and connection is not None:
+                        reply = {"output": connection.send_command(request["command"])}
+                    elif operation == "find_prompt" and connection is not None:
+                        reply = {"output": connection.find_prompt()}
+                    elif operation == "write_channel" and connection is not None:
+                        connection.write_channel(request["data"])
+                    elif operation == "read_channel" and connection is not None:
+                        reply = {"output": connection.read_channel()}
+                    elif operation == "status":
+                        reply = pool.sessions()
+                    elif operation == "stop":
+                        pass
+                    else:
+                        reply = {"error": "other", "detail": f"Unexpected '{operation}' request"}
+                except Exception as exc:
+                    # A command that failed part way may have left output on the channel
+                    healthy = connection is None
+                    reply = {"error": _error_kind(exc), "detail": str(exc) or type(exc).__name__}
+
+                stream.write(json.dumps(reply).encode() + b"\n")
+                stream.flush()
+                if operation == "stop":
+                    # Only after replying, so the client sees the agent acknowledge before it goes away
+                    stop()
+                if operation in ("release", "stop"):
+                    break
+        except (OSError, ValueError):
+            pass
+        finally:
+            if connection is not None:
+                pool.discard(connection)
+
+
+def serve_agent(path: str, pool: SessionPool, on_ready: Optional[Callable[[], None]] = None) -> None:
+    """Listen on a Unix socket until a 'stop' request arrives, then close every pooled session"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise AgentError("The agent needs Unix domain sockets, which this platform does not have")
+
+    if os.path.exists(path):
+        try:
+            agent_request(path, "status")
+        except AgentError:
+            # Left behind by an agent that did not shut down cleanly
+            os.unlink(path)
+        else:
+            raise AgentError(f"An agent is already listening on {path}")
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The socket lends out authenticated sessions, so only its owner may connect
+    previous_umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(previous_umask)
+    listener.listen()
+
+    stopped = threading.Event()
+
+    def stop():
+        stopped.set()
+        listener.shutdown(socket.SHUT_RDWR)
+
+    def maintain():
+        while not stopped.wait(pool.keepalive_interval):
+            pool.reap()
+
+    threading.Thread(target=maintain, name="agent-reaper", daemon=True).start()
+    if on_ready:
+        on_ready()
+
+    try:
+        while not stopped.is_set():
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=_serve_client, args=(pool, client, stop), daemon=True).start()
+    finally:
+        stopped.set()
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        pool.close_all()
+
+
+def _connect_socket(path: str) -> socket.socket:
+    if not hasattr(socket, "AF_UNIX"):
+        raise AgentError("The agent needs Unix domain sockets, which this platform does not have")
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError as exc:
+        client.close()
+        raise AgentError(f"No agent listening on {path}") from exc
+    return client
+
+
+class AgentSession:
+    """A warm switch session borrowed from the agent, used in place of a Netmiko connection"""
+    def __init__(self, path: str, host: str, username: str, password: str, timeout: Optional[int] = None):
+        self.host = host
+        self._socket = _connect_socket(path)
+        self._stream = self._socket.makefile("rwb")
+        # Held while a request is in flight; with the owning thread, tells disconnect() a release from an abort
+        self._busy = threading.Lock()
+        self._owner = threading.get_ident()
+        try:
+            reply = self._call("open", host=host, username=username, password=password, timeout=timeout)
+        except Exception:
+            self._close()
+            raise
+        self.reused = reply["reused"]
+        self.RETURN = reply["return"]
+
+    def send_command(self, command: str) -> str:
+        return self._call("send_command", command=command)["output"]
+
+    def find_prompt(self) -> str:
+        return self._call("find_prompt")["output"]
+
+    def write_channel(self, out_data: str) -> None:
+        self._call("write_channel", data=out_data)
+
+    def read_channel(self) -> str:
+        return self._call("read_channel")["output"]
+
+    def disconnect(self) -> None:
+        """Hand the session back to the agent, or abandon it when called from another thread (a scan watchdog)
+
+        A watchdog can fire between the writes and reads of a streamed command, so only the thread that borrowed the
+        session knows the channel is clean.
+        """
+        if threading.get_ident() == self._owner and self._busy.acquire(blocking=False):
+            try:
+                self._request("release")
+            except (AgentError, OSError):
+                pass
+            finally:
+                self._busy.release()
+                self._close()
+        else:
+            # Unblocks the borrowing thread; the agent closes a session its client left without releasing
+            self._socket.shutdown(socket.SHUT_RDWR)
+
+    def _call(self, operation: str, **arguments: Any) -> Dict[str, Any]:
+        with self._busy:
+            reply = self._request(operation, **arguments)
+        if "error" in reply:
+            kind = reply["error"]
+            if kind in NETMIKO_ERRORS:
+                from netmiko import exceptions
+                raise getattr(exceptions, NETMIKO_ERRORS[kind])(reply["detail"])
+            raise AgentError(reply["detail"])
+        return reply
+
+    def _request(self, operation: str, **arguments: Any) -> Dict[str, Any]:
+        try:
+            self._stream.write(json.dumps({"op": operation, **arguments}).encode() + b"\n")
+            self._stream.flush()
+            line = self._stream.readline()
+        except (OSError, ValueError) as exc:
+            raise AgentError("Lost the connection to the agent") from exc
+        if not line:
+            raise AgentError("The agent closed the session")
+        return json.loads(line)
+
+    def _close(self) -> None:
+        self._stream.close()
+        self._socket.close()
+
+
+def agent_request(path: str, operation: str) -> Dict[str, Any]:
+    """Send a single request (e.g. 'status' or 'stop') to the agent"""
+    with _connect_socket(path) as client, client.makefile("rwb") as stream:
+        try:
+            stream.write(json.dumps({"op": operation}).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+        except OSError as exc:
+            raise AgentError("Lost the connection to the agent") from exc
+    if not line:
+        raise AgentError("The agent closed the connection")
+    return json.loads(line)
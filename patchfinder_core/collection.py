@@ -0,0 +1,159 @@
+"""Show command helpers for switch sessions, reporting their timings to an optional observer"""
+
+import contextlib
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+from .parsers import InterfaceStreamParser, parse_show_interfaces, short_interface_name
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
+
+# Per-port commands share one label, keeping the number of timing series independent of port count
+PORT_COMMAND = re.compile(r"^(show int(?:erfaces)?) (?!status$|counters$)\S+$")
+
+
+class ScanObserver:
+    """Receives timings and port counts from scans; front ends override what they record"""
+    def command(self, label: str, seconds: float) -> None:
+        pass
+
+    def parse(self, label: str, parser: str, seconds: float) -> None:
+        pass
+
+    def ports(self, count: int) -> None:
+        pass
+
+    def port_detail(self, port: str, seconds: float) -> None:
+        """Time taken to fetch and parse one port's detail"""
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Wrap one phase of a scan, such as 'sh int status' or the per-port loop"""
+        return contextlib.nullcontext()
+
+
+NO_OBSERVER = ScanObserver()
+
+
+class ObserverGroup(ScanObserver):
+    """Reports a scan to several observers, e.g. metrics and a profile of the same run"""
+    def __init__(self, *observers: Optional[ScanObserver]):
+        self.observers = [observer for observer in observers if observer is not None]
+
+    def command(self, label: str, seconds: float) -> None:
+        for observer in self.observers:
+            observer.command(label, seconds)
+
+    def parse(self, label: str, parser: str, seconds: float) -> None:
+        for observer in self.observers:
+            observer.parse(label, parser, seconds)
+
+    def ports(self, count: int) -> None:
+        for observer in self.observers:
+            observer.ports(count)
+
+    def port_detail(self, port: str, seconds: float) -> None:
+        for observer in self.observers:
+            observer.port_detail(port, seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        with contextlib.ExitStack() as stack:
+            for observer in self.observers:
+                stack.enter_context(observer.phase(name))
+            yield
+
+
+def command_label(command: str) -> str:
+    """Get the timing label for a show command, e.g. 'show int Gi1/0/5' -> 'show int <port>'"""
+    return PORT_COMMAND.sub(r"\1 <port>", command)
+
+
+def timed_command(session: "BaseConnection", command: str, observer: Optional[ScanObserver] = None) -> str:
+    """Run a show command, reporting its latency"""
+    started = time.perf_counter()
+    try:
+        return session.send_command(command)
+    finally:
+        (observer or NO_OBSERVER).command(command_label(command), time.perf_counter() - started)
+
+
+def send_parsed(
+    session: "BaseConnection",
+    command: str,
+    native_parser: Callable[[str], Optional[List[Dict[str, str]]]],
+    observer: Optional[ScanObserver] = None,
+) -> Any:
+    """Run a show command and parse it natively, falling back to TextFSM on unrecognised output"""
+    observer = observer or NO_OBSERVER
+    output = timed_command(session, command, observer)
+    label = command_label(command)
+
+    started = time.perf_counter()
+    parsed = native_parser(output)
+    observer.parse(label, "native", time.perf_counter() - started)
+
+    if parsed is None:
+        # TextFSM and its templates are only loaded for output the native parsers do not recognise
+        from netmiko.utilities import get_structured_data_textfsm
+        started = time.perf_counter()
+        parsed = get_structured_data_textfsm(output, platform="cisco_ios", command=command)
+        observer.parse(label, "textfsm", time.perf_counter() - started)
+    return parsed
+
+
+def stream_command(
+    session: "BaseConnection",
+    command: str,
+    read_timeout: float = 120,
+    observer: Optional[ScanObserver] = None,
+) -> Iterator[str]:
+    """Send a command and yield its output in chunks as they arrive on the channel"""
+    from netmiko import exceptions
+
+    prompt = session.find_prompt()
+    session.write_channel(command + session.RETURN)
+
+    tail = ""
+    started = time.perf_counter()
+    deadline = time.monotonic() + read_timeout
+
+    while True:
+        chunk = session.read_channel()
+        if chunk:
+            yield chunk
+            tail = (tail + chunk)[-256:]
+            if tail.rstrip().endswith(prompt):
+                # Includes the consumer's parse time, which overlaps the transfer
+                (observer or NO_OBSERVER).command(command_label(command), time.perf_counter() - started)
+                return
+            deadline = time.monotonic() + read_timeout
+        elif time.monotonic() > deadline:
+            raise exceptions.ReadTimeout(f"Timed out waiting for '{command}' to complete")
+        else:
+            time.sleep(0.01)
+
+
+def bulk_interface_stats(session: "BaseConnection", observer: Optional[ScanObserver] = None) -> Dict[str, Dict[str, str]]:
+    """Collect stats for every interface with a single streamed 'show interfaces'"""
+    parser = InterfaceStreamParser()
+    all_int_stats = {}
+
+    for chunk in stream_command(session, "show interfaces", observer=observer):
+        for stats in parser.feed(chunk):
+            all_int_stats[short_interface_name(stats["interface"])] = stats
+
+    for stats in parser.close():
+        all_int_stats[short_interface_name(stats["interface"])] = stats
+
+    return all_int_stats
+
+
+def port_stats(session: "BaseConnection", port: str, observer: Optional[ScanObserver] = None) -> Dict[str, str]:
+    """Get the 'show interfaces' detail of a single port"""
+    return send_parsed(session, f"show int {port}", parse_show_interfaces, observer)[0]
+
+
+def status_signature(interface: Dict[str, str]) -> Tuple[str, ...]:
+    """Get the parts of a 'sh int status' row that invalidate cached per-port detail when changed"""
+    return interface["status"], interface.get("vlan") or interface.get("vlan_id"), interface.get("name", "")
@@ -0,0 +1,19 @@
+"""Switch credentials named by PF_* environment variables, as CLI inventories and the web app's prewarm config use them"""
+
+import os
+import re
+from typing import Dict, Optional
+
+# Variables each backend reads after the prefix, e.g. PF_CORE_USERNAME
+CREDENTIAL_NAMES = {"ssh": ("USERNAME", "PASSWORD"), "snmp": ("COMMUNITY",)}
+
+
+def credential_prefix(reference: str) -> str:
+    """Get the variable prefix of a credential reference, e.g. 'core-dc' -> PF_CORE_DC_, or PF_ with no reference"""
+    return f"PF_{re.sub(r'[^A-Za-z0-9]', '_', reference).upper()}_" if reference else "PF_"
+
+
+def reference_credentials(reference: str, backend: str = "ssh") -> Dict[str, Optional[str]]:
+    """Read a reference's username and password, or community for SNMP, keyed in lower case; unset ones are None"""
+    prefix = credential_prefix(reference)
+    return {name.lower(): os.environ.get(prefix + name) or None for name in CREDENTIAL_NAMES[backend]}
@@ -0,0 +1,175 @@
+"""The switch scan shared by the CLI and the web app"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, ContextManager, Dict, List, Optional, Protocol, Set, Tuple
+from .collection import NO_OBSERVER, ScanObserver, bulk_interface_stats, port_stats, send_parsed, timed_command
+from .parsers import parse_interface_counters, parse_interface_status, parse_power_inline, parse_show_version
+from .records import PoeBudget, PortRecord, SwitchScan, packet_count
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
+
+COLLECTIONS = ("per-port", "bulk", "counters")
+
+# Most sessions one scan opens to a switch, its own included; IOS has 5 VTY lines by default, so one stays free
+MAX_CHANNELS = 4
+# Fewest uncached ports worth an extra session, which costs an SSH handshake and login before its first command
+MIN_SHARD_PORTS = 12
+
+# Opens another session to the switch being scanned, closing it on exit
+ChannelFactory = Callable[[], ContextManager["BaseConnection"]]
+
+
+class PortDetailCache(Protocol):
+    """Per-port 'show interfaces' detail kept between scans of one switch"""
+    def get(self, interface: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Get still-valid detail for a 'sh int status' row, or None to fetch it"""
+
+    def put(self, interface: Dict[str, str], stats: Dict[str, str]) -> None:
+        """Keep freshly fetched detail for a port"""
+
+
+def cached_port_stats(
+    session: "BaseConnection",
+    interface: Dict[str, str],
+    cache: Optional[PortDetailCache] = None,
+    observer: Optional[ScanObserver] = None,
+) -> Dict[str, str]:
+    """Get a port's detail from the cache, fetching and caching it on a miss"""
+    stats = cache.get(interface) if cache else None
+    if stats is None:
+        started = time.perf_counter()
+        stats = port_stats(session, interface["port"], observer)
+        if observer:
+            observer.port_detail(interface["port"], time.perf_counter() - started)
+        if cache:
+            cache.put(interface, stats)
+    return stats
+
+
+def port_details(
+    session: "BaseConnection",
+    interfaces: List[Dict[str, str]],
+    cache: Optional[PortDetailCache] = None,
+    observer: Optional[ScanObserver] = None,
+    channels: int = 1,
+    open_channel: Optional[ChannelFactory] = None,
+) -> Tuple[Dict[str, Dict[str, str]], Set[str]]:
+    """Get the detail of each port and the ports it came from the cache for, splitting uncached ports across up to
+    channels sessions to the switch.
+
+    session takes the first shard while open_channel opens a session for each of the others. A shard whose session
+    fails to open or drops mid-way is finished on session, so a busy VTY pool only costs the speed-up.
+    """
+    details: Dict[str, Dict[str, str]] = {}
+    cached = set()
+    uncached = []
+    for interface in interfaces:
+        stats = cache.get(interface) if cache else None
+        if stats is None:
+            uncached.append(interface)
+        else:
+            details[interface["port"]] = stats
+            cached.add(interface["port"])
+
+    shard_count = max(min(channels, MAX_CHANNELS, len(uncached) // MIN_SHARD_PORTS), 1) if open_channel else 1
+    shards = [uncached[index::shard_count] for index in range(shard_count)]
+    # Ports of shards that could not be finished on their own session
+    leftover: List[Dict[str, str]] = []
+    lock = threading.Lock()
+
+    def fetch(channel: "BaseConnection", shard: List[Dict[str, str]]) -> None:
+        for interface in shard:
+            # Workers only write their own ports, so the dict needs no lock
+            details[interface["port"]] = cached_port_stats(channel, interface, cache, observer)
+
+    def fetch_on_channel(shard: List[Dict[str, str]]) -> None:
+        try:
+            with open_channel() as channel:
+                fetch(channel, shard)
+        except Exception:
+            with lock:
+                leftover.extend(interface for interface in shard if interface["port"] not in details)
+
+    workers = [threading.Thread(target=fetch_on_channel, args=(shard,), name=f"channel-{index}", daemon=True)
+               for index, shard in enumerate(shards[1:], 1)]
+    for worker in workers:
+        worker.start()
+    try:
+        fetch(session, shards[0])
+    finally:
+        for worker in workers:
+            worker.join()
+    fetch(session, leftover)
+    return details, cached
+
+
+def poe_budgets(session: "BaseConnection", observer: Optional[ScanObserver] = None) -> Optional[List[PoeBudget]]:
+    """Get the PoE budget of each stack member, or None when 'sh power inline' is not recognised"""
+    rows = parse_power_inline(timed_command(session, "sh power inline", observer))
+    return [PoeBudget(*row) for row in rows] if rows is not None else None
+
+
+def scan_switch(
+    session: "BaseConnection",
+    collection: str = "per-port",
+    cache: Optional[PortDetailCache] = None,
+    observer: Optional[ScanObserver] = None,
+    channels: int = 1,
+    open_channel: Optional[ChannelFactory] = None,
+) -> SwitchScan:
+    """Gather a switch's notconnect ports and PoE budgets over an established session.
+
+    With open_channel, per-port detail is fetched over up to channels sessions at once (see port_details). Ports are
+    left unranked: call rank() on the result with lifetime or windowed packet counts.
+    """
+    observer = observer or NO_OBSERVER
+    with observer.phase("hostname and uptime"):
+        hostname = timed_command(session, "sh run | include hostname", observer).split()[1]
+        uptime = send_parsed(session, "sh version", parse_show_version, observer)[0]["uptime"]
+    with observer.phase("sh int status"):
+        int_status = send_parsed(session, "sh int status", parse_interface_status, observer)
+    observer.ports(len(int_status))
+    with observer.phase("poe"):
+        poe = poe_budgets(session, observer)
+
+    # Detail fetched during this scan, so no port is queried more than once
+    stats: Dict[str, Dict[str, str]] = {}
+    if collection == "bulk":
+        with observer.phase("show interfaces"):
+            stats = bulk_interface_stats(session, observer)
+        if cache:
+            for interface in int_status:
+                if interface["port"] in stats:
+                    cache.put(interface, stats[interface["port"]])
+
+    counters: Dict[str, int] = {}
+    notconnect = [interface for interface in int_status if interface["status"] == "notconnect"]
+
+    if collection == "counters":
+        # Top talker from the compact counters table; detail is only fetched for notconnect ports
+        with observer.phase("show interfaces counters"):
+            counters = parse_interface_counters(timed_command(session, "show interfaces counters", observer))
+        usage_ports = notconnect
+    else:
+        usage_ports = int_status
+
+    with observer.phase("port detail"):
+        missing = [interface for interface in usage_ports if interface["port"] not in stats]
+        fetched, cached = port_details(session, missing, cache, observer, channels, open_channel)
+        stats.update(fetched)
+        # Only detail read in this scan: cached detail is as old as the scan that fetched it, and the counters table
+        # counts different packets to 'show interfaces'
+        fresh_counters: Dict[str, int] = {}
+        for interface in usage_ports:
+            detail = stats[interface["port"]]
+            input_packets, output_packets = packet_count(detail["input_packets"]), packet_count(detail["output_packets"])
+            if input_packets is not None and output_packets is not None:
+                counters.setdefault(interface["port"], input_packets + output_packets)
+                if interface["port"] not in cached:
+                    fresh_counters[interface["port"]] = input_packets + output_packets
+
+        ports = [PortRecord.from_detail(interface, stats[interface["port"]]) for interface in notconnect]
+
+    return SwitchScan(session.host, hostname, uptime, ports, poe, counters, fresh_counters)
@@ -0,0 +1,130 @@
+"""Fleet-wide index of free (notconnect) ports, the SQLite table behind the CLI's --index and the web app's fleet.db"""
+
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Iterable, List, NamedTuple, Optional
+from .parsers import last_input_seconds
+from .records import PoeBudget, PortRecord, poe_free_watts
+
+DAY = 86400
+
+FLEET_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fleet_ports (
+    ip VARCHAR NOT NULL,
+    port VARCHAR NOT NULL,
+    hostname VARCHAR NOT NULL,
+    site VARCHAR,
+    vlan VARCHAR,
+    description VARCHAR,
+    usage_percentage FLOAT NOT NULL,
+    last_input VARCHAR,
+    last_input_at INTEGER,
+    poe_free_watts FLOAT,
+    scanned_at INTEGER NOT NULL,
+    PRIMARY KEY (ip, port)
+);
+CREATE INDEX IF NOT EXISTS ix_fleet_ports_usage ON fleet_ports (usage_percentage, last_input_at);
+CREATE INDEX IF NOT EXISTS ix_fleet_ports_site_vlan_usage ON fleet_ports (site, vlan, usage_percentage, last_input_at);
+CREATE INDEX IF NOT EXISTS ix_fleet_ports_vlan_usage ON fleet_ports (vlan, usage_percentage, last_input_at);
+CREATE INDEX IF NOT EXISTS ix_fleet_ports_last_input_at ON fleet_ports (last_input_at);
+CREATE INDEX IF NOT EXISTS ix_fleet_ports_poe_free_watts ON fleet_ports (poe_free_watts);
+"""
+
+
+class FleetPort(NamedTuple):
+    """A notconnect port from the latest scan of its switch"""
+    ip: str
+    port: str
+    hostname: str
+    site: Optional[str]
+    vlan: Optional[str]
+    description: Optional[str]
+    usage_percentage: float
+    last_input: Optional[str]
+    # Estimated time of the last input, or None when the port has never seen any
+    last_input_at: Optional[int]
+    poe_free_watts: Optional[float]
+    scanned_at: int
+
+
+FLEET_PORT_COLUMNS = ", ".join(FleetPort._fields)
+INSERT_FLEET_PORT = f"INSERT INTO fleet_ports ({FLEET_PORT_COLUMNS}) VALUES ({', '.join('?' * len(FleetPort._fields))})"
+
+
+class FleetIndex:
+    """Replace each switch's free ports on every scan, and rank candidates across the fleet without connecting.
+
+    Every call opens its own connection, so one index can be shared by worker threads.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        # SQLite allows one writer; serialise here rather than surfacing "database is locked"
+        self._write_lock = threading.Lock()
+        with closing(sqlite3.connect(self.path)) as db:
+            db.executescript(FLEET_INDEX_SCHEMA)
+
+    def update(
+        self,
+        ip: str,
+        hostname: str,
+        site: Optional[str],
+        ports: Iterable[PortRecord],
+        poe: Optional[List[PoeBudget]],
+        scanned_at: Optional[int] = None,
+    ) -> None:
+        """Index the notconnect ports of a scanned switch, keeping its previous site if none is given"""
+        scanned_at = int(time.time()) if scanned_at is None else scanned_at
+
+        rows = []
+        for port in ports:
+            idle = last_input_seconds(port.last_input)
+            rows.append(FleetPort(ip, port.port, hostname, site, port.vlan, port.description, port.usage_percentage or 0,
+                                  port.last_input, scanned_at - idle if idle is not None else None,
+                                  poe_free_watts(poe, port.port), scanned_at))
+
+        with self._write_lock, closing(sqlite3.connect(self.path)) as db, db:
+            if site is None:
+                previous = db.execute("SELECT site FROM fleet_ports WHERE ip = ? LIMIT 1", (ip,)).fetchone()
+                if previous:
+                    rows = [row._replace(site=previous[0]) for row in rows]
+            db.execute("DELETE FROM fleet_ports WHERE ip = ?", (ip,))
+            db.executemany(INSERT_FLEET_PORT, rows)
+
+    def query(
+        self,
+        site: Optional[str] = None,
+        vlan: Optional[str] = None,
+        min_poe_free_watts: Optional[float] = None,
+        min_idle_days: Optional[float] = None,
+        max_usage: Optional[float] = None,
+        limit: int = 10,
+        now: Optional[int] = None,
+    ) -> List[FleetPort]:
+        """Get the best candidate ports: least used first, then longest idle"""
+        clauses = []
+        parameters: list = []
+
+        if site is not None:
+            clauses.append("site = ?")
+            parameters.append(site)
+        if vlan is not None:
+            clauses.append("vlan = ?")
+            parameters.append(vlan)
+        if min_poe_free_watts is not None:
+            clauses.append("poe_free_watts >= ?")
+            parameters.append(min_poe_free_watts)
+        if min_idle_days is not None:
+            clauses.append("(last_input_at IS NULL OR last_input_at <= ?)")
+            parameters.append((int(time.time()) if now is None else now) - int(min_idle_days * DAY))
+        if max_usage is not None:
+            clauses.append("usage_percentage <= ?")
+            parameters.append(max_usage)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(sqlite3.connect(self.path)) as db:
+            # NULL (never) sorts first in SQLite, so ports that have never passed traffic lead each usage tier
+            rows = db.execute(f"SELECT {FLEET_PORT_COLUMNS} FROM fleet_ports{where} "
+                              "ORDER BY usage_percentage, last_input_at LIMIT ?", parameters + [limit]).fetchall()
+        return [FleetPort(*row) for row in rows]
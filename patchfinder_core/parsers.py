@@ -0,0 +1,202 @@
+"""Precompiled-regex parsers for the Cisco IOS show commands used by scans"""
+
+import re
+from typing import Dict, List, Optional
+
+# Full 'show interfaces' names to the short form used by 'sh int status'
+INTERFACE_ABBREVIATIONS = {
+    "AppGigabitEthernet": "Ap",
+    "HundredGigE": "Hu",
+    "FortyGigabitEthernet": "Fo",
+    "TwentyFiveGigE": "Twe",
+    "TenGigabitEthernet": "Te",
+    "FiveGigabitEthernet": "Fi",
+    "TwoGigabitEthernet": "Tw",
+    "GigabitEthernet": "Gi",
+    "FastEthernet": "Fa",
+    "Ethernet": "Et",
+    "Port-channel": "Po",
+    "Vlan": "Vl",
+}
+
+INTERFACE_HEADER = re.compile(r"^(\S+) is .+?, line protocol is ")
+INTERFACE_FIELDS = (
+    ("description", re.compile(r"^\s+Description: (.+?)\s*$")),
+    ("last_input", re.compile(r"^\s+Last input (.+?), output .+?, output hang ")),
+    ("input_packets", re.compile(r"^\s+(\d+) packets input,")),
+    ("output_packets", re.compile(r"^\s+(\d+) packets output,")),
+)
+
+# 'show interfaces counters' rows: Port, Octets, UcastPkts, McastPkts, BcastPkts
+COUNTERS_ROW = re.compile(r"^(\S+)\s+\d+\s+(\d+)\s+(\d+)\s+(\d+)\s*$")
+
+# Native equivalents of the ntc-templates cisco_ios 'show interfaces status' and 'show version' templates
+INTERFACE_STATUS_HEADER = re.compile(r"^Port\s+Name\s+Status\s+Vlan\s+Duplex\s+Speed\s+Type")
+INTERFACE_STATUS_STATES = r"(?P<status>err-disabled|disabled|connected|notconnect|inactive|up|down|monitoring|suspended)"
+INTERFACE_STATUS_TAIL = r"\s+(?P<vlan_id>\d+(?:,\d+)*|trunk|routed|unassigned|pvlan\s+prom)\s+(?P<duplex>\S+)\s+(?P<speed>\S+)\s*"
+INTERFACE_STATUS_ROWS = (
+    re.compile(r"^\s*(?P<port>\S+)\s+" + INTERFACE_STATUS_STATES + INTERFACE_STATUS_TAIL + r"(?P<type>.*)$"),
+    re.compile(r"^\s*(?P<port>\S+)\s+(?P<name>.+?)\s+" + INTERFACE_STATUS_STATES + r":?(?:\s+\S+)?"
+               + INTERFACE_STATUS_TAIL + r"(?P<type>.*)$"),
+)
+IGNORED_LINE = re.compile(r"^(?:\s*|-+\s*|Load\s+for\s+.*|Time\s+source\s+is.*)$")
+VERSION_UPTIME = re.compile(r"^\s*(\S+)\s+uptime\s+is\s+(.+)$", re.MULTILINE)
+
+# 'Last input' ages: hh:mm:ss under a day, then unit pairs such as 1d02h, 3w4d or 1y2w
+LAST_INPUT_CLOCK = re.compile(r"^(\d+):(\d{2}):(\d{2})$")
+LAST_INPUT_UNITS = re.compile(r"(\d+)([ywdh])")
+LAST_INPUT_SECONDS = {"y": 365 * 86400, "w": 7 * 86400, "d": 86400, "h": 3600}
+# Stack member of a port such as Gi2/0/14, matching the 'sh power inline' module number
+PORT_MEMBER = re.compile(r"^[A-Za-z-]+(\d+)/")
+
+
+def short_interface_name(interface: str) -> str:
+    """Convert a full interface name (GigabitEthernet1/0/1) to its short form (Gi1/0/1)"""
+    for full_name, short_name in INTERFACE_ABBREVIATIONS.items():
+        if interface.startswith(full_name):
+            return short_name + interface[len(full_name):]
+    return interface
+
+
+def last_input_seconds(last_input: str) -> Optional[int]:
+    """Convert a 'Last input' age to seconds, or None for 'never' and unrecognised values"""
+    clock = LAST_INPUT_CLOCK.match(last_input)
+    if clock:
+        hours, minutes, seconds = map(int, clock.groups())
+        return hours * 3600 + minutes * 60 + seconds
+
+    units = LAST_INPUT_UNITS.findall(last_input)
+    if not units or "".join(value + unit for value, unit in units) != last_input:
+        return None
+    return sum(int(value) * LAST_INPUT_SECONDS[unit] for value, unit in units)
+
+
+def port_member(port: str) -> Optional[str]:
+    """Get the stack member number of a port, or None for ports without a slot, e.g. Vlan1"""
+    member = PORT_MEMBER.match(port)
+    return member.group(1) if member else None
+
+
+class InterfaceStreamParser:
+    """Incrementally parse 'show interfaces' output into per-interface stats"""
+    def __init__(self):
+        self._partial_line = ""
+        self._current: Optional[Dict[str, str]] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """Consume a chunk of output and return any interfaces completed by it"""
+        lines = (self._partial_line + chunk).split("\n")
+        self._partial_line = lines.pop()
+        completed = []
+
+        for line in lines:
+            finished = self._parse_line(line.rstrip("\r"))
+            if finished:
+                completed.append(finished)
+
+        return completed
+
+    def close(self) -> List[Dict[str, str]]:
+        """Flush the remaining buffered output and return the final interfaces"""
+        completed = self.feed("\n")
+        if self._current:
+            completed.append(self._current)
+            self._current = None
+        return completed
+
+    def _parse_line(self, line: str) -> Optional[Dict[str, str]]:
+        header = INTERFACE_HEADER.match(line)
+        if header:
+            finished = self._current
+            self._current = {
+                "interface": header.group(1),
+                "description": "",
+                "last_input": "",
+                "input_packets": "",
+                "output_packets": "",
+            }
+            return finished
+
+        if self._current:
+            for field, pattern in INTERFACE_FIELDS:
+                match = pattern.match(line)
+                if match:
+                    self._current[field] = match.group(1)
+                    break
+        return None
+
+
+def parse_interface_counters(counters_output: str) -> Dict[str, int]:
+    """Total the unicast, multicast and broadcast packets in and out of each port"""
+    packet_totals: Dict[str, int] = {}
+
+    for line in counters_output.splitlines():
+        counters_row = COUNTERS_ROW.match(line)
+        if counters_row:
+            port = counters_row.group(1)
+            packet_totals[port] = packet_totals.get(port, 0) + sum(int(count) for count in counters_row.groups()[1:])
+
+    return packet_totals
+
+
+def parse_interface_status(status_output: str) -> Optional[List[Dict[str, str]]]:
+    """Parse 'sh int status' output, or return None when a line is not recognised"""
+    interfaces = []
+    header_found = False
+
+    for line in status_output.splitlines():
+        if not header_found:
+            header_found = bool(INTERFACE_STATUS_HEADER.match(line))
+            if not header_found and not IGNORED_LINE.match(line):
+                return None
+            continue
+
+        status_row = INTERFACE_STATUS_ROWS[0].match(line) or INTERFACE_STATUS_ROWS[1].match(line)
+        if status_row:
+            interface = {"port": "", "name": "", "fc_mode": ""}
+            interface.update(status_row.groupdict())
+            interfaces.append(interface)
+        elif not IGNORED_LINE.match(line):
+            return None
+
+    return interfaces if header_found else None
+
+
+def parse_show_interfaces(interfaces_output: str) -> Optional[List[Dict[str, str]]]:
+    """Parse 'show interfaces' output, or return None when no interface is recognised"""
+    parser = InterfaceStreamParser()
+    interfaces = parser.feed(interfaces_output) + parser.close()
+    return interfaces or None
+
+
+def parse_show_version(version_output: str) -> Optional[List[Dict[str, str]]]:
+    """Parse the hostname and uptime from 'sh version', or return None when they are not found"""
+    uptime = VERSION_UPTIME.search(version_output)
+    if not uptime:
+        return None
+    return [{"hostname": uptime.group(1), "uptime": uptime.group(2)}]
+
+
+def parse_power_inline(power_output: str) -> Optional[List[List[str]]]:
+    """Parse 'sh power inline' into [switch, available, used, free] rows, or return None when not recognised"""
+    switch_power = power_output.replace("-", "").split()
+    switch_power_parsed = []
+
+    try:
+        for item in range(7, switch_power.index("Interface")):
+            if switch_power[item].isdigit():
+                switch_power_parsed.append(switch_power[item:item+4])
+
+        if not switch_power_parsed:
+            if (switch_power[0].startswith("Available") and
+                switch_power[1].startswith("Used") and
+                switch_power[2].startswith("Remaining")):
+
+                get_available = switch_power[0].split(":")[1].replace("(w)", "")
+                get_used = switch_power[1].split(":")[1].replace("(w)", "")
+                get_remaining = switch_power[2].split(":")[1].replace("(w)", "")
+                switch_power_parsed.append(["System Total", get_available, get_used, get_remaining])
+    except (IndexError, ValueError):
+        return None
+
+    return switch_power_parsed
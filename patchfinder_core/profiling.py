@@ -0,0 +1,195 @@
+"""Per-phase profile of a single scan: wall time, memory allocated and slow ports, with optional cProfile and
+sampled-stack dumps for flame graphs.
+
+Everything here is standard library and only imported when a profile is asked for.
+"""
+
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .collection import ScanObserver
+
+# A port is an outlier when its detail took this many times the median
+OUTLIER_FACTOR = 3.0
+MAX_OUTLIERS = 10
+SAMPLE_INTERVAL = 0.005
+
+# tracemalloc is process-wide, so overlapping profiles share one trace
+_tracing_lock = threading.Lock()
+_tracing_profiles = 0
+
+
+@dataclass
+class PhaseTiming:
+    """Totals for every entry into one named phase"""
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    # Net bytes still allocated when the phase ended, and the most allocated at once during it
+    allocated: int = 0
+    peak: int = 0
+
+
+@dataclass
+class _OpenPhase:
+    timing: PhaseTiming
+    started: float
+    memory: int
+    peak: int = 0
+
+
+class ScanProfile(ScanObserver):
+    """Profile the scan run on the thread that enters it; use as a context manager around the scan.
+
+    Allocations are traced with tracemalloc, which slows the scan down and counts every thread in the process, so
+    concurrent scans add to each other's figures; whoever runs scans side by side sets allocations_shared when they
+    overlapped. cprofile and stacks add their own overhead on top.
+    """
+    def __init__(self, allocations: bool = True, cprofile: bool = False, stacks: bool = False,
+                 sample_interval: float = SAMPLE_INTERVAL):
+        self.allocations = allocations
+        self.cprofile = cprofile
+        self.stacks = stacks
+        self.sample_interval = sample_interval
+        self.phases: Dict[str, PhaseTiming] = {}
+        self.port_timings: List[Tuple[str, float]] = []
+        self.samples: Dict[str, int] = {}
+        self.wall_seconds = 0.0
+        self.allocations_shared = False
+        self._open: List[_OpenPhase] = []
+        self._profiler = None
+        self._sampler: Optional[threading.Thread] = None
+        self._sampling = threading.Event()
+        self._started = 0.0
+
+    def __enter__(self) -> "ScanProfile":
+        global _tracing_profiles
+        if self.allocations:
+            import tracemalloc
+            with _tracing_lock:
+                if not _tracing_profiles:
+                    tracemalloc.start()
+                _tracing_profiles += 1
+        if self.stacks:
+            self._sampling.set()
+            self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),),
+                                             name="profile-sampler", daemon=True)
+            self._sampler.start()
+        if self.cprofile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _tracing_profiles
+        self.wall_seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampling.clear()
+            self._sampler.join()
+        if self.allocations:
+            import tracemalloc
+            with _tracing_lock:
+                _tracing_profiles -= 1
+                if not _tracing_profiles:
+                    tracemalloc.stop()
+
+    # [observer] Hooks called by the shared scanner
+    def port_detail(self, port: str, seconds: float) -> None:
+        self.port_timings.append((port, seconds))
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        timing = self.phases.setdefault(name, PhaseTiming(name))
+        memory = self._traced()
+        if self._open:
+            # Resetting the peak for this phase would lose it for the phase around it, so hand it up first
+            self._open[-1].peak = max(self._open[-1].peak, self._traced(peak=True))
+        self._reset_peak()
+        current = _OpenPhase(timing, time.perf_counter(), memory)
+        self._open.append(current)
+        try:
+            yield
+        finally:
+            self._open.pop()
+            current.peak = max(current.peak, self._traced(peak=True))
+            timing.seconds += time.perf_counter() - current.started
+            timing.calls += 1
+            timing.allocated += self._traced() - memory
+            timing.peak = max(timing.peak, current.peak - memory)
+            if self._open:
+                self._open[-1].peak = max(self._open[-1].peak, current.peak)
+
+    def _traced(self, peak: bool = False) -> int:
+        if not self.allocations:
+            return 0
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1 if peak else 0]
+
+    def _reset_peak(self) -> None:
+        if self.allocations:
+            import tracemalloc
+            tracemalloc.reset_peak()
+
+    def _sample(self, thread_id: int) -> None:
+        """Count the scanning thread's stack every sample_interval, root first, for collapsed-stack output"""
+        while self._sampling.is_set():
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                collapsed = ";".join(reversed(stack))
+                self.samples[collapsed] = self.samples.get(collapsed, 0) + 1
+            time.sleep(self.sample_interval)
+
+    def outliers(self, factor: float = OUTLIER_FACTOR, limit: int = MAX_OUTLIERS) -> List[Tuple[str, float]]:
+        """Ports whose detail took at least factor times the median, slowest first"""
+        if len(self.port_timings) < 2:
+            return []
+        threshold = statistics.median(seconds for _, seconds in self.port_timings) * factor
+        slow = [timing for timing in self.port_timings if timing[1] >= threshold]
+        return sorted(slow, key=lambda timing: -timing[1])[:limit]
+
+    def report(self) -> Dict[str, Any]:
+        """The profile as plain data, for JSON"""
+        port_seconds = [seconds for _, seconds in self.port_timings]
+        return {
+            "wall_seconds": self.wall_seconds,
+            "phases": [
+                {"name": timing.name, "seconds": timing.seconds, "calls": timing.calls,
+                 "allocated_bytes": timing.allocated if self.allocations else None,
+                 "peak_bytes": timing.peak if self.allocations else None}
+                for timing in self.phases.values()
+            ],
+            "ports": {
+                "count": len(port_seconds),
+                "median_seconds": statistics.median(port_seconds) if port_seconds else None,
+                "outliers": [{"port": port, "seconds": seconds} for port, seconds in self.outliers()],
+            },
+            "allocations_shared": self.allocations and self.allocations_shared,
+        }
+
+    def pstats_data(self) -> bytes:
+        """The cProfile statistics in the file format pstats, snakeviz and gprof2dot read"""
+        import marshal
+        if self._profiler is None:
+            raise ValueError("The scan was not profiled with cProfile")
+        self._profiler.create_stats()
+        return marshal.dumps(self._profiler.stats)
+
+    def collapsed_stacks(self) -> str:
+        """Sampled stacks in the collapsed format flamegraph.pl and speedscope read: 'root;...;leaf count' lines"""
+        if not self.stacks:
+            raise ValueError("The scan was not profiled with stack sampling")
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
@@ -0,0 +1,78 @@
+"""Usage ranking of notconnect ports against the busiest port on a switch or across a fleet"""
+
+import heapq
+from typing import TYPE_CHECKING, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .records import PortRecord, SwitchScan
+
+
+def usage_percentages(packets: Sequence[int], top: int) -> List[float]:
+    """Get each packet count as a percentage of the busiest port's, rounded to two places"""
+    if top <= 0:
+        return [0.0] * len(packets)
+    return [round(count / top * 100, 2) for count in packets]
+
+
+def rank_ports(ports: Sequence["PortRecord"], packets: Mapping[str, int], top: Optional[int] = None) -> None:
+    """Set every port's usage_percentage in one pass, relative to top (the busiest count in packets by default)"""
+    top = max(packets.values(), default=0) if top is None else top
+    counted = []
+    counts = []
+    for port in ports:
+        count = packets.get(port.port, port.total_packets)
+        if count is None:
+            port.usage_percentage = None
+        else:
+            counted.append(port)
+            counts.append(count)
+
+    for port, percentage in zip(counted, usage_percentages(counts, top)):
+        port.usage_percentage = percentage
+
+
+def least_used(ports: Iterable["PortRecord"], k: int) -> List["PortRecord"]:
+    """Get the k ranked ports with the lowest usage, least used first and in port order on ties"""
+    return heapq.nsmallest(k, (port for port in ports if port.usage_percentage is not None),
+                           key=lambda port: port.usage_percentage)
+
+
+class FleetRanking:
+    """The k least-used notconnect ports across many switches, relative to the busiest port on any of them.
+
+    Dividing by one fleet-wide maximum keeps the order of raw packet counts, so only the k lowest counts
+    seen so far are held and switches can be added as their scans finish.
+    """
+    def __init__(self, k: int):
+        self.k = k
+        self.top = 0
+        self.switches = 0
+        # Max-heap of the k lowest counts: (-packets, -arrival, host, hostname, port); arrival breaks ties first-seen first
+        self._heap: List[Tuple[int, int, str, str, "PortRecord"]] = []
+        self._arrivals = 0
+
+    def add(self, scan: "SwitchScan", packets: Optional[Mapping[str, int]] = None) -> None:
+        """Include a switch, from its lifetime counters by default"""
+        packets = scan.counters if packets is None else packets
+        self.top = max(self.top, max(packets.values(), default=0))
+        self.switches += 1
+        if self.k <= 0:
+            return
+
+        for port in scan.ports:
+            count = packets.get(port.port, port.total_packets)
+            if count is None:
+                continue
+            self._arrivals += 1
+            entry = (-count, -self._arrivals, scan.host, scan.hostname, port)
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def least_used(self) -> List[Tuple[str, str, "PortRecord", float]]:
+        """Get (host, hostname, port, fleet usage percentage) for the k least-used ports, least used first"""
+        entries = sorted(self._heap, reverse=True)
+        percentages = usage_percentages([-entry[0] for entry in entries], self.top)
+        return [(host, hostname, port, percentage)
+                for (_, _, host, hostname, port), percentage in zip(entries, percentages)]
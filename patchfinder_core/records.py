@@ -0,0 +1,126 @@
+"""Compact records for scanned switches, their notconnect ports and PoE budgets"""
+
+from typing import Dict, List, Mapping, Optional
+from .parsers import port_member
+from .ranking import least_used, rank_ports, usage_percentages
+
+
+def packet_count(value: Optional[str]) -> Optional[int]:
+    """Convert a packet counter to an int, or None when the switch did not report a number"""
+    return int(value) if value and value.isdigit() else None
+
+
+class PortRecord:
+    """A notconnect port with its counters parsed once; far smaller than the dicts and lists it replaces"""
+    __slots__ = ("port", "description", "vlan", "last_input", "input_packets", "output_packets", "usage_percentage")
+
+    def __init__(
+        self,
+        port: str,
+        description: str,
+        vlan: Optional[str],
+        last_input: str,
+        input_packets: Optional[int],
+        output_packets: Optional[int],
+        usage_percentage: Optional[float] = None,
+    ):
+        self.port = port
+        self.description = description
+        self.vlan = vlan
+        self.last_input = last_input
+        self.input_packets = input_packets
+        self.output_packets = output_packets
+        self.usage_percentage = usage_percentage
+
+    @classmethod
+    def from_detail(cls, interface: Mapping[str, str], stats: Mapping[str, str]) -> "PortRecord":
+        """Build a record from a 'sh int status' row and the port's 'show interfaces' detail"""
+        return cls(
+            interface["port"],
+            interface.get("name", ""),
+            # TextFSM names the column 'vlan_id', older templates 'vlan'
+            interface.get("vlan") or interface.get("vlan_id"),
+            stats["last_input"],
+            packet_count(stats["input_packets"]),
+            packet_count(stats["output_packets"]),
+        )
+
+    @property
+    def total_packets(self) -> Optional[int]:
+        if self.input_packets is None or self.output_packets is None:
+            return None
+        return self.input_packets + self.output_packets
+
+    def rank(self, packets: Optional[int], top: int) -> None:
+        """Set the port's usage as a percentage of the busiest port's packets"""
+        self.usage_percentage = None if packets is None else usage_percentages([packets], top)[0]
+
+    def __repr__(self) -> str:
+        return f"PortRecord({self.port!r}, usage_percentage={self.usage_percentage!r})"
+
+
+class PoeBudget:
+    """The PoE budget of one stack member, or the whole switch ('System Total')"""
+    __slots__ = ("member", "available", "used", "free")
+
+    def __init__(self, member: str, available: str, used: str, free: str):
+        self.member = member
+        self.available = available
+        self.used = used
+        self.free = free
+
+    @property
+    def free_watts(self) -> Optional[float]:
+        try:
+            return float(self.free)
+        except ValueError:
+            return None
+
+    def __repr__(self) -> str:
+        return f"PoeBudget({self.member!r}, free={self.free!r})"
+
+
+def poe_free_watts(budgets: Optional[List[PoeBudget]], port: str) -> Optional[float]:
+    """Get the PoE budget left on a port's stack member, or the system total on single supplies"""
+    by_member = {budget.member: budget for budget in budgets or []}
+    budget = by_member.get(port_member(port), by_member.get("System Total"))
+    return budget.free_watts if budget else None
+
+
+class SwitchScan:
+    """Everything one scan learned about a switch"""
+    __slots__ = ("host", "hostname", "uptime", "ports", "poe", "counters", "fresh_counters")
+
+    def __init__(
+        self,
+        host: str,
+        hostname: str,
+        uptime: str,
+        ports: List[PortRecord],
+        poe: Optional[List[PoeBudget]],
+        counters: Dict[str, int],
+        fresh_counters: Optional[Dict[str, int]] = None,
+    ):
+        self.host = host
+        self.hostname = hostname
+        self.uptime = uptime
+        self.ports = ports
+        self.poe = poe
+        # Lifetime packets of every port with numeric counters, notconnect or not
+        self.counters = counters
+        # The counters read from 'show interfaces' detail in this scan, leaving out detail reused from a port cache and
+        # other counter sources, so they are the only ones safe to record as history; all of counters by default
+        self.fresh_counters = counters if fresh_counters is None else fresh_counters
+
+    def rank(self, packets: Optional[Mapping[str, int]] = None) -> None:
+        """Set each notconnect port's usage relative to the busiest port, from lifetime counters by default"""
+        rank_ports(self.ports, self.counters if packets is None else packets)
+
+    def least_used(self, k: int) -> List[PortRecord]:
+        """Get the k least-used notconnect ports without sorting the rest"""
+        return least_used(self.ports, k)
+
+    @property
+    def lowest(self) -> Optional[PortRecord]:
+        """The least-used notconnect port, the first one on a tie"""
+        return next(iter(self.least_used(1)), None)
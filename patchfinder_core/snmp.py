@@ -0,0 +1,244 @@
+"""SNMP collection: the same SwitchScan as an SSH scan, from IF-MIB and POWER-ETHERNET-MIB tables over GETBULK.
+
+Every table column is walked at once, so a whole switch takes a handful of request/response pairs instead of one
+'show int' per port. Needs pysnmp (pip install pysnmp), which is only imported when a switch is scanned over SNMP.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+from .collection import NO_OBSERVER, ScanObserver
+from .records import PoeBudget, PortRecord, SwitchScan
+
+SNMP_PORT = 161
+
+SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+SYS_NAME = "1.3.6.1.2.1.1.5.0"
+
+# Table columns walked for every scan, all indexed by ifIndex except the PoE budgets (indexed by PSE group)
+COLUMNS = {
+    "type": "1.3.6.1.2.1.2.2.1.3",                 # ifType
+    "admin_status": "1.3.6.1.2.1.2.2.1.7",         # ifAdminStatus
+    "oper_status": "1.3.6.1.2.1.2.2.1.8",          # ifOperStatus
+    "last_change": "1.3.6.1.2.1.2.2.1.9",          # ifLastChange
+    "name": "1.3.6.1.2.1.31.1.1.1.1",              # ifName
+    "in_ucast": "1.3.6.1.2.1.31.1.1.1.7",          # ifHCInUcastPkts
+    "in_mcast": "1.3.6.1.2.1.31.1.1.1.8",          # ifHCInMulticastPkts
+    "in_bcast": "1.3.6.1.2.1.31.1.1.1.9",          # ifHCInBroadcastPkts
+    "out_ucast": "1.3.6.1.2.1.31.1.1.1.11",        # ifHCOutUcastPkts
+    "out_mcast": "1.3.6.1.2.1.31.1.1.1.12",        # ifHCOutMulticastPkts
+    "out_bcast": "1.3.6.1.2.1.31.1.1.1.13",        # ifHCOutBroadcastPkts
+    "alias": "1.3.6.1.2.1.31.1.1.1.18",            # ifAlias
+    "vlan": "1.3.6.1.4.1.9.9.68.1.2.2.1.2",        # CISCO-VLAN-MEMBERSHIP-MIB vmVlan, access ports only
+    "poe_power": "1.3.6.1.2.1.105.1.3.1.1.2",      # pethMainPsePower (W)
+    "poe_consumption": "1.3.6.1.2.1.105.1.3.1.1.4",  # pethMainPseConsumptionPower (W)
+}
+
+# ethernetCsmacd and ieee8023adLag: the physical ports and port-channels 'sh int status' lists
+PORT_TYPES = {6, 161}
+STATUS_UP = 1
+STATUS_DOWN = 2
+
+INPUT_COLUMNS = ("in_ucast", "in_mcast", "in_bcast")
+OUTPUT_COLUMNS = ("out_ucast", "out_mcast", "out_bcast")
+
+
+class SnmpError(Exception):
+    """The switch returned an SNMP error, or did not answer at all"""
+
+
+class SnmpTimeout(SnmpError):
+    """No response; SNMPv2c agents silently drop requests with the wrong community"""
+
+
+def format_uptime(seconds: int) -> str:
+    """Format an uptime like IOS 'show version', e.g. '12 weeks, 3 days, 4 hours, 5 minutes'"""
+    minutes = seconds // 60
+    parts = []
+    for unit, size in (("year", 525600), ("week", 10080), ("day", 1440), ("hour", 60), ("minute", 1)):
+        count, minutes = divmod(minutes, size)
+        if count or (unit == "minute" and not parts):
+            parts.append(f"{count} {unit}{'s' if count != 1 else ''}")
+    return ", ".join(parts)
+
+
+def format_age(seconds: int) -> str:
+    """Format an age like the IOS 'Last input' field: 01:02:03, 3d04h, 5w2d or 1y10w"""
+    days, remainder = divmod(seconds, 86400)
+    if not days:
+        return f"{remainder // 3600:02d}:{remainder % 3600 // 60:02d}:{remainder % 60:02d}"
+    if days < 7:
+        return f"{days}d{remainder // 3600}h"
+    if days < 365:
+        return f"{days // 7}w{days % 7}d"
+    return f"{days // 365}y{days % 365 // 7}w"
+
+
+async def _request(engine, auth, target, generator, *arguments) -> List:
+    """Send one request with the OIDs already built; hlapi's get_cmd/bulk_cmd would look every OID up in the MIBs
+    first, which costs more than the round trip itself"""
+    from pysnmp.hlapi.v3arch.asyncio import ContextData
+    from pysnmp.hlapi.v3arch.asyncio.cmdgen import LCD
+
+    context = ContextData()
+    address_name, _ = LCD.configure(engine, auth, target, context.contextName)
+    future = asyncio.get_running_loop().create_future()
+
+    def respond(engine, handle, error_indication, error_status, error_index, var_binds, context):
+        if not future.cancelled():
+            future.set_result((error_indication, error_status, var_binds))
+
+    generator.send_varbinds(engine, address_name, context.contextEngineId, context.contextName, *arguments, respond)
+    error_indication, error_status, var_binds = await future
+    _raise_for_error(error_indication, error_status)
+    return var_binds
+
+
+def _var_binds(*oids: str) -> List[Tuple]:
+    from pysnmp.proto.rfc1902 import Null, ObjectName
+    return [(ObjectName(oid), Null("")) for oid in oids]
+
+
+async def _get(engine, auth, target, *oids: str) -> List:
+    from pysnmp.entity.rfc3413.cmdgen import GetCommandGenerator
+
+    var_binds = await _request(engine, auth, target, GetCommandGenerator(), _var_binds(*oids))
+    return [value for _, value in var_binds]
+
+
+async def _walk_columns(engine, auth, target, columns: Dict[str, str], max_repetitions: int,
+                        observer: ScanObserver) -> Dict[str, Dict[str, object]]:
+    """Walk several table columns side by side with GETBULK, returning {column: {index: value}}"""
+    from pysnmp.entity.rfc3413.cmdgen import BulkCommandGenerator
+    from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+
+    values: Dict[str, Dict[str, object]] = {name: {} for name in columns}
+    cursors = dict(columns)
+
+    while cursors:
+        names = list(cursors)
+        started = time.perf_counter()
+        var_binds = await _request(engine, auth, target, BulkCommandGenerator(), 0, max_repetitions,
+                                   _var_binds(*(cursors[name] for name in names)))
+        observer.command("snmp getbulk", time.perf_counter() - started)
+
+        finished = set()
+        # Rows come back one repetition at a time, and the agent may cut the last one short to fit its packet size
+        for position, (oid, value) in enumerate(var_binds):
+            name = names[position % len(names)]
+            prefix = columns[name] + "."
+            oid = str(oid)
+            if name in finished or isinstance(value, (EndOfMibView, NoSuchObject, NoSuchInstance)) or not oid.startswith(prefix):
+                finished.add(name)
+                continue
+            values[name][oid[len(prefix):]] = value
+            cursors[name] = oid
+
+        for name in finished:
+            del cursors[name]
+        if not var_binds:
+            break
+
+    return values
+
+
+def _raise_for_error(error_indication, error_status) -> None:
+    if error_indication:
+        from pysnmp.proto.errind import RequestTimedOut
+        if isinstance(error_indication, RequestTimedOut):
+            raise SnmpTimeout("No SNMP response (check the address, community and ACLs)")
+        raise SnmpError(str(error_indication))
+    if error_status:
+        raise SnmpError(f"SNMP error: {error_status.prettyPrint()}")
+
+
+def _packets(row: Dict[str, object], columns: Tuple[str, ...]) -> Optional[int]:
+    if any(row.get(column) is None for column in columns):
+        return None
+    return sum(int(row[column]) for column in columns)
+
+
+async def _collect(host: str, community: str, port: int, timeout: float, retries: int, max_repetitions: int,
+                   observer: ScanObserver) -> SwitchScan:
+    from pysnmp.hlapi.v3arch.asyncio import CommunityData, SnmpEngine, UdpTransportTarget
+
+    engine = SnmpEngine()
+    try:
+        auth = CommunityData(community, mpModel=1)
+        target = await UdpTransportTarget.create((host, port), timeout=timeout, retries=retries)
+
+        with observer.phase("hostname and uptime"):
+            started = time.perf_counter()
+            sys_name, sys_uptime = await _get(engine, auth, target, SYS_NAME, SYS_UPTIME)
+            observer.command("snmp get", time.perf_counter() - started)
+        with observer.phase("snmp walk"):
+            columns = await _walk_columns(engine, auth, target, COLUMNS, max_repetitions, observer)
+    finally:
+        engine.close_dispatcher()
+
+    with observer.phase("build records"):
+        return _scan_from_columns(host, sys_name, sys_uptime, columns, observer)
+
+
+def _scan_from_columns(host: str, sys_name, sys_uptime, columns: Dict[str, Dict[str, object]],
+                       observer: ScanObserver) -> SwitchScan:
+    started = time.perf_counter()
+    uptime_ticks = int(sys_uptime)
+    rows: Dict[str, Dict[str, object]] = {}
+    for name, column in columns.items():
+        for index, value in column.items():
+            rows.setdefault(index, {})[name] = value
+
+    counters: Dict[str, int] = {}
+    ports: List[PortRecord] = []
+    interfaces = 0
+    for index, row in rows.items():
+        if "name" not in row or int(row.get("type", 0)) not in PORT_TYPES:
+            continue
+        interfaces += 1
+        port = str(row["name"])
+        input_packets, output_packets = _packets(row, INPUT_COLUMNS), _packets(row, OUTPUT_COLUMNS)
+        if input_packets is not None and output_packets is not None:
+            counters[port] = input_packets + output_packets
+
+        # notconnect: enabled, but the link is down
+        if int(row.get("admin_status", 0)) != STATUS_UP or int(row.get("oper_status", 0)) != STATUS_DOWN:
+            continue
+
+        # ifLastChange is when the link went down, the closest SNMP has to the last input
+        if not input_packets:
+            last_input = "never"
+        else:
+            last_input = format_age(max(0, uptime_ticks - int(row.get("last_change", 0))) // 100)
+        vlan = row.get("vlan")
+        ports.append(PortRecord(port, str(row.get("alias", "")), str(int(vlan)) if vlan is not None else "",
+                                last_input, input_packets, output_packets))
+
+    poe = None
+    if columns["poe_power"]:
+        poe = []
+        for group, power in sorted(columns["poe_power"].items(), key=lambda item: int(item[0])):
+            used = float(int(columns["poe_consumption"].get(group, 0)))
+            poe.append(PoeBudget(group, f"{float(int(power)):.1f}", f"{used:.1f}", f"{int(power) - used:.1f}"))
+
+    observer.parse("snmp getbulk", "snmp", time.perf_counter() - started)
+    observer.ports(interfaces)
+
+    # sysName carries the domain when one is configured; 'sh run | include hostname' does not
+    hostname = str(sys_name).split(".")[0]
+    # IF-MIB unicast, multicast and broadcast totals count different packets to 'show interfaces', so none of them
+    # are fresh: recorded alongside SSH snapshots of the same ports, they would turn into bogus deltas
+    return SwitchScan(host, hostname, format_uptime(uptime_ticks // 100), ports, poe, counters, fresh_counters={})
+
+
+def snmp_scan(
+    host: str,
+    community: str,
+    port: int = SNMP_PORT,
+    timeout: float = 2,
+    retries: int = 1,
+    max_repetitions: int = 25,
+    observer: Optional[ScanObserver] = None,
+) -> SwitchScan:
+    """Scan a switch over SNMPv2c, returning an unranked SwitchScan like scan_switch()"""
+    return asyncio.run(_collect(host, community, port, timeout, retries, max_repetitions, observer or NO_OBSERVER))
@@ -1,8 +1,9 @@
+import argparse
 import os
 import sys
 import getpass
 from sqlalchemy.orm import Session
-from models import User, SessionLocal, create_db_and_tables
+from models import User, SessionLocal, create_db_and_tables, mark_users_changed
 from passlib.context import CryptContext
 
 # Initialize the database and tables if needed
@@ -17,6 +18,21 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def delete_user(username):
+    db: Session = SessionLocal()
+    user = db.query(User).filter(User.username == username).first()
+
+    if not user:
+        print(f"User '{username}' does not exist.")
+        db.close()
+        return
+
+    db.delete(user)
+    db.commit()
+    mark_users_changed()
+    print(f"User '{username}' deleted. Their tokens stop working on the next request.")
+    db.close()
+
 def main():
     db: Session = SessionLocal()
     username = input("Enter new username: ")
@@ -38,8 +54,16 @@ def main():
     db.add(user)
     db.commit()
     db.refresh(user)
+    mark_users_changed()
     print(f"User '{username}' added successfully.")
     db.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Add a PatchFinder web app user")
+    parser.add_argument("--delete", metavar="USERNAME", help="Delete a user instead")
+    args = parser.parse_args()
+
+    if args.delete:
+        delete_user(args.delete)
+    else:
+        main()
@@ -1,16 +1,22 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from .models import TokenData, User, SessionLocal
+from .models import DB_PATH, User, SessionLocal
+import heapq
 import os
+import threading
+import time
+import uuid
 
 SECRET_KEY = os.environ.get("SECRET_KEY", "a-very-secret-key")
 ALGORITHM = os.environ.get("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 10))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -45,11 +51,100 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # A unique ID lets a single token be revoked on logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, detached from any database session"""
+    id: int
+    username: str
+
+
+class UserCache:
+    """Cache principals by username for a TTL, dropping them all when users.db is marked as changed"""
+    def __init__(self, ttl: int = USER_CACHE_TTL, path: str = DB_PATH):
+        self.ttl = ttl
+        self.path = path
+        self._entries: Dict[str, Tuple[Principal, float]] = {}
+        self._changed_at = self._modified_at()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Principal]:
+        """Get a user's principal, loading it from the database on a miss or after expiry"""
+        modified_at = self._modified_at()
+        now = time.monotonic()
+
+        with self._lock:
+            if modified_at != self._changed_at:
+                # add_user.py touches users.db after every change
+                self._entries.clear()
+                self._changed_at = modified_at
+            entry = self._entries.get(username)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        # Unknown users are not cached, so new accounts work straight away
+        with SessionLocal() as db:
+            user = get_user(db, username)
+        if user is None:
+            self.invalidate(username)
+            return None
+
+        principal = Principal(id=user.id, username=user.username)
+        with self._lock:
+            self._entries[username] = (principal, now + self.ttl)
+        return principal
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        """Drop one user's principal, or every cached principal"""
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def _modified_at(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return 0
+
+
+class TokenRevocations:
+    """Revoked token IDs, each forgotten once the token would have expired anyway"""
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def revoke(self, claims: Dict[str, Any]) -> None:
+        """Revoke a token until its expiry"""
+        expires_at = float(claims["exp"])
+        with self._lock:
+            self._evict(time.time())
+            self._revoked[claims["jti"]] = expires_at
+            heapq.heappush(self._expiries, (expires_at, claims["jti"]))
+
+    def is_revoked(self, token_id: str) -> bool:
+        with self._lock:
+            self._evict(time.time())
+            return token_id in self._revoked
+
+    def _evict(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            _, token_id = heapq.heappop(self._expiries)
+            self._revoked.pop(token_id, None)
+
+
+user_cache = UserCache()
+token_revocations = TokenRevocations()
+
+
+async def get_token_claims(token: Annotated[str, Depends(oauth2_scheme)]) -> Dict[str, Any]:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,12 +153,20 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("jti") is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, token_data.username)
-    if user is None:
+    if token_revocations.is_revoked(payload["jti"]):
         raise credentials_exception
+    return payload
+
+async def get_current_user(claims: Annotated[Dict[str, Any], Depends(get_token_claims)]) -> Principal:
+    user = user_cache.get(claims["sub"])
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
@@ -0,0 +1,83 @@
+"""Scan metrics and per-port detail caching for switch sessions"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from patchfinder_core import ScanObserver, SwitchScan, status_signature
+from patchfinder_core.snmp import SNMP_PORT, snmp_scan
+from .metrics import COMMAND_DURATION, PARSE_DURATION, PORTS_SCANNED
+
+PORT_STATS_TTL = int(os.environ.get("PORT_STATS_TTL", 900))
+
+SNMP_PORT = int(os.environ.get("SNMP_PORT", SNMP_PORT))
+SNMP_TIMEOUT = float(os.environ.get("SNMP_TIMEOUT", 2))
+SNMP_RETRIES = int(os.environ.get("SNMP_RETRIES", 1))
+
+
+class MetricsObserver(ScanObserver):
+    """Feed scan timings from the shared scanner into /metrics"""
+    def command(self, label: str, seconds: float) -> None:
+        COMMAND_DURATION.observe(seconds, command=label)
+
+    def parse(self, label: str, parser: str, seconds: float) -> None:
+        PARSE_DURATION.observe(seconds, command=label, parser=parser)
+
+    def ports(self, count: int) -> None:
+        PORTS_SCANNED.inc(count)
+
+
+scan_metrics = MetricsObserver()
+
+
+def snmp_switch(host: str, community: str, observer: ScanObserver = scan_metrics) -> SwitchScan:
+    """Scan a switch over SNMP, unranked, with the configured port, timeout and retries"""
+    return snmp_scan(host, community, SNMP_PORT, SNMP_TIMEOUT, SNMP_RETRIES, observer=observer)
+
+
+class PortStatsCache:
+    """Per-switch 'show int' detail, reused while a port's 'sh int status' row is unchanged"""
+    def __init__(self, ttl: int = PORT_STATS_TTL):
+        self.ttl = ttl
+        self._switches: Dict[str, Dict[str, Tuple[Tuple[str, ...], float, Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, interface: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Get cached detail for a port, or None if its status row changed or the detail expired"""
+        with self._lock:
+            entry = self._switches.get(host, {}).get(interface["port"])
+        if entry is None:
+            return None
+
+        signature, fetched_at, stats = entry
+        if signature != status_signature(interface) or time.monotonic() - fetched_at >= self.ttl:
+            return None
+        return stats
+
+    def put(self, host: str, interface: Dict[str, str], stats: Dict[str, str]) -> None:
+        """Cache freshly fetched detail for a port"""
+        with self._lock:
+            self._switches.setdefault(host, {})[interface["port"]] = (status_signature(interface), time.monotonic(), stats)
+
+    def forget(self, host: str) -> None:
+        """Drop everything cached for a switch"""
+        with self._lock:
+            self._switches.pop(host, None)
+
+    def for_switch(self, host: str, reuse: bool = True) -> "SwitchPortStats":
+        """Get the cache of one switch, as used by the shared scanner"""
+        return SwitchPortStats(self, host, reuse)
+
+
+class SwitchPortStats:
+    """One switch's view of a PortStatsCache; with reuse off, detail is stored but never served"""
+    def __init__(self, cache: PortStatsCache, host: str, reuse: bool):
+        self._cache = cache
+        self._host = host
+        self._reuse = reuse
+
+    def get(self, interface: Dict[str, str]) -> Optional[Dict[str, str]]:
+        return self._cache.get(self._host, interface) if self._reuse else None
+
+    def put(self, interface: Dict[str, str], stats: Dict[str, str]) -> None:
+        self._cache.put(self._host, interface, stats)
@@ -0,0 +1,19 @@
+"""The web app's fleet index of free (notconnect) ports, built from scan results"""
+
+import os
+from typing import Any, Dict, Optional
+from patchfinder_core import FleetIndex, PoeBudget, PortRecord
+from .models import DB_PATH
+
+FLEET_DB_PATH = os.environ.get("FLEET_DB_PATH", os.path.join(os.path.dirname(DB_PATH), "fleet.db"))
+
+
+def index_switch(fleet_index: FleetIndex, ip: str, site: Optional[str], switch: Dict[str, Any]) -> None:
+    """Index a switch as the API describes it, from a scan result or the events of a streamed scan"""
+    ports = [PortRecord(port["port"], port["description"], port["vlan"], port["last_input"], None, None,
+                        port["usage_percentage"])
+             for port in switch["disconnected_ports"]]
+    poe_status = switch.get("poe_status")
+    poe = [PoeBudget(row["switch_no"], row["available"], row["used"], row["free"]) for row in poe_status] \
+        if poe_status is not None else None
+    fleet_index.update(ip, switch["hostname"], site, ports, poe)
@@ -0,0 +1,155 @@
+"""Time-series store of per-port packet counters, for usage rates over a window"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional
+from sqlalchemy import BigInteger, Column, Index, Integer, String, create_engine, delete, func, select
+from sqlalchemy.orm import declarative_base, sessionmaker
+from .models import DB_PATH
+
+COUNTER_DB_PATH = os.environ.get("COUNTER_DB_PATH", os.path.join(os.path.dirname(DB_PATH), "counters.db"))
+COUNTER_RETENTION_DAYS = int(os.environ.get("COUNTER_RETENTION_DAYS", 400))
+COUNTER_DOWNSAMPLE_AFTER_DAYS = int(os.environ.get("COUNTER_DOWNSAMPLE_AFTER_DAYS", 7))
+
+DAY = 86400
+
+HistoryBase = declarative_base()
+
+
+class CounterSnapshot(HistoryBase):
+    __tablename__ = "counter_snapshots"
+    id = Column(Integer, primary_key=True)
+    switch = Column(String, nullable=False)
+    port = Column(String, nullable=False)
+    taken_at = Column(Integer, nullable=False)
+    packets = Column(BigInteger, nullable=False)
+
+    __table_args__ = (Index("ix_counter_snapshots_switch_port_taken_at", "switch", "port", "taken_at"),)
+
+
+class PortActivity(HistoryBase):
+    """The last time each port's counters were seen to move"""
+    __tablename__ = "port_activity"
+    switch = Column(String, primary_key=True)
+    port = Column(String, primary_key=True)
+    first_seen_at = Column(Integer, nullable=False)
+    last_active_at = Column(Integer, nullable=False)
+    packets = Column(BigInteger, nullable=False)
+
+    __table_args__ = (Index("ix_port_activity_switch_last_active_at", "switch", "last_active_at"),)
+
+
+@dataclass
+class PortUsage:
+    """Packets a port passed between two snapshots"""
+    port: str
+    packets: int
+    seconds: int
+
+    @property
+    def rate(self) -> float:
+        return self.packets / self.seconds if self.seconds else 0.0
+
+
+class CounterHistory:
+    """Record counter snapshots per switch and port, and compute usage from their deltas"""
+    def __init__(
+        self,
+        path: str = COUNTER_DB_PATH,
+        retention_days: int = COUNTER_RETENTION_DAYS,
+        downsample_after_days: int = COUNTER_DOWNSAMPLE_AFTER_DAYS,
+    ):
+        self.retention = retention_days * DAY
+        self.downsample_after = downsample_after_days * DAY
+        self._engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        self._sessions = sessionmaker(bind=self._engine)
+        # SQLite allows one writer; serialise here rather than surfacing "database is locked"
+        self._write_lock = threading.Lock()
+        HistoryBase.metadata.create_all(bind=self._engine)
+
+    def record(self, switch: str, counters: Mapping[str, int], taken_at: Optional[int] = None) -> None:
+        """Store a snapshot of lifetime packet counters for a switch's ports"""
+        taken_at = int(time.time()) if taken_at is None else taken_at
+
+        with self._write_lock, self._sessions.begin() as db:
+            activity = {row.port: row for row in db.scalars(select(PortActivity).where(PortActivity.switch == switch))}
+
+            for port, packets in counters.items():
+                db.add(CounterSnapshot(switch=switch, port=port, taken_at=taken_at, packets=packets))
+
+                known = activity.get(port)
+                if known is None:
+                    db.add(PortActivity(switch=switch, port=port, first_seen_at=taken_at,
+                                        last_active_at=taken_at, packets=packets))
+                elif packets != known.packets:
+                    # A drop means the counters were cleared, which says nothing about traffic
+                    if packets > known.packets:
+                        known.last_active_at = taken_at
+                    known.packets = packets
+
+            self._compact(db, switch, taken_at)
+
+    def usage(self, switch: str, window: int, now: Optional[int] = None) -> Dict[str, PortUsage]:
+        """Get the packets each port passed over the window, for ports with a snapshot at both ends"""
+        now = int(time.time()) if now is None else now
+        cutoff = now - window
+
+        with self._sessions() as db:
+            # Baseline is the last snapshot at or before the cutoff, else the first one inside the window
+            before = (select(CounterSnapshot.port, func.max(CounterSnapshot.taken_at).label("taken_at"))
+                      .where(CounterSnapshot.switch == switch, CounterSnapshot.taken_at <= cutoff)
+                      .group_by(CounterSnapshot.port))
+            inside = (select(CounterSnapshot.port, func.min(CounterSnapshot.taken_at).label("taken_at"))
+                      .where(CounterSnapshot.switch == switch, CounterSnapshot.taken_at > cutoff,
+                             CounterSnapshot.taken_at <= now)
+                      .group_by(CounterSnapshot.port))
+            latest = (select(CounterSnapshot.port, func.max(CounterSnapshot.taken_at).label("taken_at"))
+                      .where(CounterSnapshot.switch == switch, CounterSnapshot.taken_at <= now)
+                      .group_by(CounterSnapshot.port))
+
+            baselines = {port: taken_at for port, taken_at in db.execute(inside)}
+            baselines.update({port: taken_at for port, taken_at in db.execute(before)})
+            latest_at = {port: taken_at for port, taken_at in db.execute(latest)}
+
+            wanted = set(baselines.values()) | set(latest_at.values())
+            packets = {(row.port, row.taken_at): row.packets for row in db.scalars(
+                select(CounterSnapshot).where(CounterSnapshot.switch == switch, CounterSnapshot.taken_at.in_(wanted))
+            )}
+
+        usage = {}
+        for port, end in latest_at.items():
+            start = baselines.get(port)
+            if start is None or start == end:
+                continue
+            delta = packets[port, end] - packets[port, start]
+            # Counters cleared inside the window: everything since the clear is the best lower bound
+            usage[port] = PortUsage(port, delta if delta >= 0 else packets[port, end], end - start)
+
+        return usage
+
+    def unused_ports(self, switch: Optional[str], days: int, now: Optional[int] = None) -> List[PortActivity]:
+        """Get ports observed for at least `days` whose counters have not moved in that time"""
+        cutoff = (int(time.time()) if now is None else now) - days * DAY
+
+        query = select(PortActivity).where(PortActivity.last_active_at <= cutoff, PortActivity.first_seen_at <= cutoff)
+        if switch:
+            query = query.where(PortActivity.switch == switch)
+
+        with self._sessions() as db:
+            return list(db.scalars(query.order_by(PortActivity.switch, PortActivity.last_active_at)))
+
+    def _compact(self, db, switch: str, now: int) -> None:
+        # Drop expired snapshots, then keep only the last snapshot per port per day beyond the raw period.
+        # Counters are cumulative, so the last sample of each day preserves every daily delta.
+        db.execute(delete(CounterSnapshot).where(CounterSnapshot.switch == switch,
+                                                 CounterSnapshot.taken_at < now - self.retention))
+
+        downsample_before = now - self.downsample_after
+        keep = (select(func.max(CounterSnapshot.id))
+                .where(CounterSnapshot.switch == switch, CounterSnapshot.taken_at < downsample_before)
+                .group_by(CounterSnapshot.port, CounterSnapshot.taken_at // DAY))
+        db.execute(delete(CounterSnapshot).where(CounterSnapshot.switch == switch,
+                                                 CounterSnapshot.taken_at < downsample_before,
+                                                 CounterSnapshot.id.not_in(keep)))
@@ -0,0 +1,148 @@
+"""Background job queue for switch scans"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set
+from fastapi import HTTPException
+
+MAX_SCAN_WORKERS = int(os.environ.get("MAX_SCAN_WORKERS", 8))
+MAX_JOBS_PER_USER = int(os.environ.get("MAX_JOBS_PER_USER", 2))
+MAX_JOBS_PER_SWITCH = int(os.environ.get("MAX_JOBS_PER_SWITCH", 2))
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", 3600))
+
+ACTIVE_STATES = ("queued", "running")
+
+
+@dataclass
+class ScanJob:
+    """A scan submitted by a user, and its outcome once finished"""
+    owner: str
+    host: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Any = None
+    error: Optional[Exception] = None
+    finished_monotonic: Optional[float] = None
+    # Other users following the job, who asked for the same switch while it was scanning
+    viewers: Set[str] = field(default_factory=set)
+    done: threading.Event = field(default_factory=threading.Event)
+    # The ScanProfile of a profiled scan, kept for downloading its cProfile or collapsed-stack dump
+    profile: Any = None
+
+
+class JobManager:
+    """Run scans on a bounded worker pool with per-user and per-switch limits"""
+    def __init__(
+        self,
+        max_workers: int = MAX_SCAN_WORKERS,
+        max_jobs_per_user: int = MAX_JOBS_PER_USER,
+        max_jobs_per_switch: int = MAX_JOBS_PER_SWITCH,
+        retention: int = JOB_RETENTION_SECONDS,
+    ):
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_jobs_per_switch = max_jobs_per_switch
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan")
+        self._jobs: Dict[str, ScanJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, host: str, scan: Callable[[], Any], profile: Any = None) -> ScanJob:
+        """Queue a scan, refusing it when the user or switch already has too many active jobs"""
+        job = self._register(owner, host)
+        job.profile = profile
+        self._executor.submit(self._run, job, scan)
+        return job
+
+    def start(self, owner: str, host: str, per_user: bool = True) -> ScanJob:
+        """Register a scan the caller runs itself, such as a streamed scan, against the same limits.
+
+        per_user=False leaves out the per-user limit, for background scans that are already bounded by their own pool.
+        """
+        job = self._register(owner, host, per_user)
+        self._mark_running(job)
+        return job
+
+    def finish(self, job: ScanJob, result: Any = None, error: Optional[Exception] = None) -> None:
+        """Record the outcome of a running job"""
+        job.result = result
+        job.error = error
+        job.status = "failed" if error else "completed"
+        job.finished_at = datetime.utcnow()
+        job.finished_monotonic = time.monotonic()
+        job.done.set()
+
+    def completed(self, owner: str, host: str, result: Any) -> ScanJob:
+        """Register a job answered without scanning, e.g. from a cached result; it does not count against any limit"""
+        job = ScanJob(owner=owner, host=host, status="running", started_at=datetime.utcnow())
+        # Finished before it is registered, so it is never seen running alongside real scans
+        self.finish(job, result=result)
+        with self._lock:
+            self._expire_finished()
+            self._jobs[job.id] = job
+        return job
+
+    def share(self, job: ScanJob, viewer: str) -> ScanJob:
+        """Let another user follow a job instead of starting a scan of their own"""
+        if viewer != job.owner:
+            with self._lock:
+                job.viewers.add(viewer)
+        return job
+
+    def get(self, job_id: str, owner: str) -> ScanJob:
+        """Get a job by ID, hiding jobs that belong to other users unless they follow it"""
+        job = self._jobs.get(job_id)
+        if not job or (job.owner != owner and owner not in job.viewers):
+            raise HTTPException(status_code=404, detail="Scan job not found")
+        return job
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs and cancel the ones still queued"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _register(self, owner: str, host: str, per_user: bool = True) -> ScanJob:
+        with self._lock:
+            self._expire_finished()
+            active = [job for job in self._jobs.values() if job.status in ACTIVE_STATES]
+
+            if per_user and sum(job.owner == owner for job in active) >= self.max_jobs_per_user:
+                raise HTTPException(status_code=429, detail="Too many scans in progress for this user")
+            if sum(job.host == host for job in active) >= self.max_jobs_per_switch:
+                raise HTTPException(status_code=429, detail=f"Too many scans in progress for {host}")
+
+            job = ScanJob(owner=owner, host=host)
+            self._jobs[job.id] = job
+            return job
+
+    def _mark_running(self, job: ScanJob) -> None:
+        with self._lock:
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            running = [other for other in self._jobs.values() if other.status == "running"]
+            if len(running) > 1:
+                # tracemalloc counts every thread, so a profile overlapping another scan also counts that scan's memory
+                for other in running:
+                    if other.profile is not None:
+                        other.profile.allocations_shared = True
+
+    def _run(self, job: ScanJob, scan: Callable[[], Any]) -> None:
+        self._mark_running(job)
+        try:
+            self.finish(job, result=scan())
+        except Exception as exc:
+            self.finish(job, error=exc)
+
+    def _expire_finished(self) -> None:
+        # Caller holds self._lock
+        cutoff = time.monotonic() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_monotonic is not None and job.finished_monotonic < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -1,29 +1,104 @@
 """Main module for the FastAPI application."""
 
-from datetime import timedelta
-from typing import Annotated
-from netmiko import exceptions
-from fastapi import FastAPI, HTTPException, Depends, status
+import contextlib
+import functools
+import json
+from datetime import datetime, timedelta
+from typing import Annotated, Any, Dict, Iterator, List, Literal, Optional, Tuple
+from netmiko import BaseConnection, exceptions
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from .models import SwitchConnection, SwitchResponse, UserCreate, Token, create_db_and_tables
+from .models import (
+    SwitchConnection,
+    SwitchDisconnect,
+    SwitchResponse,
+    ScanJobStatus,
+    ScanProfileReport,
+    PortPage,
+    PrewarmStatus,
+    UnusedPort,
+    FleetPortCandidate,
+    UserCreate,
+    Token,
+    create_db_and_tables,
+)
 from .session_manager import SessionManager
+from .jobs import ACTIVE_STATES, JobManager, ScanJob
+from .history import DAY, CounterHistory
+from .fleet import FLEET_DB_PATH, index_switch
+from .metrics import SCAN_DURATION, registry
+from .collection import PortStatsCache, scan_metrics, snmp_switch
+from .scan_cache import CacheKey, ScanCache, cache_key
+from .port_query import query_ports
+from .prewarm import PREWARM_CONFIG, PREWARM_OWNER, PrewarmCollector, load_targets
+from patchfinder_core import (
+    ChannelFactory,
+    FleetIndex,
+    ObserverGroup,
+    PoeBudget,
+    PortRecord,
+    ScanObserver,
+    SwitchScan,
+    cached_port_stats,
+    poe_budgets,
+    scan_switch as collect_switch,
+    send_parsed,
+    stream_command,
+    timed_command,
+)
+from patchfinder_core.profiling import ScanProfile
+from patchfinder_core.snmp import SnmpError, SnmpTimeout
+from patchfinder_core.parsers import (
+    InterfaceStreamParser,
+    parse_interface_counters,
+    parse_interface_status,
+    parse_show_version,
+    short_interface_name,
+)
 from .auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     authenticate_user,
+    Principal,
     create_access_token,
     get_current_user,
     get_password_hash,
     get_db,
+    get_token_claims,
+    token_revocations,
 )
 
 app = FastAPI()
 session_manager = SessionManager()
+job_manager = JobManager()
+counter_history = CounterHistory()
+port_cache = PortStatsCache()
+fleet_index = FleetIndex(FLEET_DB_PATH)
+scan_cache = ScanCache()
+prewarm: Optional[PrewarmCollector] = None
+registry.gauge("patchfinder_active_sessions", "Connected switch sessions in the pool", session_manager.active_sessions)
 
 # Ensure the users table exists on container startup
 create_db_and_tables()
 
+@app.on_event("startup")
+def start_prewarm():
+    """Start the scheduled background scans, when PREWARM_CONFIG lists switches to keep warm"""
+    global prewarm
+    if PREWARM_CONFIG:
+        prewarm = PrewarmCollector(load_targets(PREWARM_CONFIG), prewarm_switch)
+        prewarm.start()
+
+@app.on_event("shutdown")
+def close_switch_sessions():
+    """Cancel queued scans and close every pooled switch session when the server stops"""
+    if prewarm is not None:
+        prewarm.stop()
+    job_manager.shutdown()
+    session_manager.close_all()
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -54,155 +129,516 @@ async def login(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/api/connect")
+@app.post("/api/connect", response_model=ScanJobStatus, status_code=status.HTTP_202_ACCEPTED)
 async def connect_switch(
     connection: SwitchConnection,
-    current_user: Annotated[dict, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    profile: Optional[Literal["phases", "pstats", "collapsed"]] = None,
+    x_patchfinder_profile: Annotated[Optional[Literal["phases", "pstats", "collapsed"]], Header()] = None
+):
+    """Queue a scan of a switch and return its job ID straight away.
+
+    A recent result for the same switch and credentials completes the job at once, and a request for a switch that is
+    already being scanned follows that scan's job instead of starting another. A profiled scan always runs on its own.
+    """
+    owner = current_user.username
+    key = cache_key(connection)
+
+    profile = profile or x_patchfinder_profile
+    if profile:
+        scan_profile = ScanProfile(cprofile=profile == "pstats", stacks=profile == "collapsed")
+        job = job_manager.submit(owner, connection.ip,
+                                 lambda: scan_connection(owner, connection, key, mode="profile", profile=scan_profile),
+                                 profile=scan_profile)
+        return job_status(job)
+
+    cached = None if connection.refresh else scan_cache.get(key)
+    if cached is not None:
+        return job_status(job_manager.completed(owner, connection.ip, cached))
+
+    def run_scan() -> SwitchResponse:
+        return scan_connection(owner, connection, key)
+
+    job, started = scan_cache.flight(key, lambda: job_manager.submit(owner, connection.ip, run_scan))
+    return job_status(job if started else job_manager.share(job, owner))
+
+@app.post("/api/connect/stream")
+async def stream_switch(
+    connection: SwitchConnection,
+    current_user: Annotated[Principal, Depends(get_current_user)]
+):
+    """Scan a switch and stream the results as Server-Sent Events while they are collected.
+
+    Recent results and scans already in flight are shared the same way as for /api/connect, and sent all at once.
+    """
+    owner = current_user.username
+    key = cache_key(connection, streamed=True)
+    cached = None if connection.refresh else scan_cache.get(key)
+    if cached is None:
+        job, started = scan_cache.flight(key, lambda: job_manager.start(owner, connection.ip))
+        if not started:
+            job_manager.share(job, owner)
+    else:
+        # Answered from the cache, but still given a job so its ports can be paged through
+        job, started = job_manager.completed(owner, connection.ip, cached), False
+
+    def shared_events() -> Iterator[str]:
+        job.done.wait()
+        if job.error:
+            yield error_event(job.error)
+            yield "event: done\ndata: null\n\n"
+            return
+        for event, data in replay_events(with_cache_age(job.result), job.id, connection.port_events):
+            yield server_event(event, data)
+        yield "event: done\ndata: null\n\n"
+
+    def events() -> Iterator[str]:
+        error = None
+        result = None
+        # Every port is kept until the scan ends: the result is cached and paged like a /api/connect scan, so a
+        # stream saves the wait for the first rows rather than memory
+        switch = {"disconnected_ports": []}
+        try:
+            with SCAN_DURATION.time(collection=scan_collection(connection), mode="stream"):
+                for event, data in connection_events(owner, connection):
+                    if event == "switch":
+                        switch.update(data)
+                        data = {**data, "job_id": job.id}
+                    elif event == "usage":
+                        switch["usage_window_days"] = data["window_days"]
+                    elif event == "port":
+                        switch["disconnected_ports"].append(data)
+                        if not connection.port_events:
+                            continue
+                    elif event == "poe":
+                        switch["poe_status"] = data
+                    elif event == "lowest":
+                        switch["lowest_usage_interface"] = data
+                    yield server_event(event, data)
+            result = SwitchResponse(**switch, scanned_at=datetime.utcnow())
+            scan_cache.store(key, result)
+            index_switch(fleet_index, connection.ip, connection.site, switch)
+        except Exception as exc:
+            error = exc
+            yield error_event(exc)
+        finally:
+            if result is None and error is None:
+                # The client went away mid-scan; anyone following this scan needs to know it has no result
+                error = HTTPException(status_code=503, detail="The scan was stopped before it finished")
+            job_manager.finish(job, result=result, error=error)
+        yield "event: done\ndata: null\n\n"
+
+    if not started:
+        return StreamingResponse(shared_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Scan timing and session metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/jobs/{job_id}", response_model=ScanJobStatus)
+async def get_scan_job(job_id: str, current_user: Annotated[Principal, Depends(get_current_user)]):
+    """Get the status of a scan job"""
+    return job_status(job_manager.get(job_id, current_user.username))
+
+@app.get("/api/jobs/{job_id}/result", response_model=SwitchResponse)
+async def get_scan_result(job_id: str, current_user: Annotated[Principal, Depends(get_current_user)]):
+    """Get the result of a completed scan job, or the error that failed it"""
+    job = job_manager.get(job_id, current_user.username)
+    if job.status == "failed":
+        raise scan_error(job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Scan job is {job.status}")
+    return with_cache_age(job.result)
+
+@app.get("/api/jobs/{job_id}/profile")
+async def get_scan_profile(job_id: str, current_user: Annotated[Principal, Depends(get_current_user)]):
+    """Download the cProfile statistics or collapsed stacks of a scan queued with profile=pstats or profile=collapsed"""
+    job = job_manager.get(job_id, current_user.username)
+    if job.status in ACTIVE_STATES:
+        raise HTTPException(status_code=409, detail=f"Scan job is {job.status}")
+    if job.profile is None or not (job.profile.cprofile or job.profile.stacks):
+        raise HTTPException(status_code=404, detail="Scan job was not profiled with a dump")
+    if job.profile.cprofile:
+        return Response(job.profile.pstats_data(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{job.host}.prof"'})
+    return PlainTextResponse(job.profile.collapsed_stacks())
+
+@app.get("/api/jobs/{job_id}/ports", response_model=PortPage)
+async def get_scan_ports(
+    job_id: str,
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    vlan: Optional[str] = None,
+    min_usage: Optional[float] = None,
+    max_usage: Optional[float] = None,
+    min_idle_days: Optional[float] = Query(default=None, ge=0),
+    description: Optional[str] = None,
+    sort: Literal["port", "usage_percentage", "last_input", "vlan", "description"] = "port",
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500)
 ):
-    """Connect to a switch and return its information"""
+    """Get one page of a completed scan's disconnected ports, filtered and sorted; pass next_cursor back for the next"""
+    job = job_manager.get(job_id, current_user.username)
+    if job.status == "failed":
+        raise scan_error(job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Scan job is {job.status}")
     try:
-        session = session_manager.create_session(
-            connection.ip,
-            connection.username,
-            connection.password
+        return query_ports(job.result.disconnected_ports, vlan, min_usage, max_usage, min_idle_days, description,
+                           sort, order, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.get("/api/prewarm", response_model=List[PrewarmStatus])
+async def get_prewarm_status(current_user: Annotated[Principal, Depends(get_current_user)]):
+    """Get the schedule and last outcome of each switch kept warm by background scans; the results themselves come
+    from /api/connect with the switch's credentials"""
+    if prewarm is None:
+        return []
+    return [
+        PrewarmStatus(
+            ip=target.connection.ip,
+            site=target.connection.site,
+            backend=target.connection.backend,
+            interval_seconds=target.interval,
+            off_peak=format_window(target.off_peak) if target.off_peak else None,
+            next_scan_at=utc_timestamp(target.next_scan_at),
+            last_scanned_at=utc_timestamp(target.last_scanned_at),
+            last_duration_seconds=target.last_duration,
+            last_error=target.last_error,
         )
+        for target in prewarm.targets
+    ]
 
-        # Gather switch information
-        hostname = session.send_command("sh run | include hostname").split()[1]
-        uptime = session.send_command("sh version", use_textfsm=True)[0]['uptime']
-        int_status = session.send_command("sh int status", use_textfsm=True)
-        poe_status = session.send_command("sh power inline")
-
-        # Process disconnected ports
-        disconnected_ports = []
-        all_stats = []
-
-        # First pass to get max usage
-        for interface in int_status:
-            stats = session.send_command(f'show int {interface["port"]}', use_textfsm=True)[0]
-            try:
-                total_packets = int(stats["input_packets"]) + int(stats["output_packets"])
-                all_stats.append(total_packets)
-            except ValueError:
-                continue
-
-        max_usage = max(all_stats) if all_stats else 1
-
-        # Second pass to build response with percentages
-        for interface in int_status:
-            if interface['status'] == "notconnect":
-                stats = session.send_command(f'show int {interface["port"]}', use_textfsm=True)[0]
-                try:
-                    total_packets = int(stats["input_packets"]) + int(stats["output_packets"])
-                    percentage = round((total_packets / max_usage) * 100, 2) if max_usage > 0 else 0
-                except (ValueError, ZeroDivisionError):
-                    total_packets = 0
-                    percentage = 0
-
-                disconnected_ports.append({
-                    "port": interface["port"],
-                    "description": interface.get("name", ""),
-                    "vlan": interface.get("vlan") or interface.get("vlan_id"),
-                    "last_input": stats["last_input"],
-                    "input_packets": stats["input_packets"],
-                    "output_packets": stats["output_packets"],
-                    "usage_percentage": percentage
-                })
-
-        return SwitchResponse(
-            hostname=hostname,
-            uptime=uptime,
-            disconnected_ports=disconnected_ports,
-            poe_status=process_poe_status(poe_status),
-            lowest_usage_interface=find_lowest_usage(disconnected_ports)
+@app.get("/api/history/unused", response_model=List[UnusedPort])
+async def get_unused_ports(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    days: int = 90,
+    ip: Optional[str] = None
+):
+    """Get ports whose counters have not moved in the given number of days, from recorded scans"""
+    return [
+        UnusedPort(
+            ip=activity.switch,
+            port=activity.port,
+            first_seen_at=datetime.utcfromtimestamp(activity.first_seen_at),
+            last_active_at=datetime.utcfromtimestamp(activity.last_active_at),
         )
+        for activity in counter_history.unused_ports(ip, days)
+    ]
 
-    except exceptions.NetmikoAuthenticationException as exc:
-        raise HTTPException(status_code=401, detail="SSH authentication failed") from exc
-    except exceptions.NetmikoTimeoutException as exc:
-        raise HTTPException(status_code=408, detail="Connection timeout") from exc
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+@app.get("/api/fleet/ports", response_model=List[FleetPortCandidate])
+async def find_fleet_ports(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    site: Optional[str] = None,
+    vlan: Optional[str] = None,
+    min_poe_free_watts: Optional[float] = None,
+    min_idle_days: Optional[float] = None,
+    max_usage: Optional[float] = None,
+    limit: int = Query(default=10, ge=1, le=1000)
+):
+    """Get the best free ports across every scanned switch, from the fleet index"""
+    return [
+        FleetPortCandidate(
+            ip=port.ip,
+            hostname=port.hostname,
+            site=port.site,
+            port=port.port,
+            description=port.description,
+            vlan=port.vlan,
+            usage_percentage=port.usage_percentage,
+            last_input=port.last_input,
+            poe_free_watts=port.poe_free_watts,
+            scanned_at=datetime.utcfromtimestamp(port.scanned_at),
+        )
+        for port in fleet_index.query(site, vlan, min_poe_free_watts, min_idle_days, max_usage, limit)
+    ]
+
+def job_status(job: ScanJob) -> ScanJobStatus:
+    """Describe a scan job for the API"""
+    return ScanJobStatus(
+        job_id=job.id,
+        ip=job.host,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=scan_error(job.error).detail if job.error else None
+    )
 
-def process_poe_status(poe_output: str):
-    """Process PoE status output and return structured data"""
-    switch_power = poe_output.replace("-", "").split()
-    switch_power_parsed = []
+def server_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    try:
-        for item in range(7, switch_power.index("Interface")):
-            if switch_power[item].isdigit():
-                switch_power_parsed.append(switch_power[item:item+4])
-
-        if not switch_power_parsed:
-            if (switch_power[0].startswith("Available") and
-                switch_power[1].startswith("Used") and
-                switch_power[2].startswith("Remaining")):
-
-                get_available = switch_power[0].split(":")[1].replace("(w)", "")
-                get_used = switch_power[1].split(":")[1].replace("(w)", "")
-                get_remaining = switch_power[2].split(":")[1].replace("(w)", "")
-                switch_power_parsed.append(["System Total", get_available, get_used, get_remaining])
-
-        return [{
-            "switch_no": switch[0],
-            "available": switch[1],
-            "used": switch[2],
-            "free": switch[3]
-        } for switch in switch_power_parsed]
-
-    except (IndexError, ValueError):
+def error_event(exc: Exception) -> str:
+    """Describe a failed scan as an 'error' event"""
+    http_error = scan_error(exc)
+    return server_event("error", {"status_code": http_error.status_code, "detail": http_error.detail})
+
+def with_cache_age(result: SwitchResponse) -> SwitchResponse:
+    """Copy a result with how many seconds ago its switch was scanned"""
+    if result.scanned_at is None:
+        return result
+    age = (datetime.utcnow() - result.scanned_at).total_seconds()
+    return result.model_copy(update={"cache_age_seconds": round(max(age, 0), 1)})
+
+def replay_events(result: SwitchResponse, job_id: str, port_events: bool = True) -> Iterator[Tuple[str, Any]]:
+    """The events of a finished scan, for streams answered from the cache or by another request's scan"""
+    response = result.model_dump(mode="json")
+    yield "switch", {"hostname": response["hostname"], "uptime": response["uptime"], "job_id": job_id,
+                     "scanned_at": response["scanned_at"], "cache_age_seconds": response["cache_age_seconds"]}
+    yield "usage", {"window_days": response["usage_window_days"]}
+    if port_events:
+        for port in response["disconnected_ports"]:
+            yield "port", port
+    yield "poe", response["poe_status"]
+    yield "lowest", response["lowest_usage_interface"]
+
+def scan_error(exc: Exception) -> HTTPException:
+    """Map a scan failure to the HTTP error returned for it"""
+    if isinstance(exc, HTTPException):
+        return exc
+    if isinstance(exc, exceptions.NetmikoAuthenticationException):
+        return HTTPException(status_code=401, detail="SSH authentication failed")
+    if isinstance(exc, exceptions.NetmikoTimeoutException):
+        return HTTPException(status_code=408, detail="Connection timeout")
+    if isinstance(exc, SnmpTimeout):
+        return HTTPException(status_code=408, detail="No SNMP response")
+    if isinstance(exc, SnmpError):
+        return HTTPException(status_code=502, detail=str(exc))
+    return HTTPException(status_code=500, detail=str(exc))
+
+def scan_switch(
+    session: BaseConnection,
+    collection: str = "per-port",
+    usage_window_days: Optional[int] = None,
+    incremental: bool = False,
+    observer: ScanObserver = scan_metrics,
+    channels: int = 1,
+    open_channel: Optional[ChannelFactory] = None
+) -> SwitchResponse:
+    """Gather switch information over an established session, with per-port detail shared out over up to channels
+    sessions opened by open_channel"""
+    scan = collect_switch(session, collection, port_cache.for_switch(session.host, incremental), observer, channels,
+                          open_channel)
+    return switch_response(scan, usage_window_days, observer)
+
+def switch_response(
+    scan: SwitchScan,
+    usage_window_days: Optional[int] = None,
+    observer: ScanObserver = scan_metrics
+) -> SwitchResponse:
+    """Rank a collected switch and describe it for the API"""
+    with observer.phase("rank"):
+        usage, window_days = port_usage(scan.host, scan.counters, usage_window_days, scan.fresh_counters)
+        scan.rank(usage)
+    lowest = scan.lowest
+
+    return SwitchResponse(
+        hostname=scan.hostname,
+        uptime=scan.uptime,
+        disconnected_ports=[port_response(port) for port in scan.ports],
+        poe_status=poe_response(scan.poe),
+        lowest_usage_interface=lowest_response(lowest),
+        usage_window_days=window_days,
+        scanned_at=datetime.utcnow()
+    )
+
+def port_usage(
+    host: str,
+    counters: Dict[str, int],
+    usage_window_days: Optional[int],
+    fresh_counters: Optional[Dict[str, int]] = None
+) -> Tuple[Dict[str, int], Optional[int]]:
+    """Record the counters read live in a scan, if any, and get the packets to rank ports by, with the window they
+    cover. Counters table totals are never passed in, so every SSH snapshot of a port counts the same packets."""
+    if fresh_counters:
+        counter_history.record(host, fresh_counters)
+
+    if usage_window_days:
+        window = counter_history.usage(host, usage_window_days * DAY)
+        # Only switch to rates once every port has history, so all ports are on the same scale
+        if window and counters.keys() <= window.keys():
+            return {port: usage.packets for port, usage in window.items()}, usage_window_days
+
+    return counters, None
+
+def port_response(port: PortRecord) -> dict:
+    """Describe a disconnected port for the API, which keeps its counters as strings"""
+    return {
+        "port": port.port,
+        "description": port.description,
+        "vlan": port.vlan,
+        "last_input": port.last_input,
+        "input_packets": "" if port.input_packets is None else str(port.input_packets),
+        "output_packets": "" if port.output_packets is None else str(port.output_packets),
+        "usage_percentage": port.usage_percentage or 0
+    }
+
+def poe_response(budgets: Optional[List[PoeBudget]]) -> Optional[List[dict]]:
+    """Describe PoE budgets for the API"""
+    if budgets is None:
         return None
+    return [{"switch_no": budget.member, "available": budget.available, "used": budget.used, "free": budget.free}
+            for budget in budgets]
 
-def find_lowest_usage(ports: list):
-    """Find interface with lowest usage percentage"""
-    try:
-        all_stats = []
-        interface_stats = {}
-
-        for port in ports:
-            try:
-                total_packets = int(port['input_packets']) + int(port['output_packets'])
-                all_stats.append(total_packets)
-                interface_stats[port['port']] = total_packets
-            except ValueError:
-                continue
-
-        if not all_stats or not interface_stats:
-            return None
-
-        max_usage = max(all_stats)
-        lowest_usage = float('inf')
-        lowest_interface = None
-
-        for interface, usage in interface_stats.items():
-            percentage = round((usage / max_usage) * 100, 2)
-            if percentage < lowest_usage:
-                lowest_usage = percentage
-                lowest_interface = interface
-
-        return {
-            "interface": lowest_interface,
-            "usage_percentage": lowest_usage
-        }
-    except Exception:
+def lowest_response(port: Optional[PortRecord]) -> Optional[dict]:
+    """Describe the least-used disconnected port for the API"""
+    if port is None:
         return None
+    return {"interface": port.port, "usage_percentage": port.usage_percentage}
+
+def scan_connection(
+    owner: str,
+    connection: SwitchConnection,
+    key: CacheKey,
+    mode: str = "job",
+    cache_ttl: Optional[float] = None,
+    profile: Optional[ScanProfile] = None
+) -> SwitchResponse:
+    """Scan a switch over the backend it was requested with, then cache and index the result"""
+    observer = ObserverGroup(scan_metrics, profile) if profile else scan_metrics
+    with profile or contextlib.nullcontext(), SCAN_DURATION.time(collection=scan_collection(connection), mode=mode):
+        if connection.backend == "snmp":
+            scan = snmp_switch(connection.ip, connection.community, observer)
+            result = switch_response(scan, connection.usage_window_days, observer)
+        else:
+            with contextlib.ExitStack() as stack:
+                with observer.phase("connect"):
+                    session = stack.enter_context(
+                        session_manager.session(owner, connection.ip, connection.username, connection.password))
+                open_channel = functools.partial(session_manager.channel, connection.ip, connection.username,
+                                                 connection.password) if connection.channels > 1 else None
+                result = scan_switch(session, connection.collection, connection.usage_window_days,
+                                     connection.incremental, observer, connection.channels, open_channel)
+    scan_cache.store(key, result, cache_ttl)
+    index_switch(fleet_index, connection.ip, connection.site, result.model_dump())
+    if profile:
+        # Attached after caching, so requests answered from the cache never get this scan's profile
+        result = result.model_copy(update={"profile": ScanProfileReport(**profile.report())})
+    return result
+
+def prewarm_switch(connection: SwitchConnection, cache_ttl: float) -> bool:
+    """Run a scheduled background scan, caching its result for cache_ttl seconds; a scan of the switch already in
+    flight with the same credentials is left to finish instead"""
+    key = cache_key(connection)
+    job, started = scan_cache.flight(key, lambda: job_manager.start(PREWARM_OWNER, connection.ip, per_user=False))
+    if not started:
+        return False
+
+    try:
+        result = scan_connection(PREWARM_OWNER, connection, key, mode="prewarm", cache_ttl=cache_ttl)
+    except Exception as exc:
+        job_manager.finish(job, error=exc)
+        raise scan_error(exc)
+    job_manager.finish(job, result=result)
+    return True
+
+def format_window(window: Tuple[int, int]) -> str:
+    """Format an off-peak window as HH:MM-HH:MM"""
+    return "-".join(f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in window)
+
+def utc_timestamp(timestamp: Optional[float]) -> Optional[datetime]:
+    """Convert a time.time() timestamp to the naive UTC datetimes the API reports"""
+    return None if timestamp is None else datetime.utcfromtimestamp(timestamp)
+
+def scan_collection(connection: SwitchConnection) -> str:
+    """The collection label scans are timed under; SNMP has a single way of collecting"""
+    return "snmp" if connection.backend == "snmp" else connection.collection
+
+def connection_events(owner: str, connection: SwitchConnection) -> Iterator[Tuple[str, Any]]:
+    """Scan a switch over the backend it was requested with, as (event, data) pairs"""
+    if connection.backend == "snmp":
+        yield from scan_events(snmp_switch(connection.ip, connection.community), connection.usage_window_days)
+        return
+
+    with session_manager.session(owner, connection.ip, connection.username, connection.password) as session:
+        yield from stream_scan(session, connection.collection, connection.usage_window_days, connection.incremental)
+
+def scan_events(scan: SwitchScan, usage_window_days: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """Replay a collected switch as the events stream_scan sends; SNMP gets every table at once, so nothing comes early"""
+    yield "switch", {"hostname": scan.hostname, "uptime": scan.uptime}
+    usage, window_days = port_usage(scan.host, scan.counters, usage_window_days, scan.fresh_counters)
+    scan.rank(usage)
+    yield "usage", {"window_days": window_days}
+    for port in scan.ports:
+        yield "port", port_response(port)
+    yield "poe", poe_response(scan.poe)
+    yield "lowest", lowest_response(scan.lowest)
+
+def stream_scan(
+    session: BaseConnection,
+    collection: str = "per-port",
+    usage_window_days: Optional[int] = None,
+    incremental: bool = False
+) -> Iterator[Tuple[str, Any]]:
+    """Gather switch information as (event, data) pairs, yielding each notconnect port once it is parsed"""
+    hostname = timed_command(session, "sh run | include hostname", scan_metrics).split()[1]
+    uptime = send_parsed(session, "sh version", parse_show_version, scan_metrics)[0]['uptime']
+    yield "switch", {"hostname": hostname, "uptime": uptime}
+
+    int_status = send_parsed(session, "sh int status", parse_interface_status, scan_metrics)
+    notconnect = {interface["port"]: interface for interface in int_status if interface["status"] == "notconnect"}
+    scan_metrics.ports(len(int_status))
+    cache = port_cache.for_switch(session.host, incremental)
+
+    # The top talker has to be known before the first port is sent, so it comes from the counters table. Its totals
+    # count different packets to 'show interfaces', so they rank this stream without going into the history
+    counters = parse_interface_counters(timed_command(session, "show interfaces counters", scan_metrics))
+    usage, window_days = port_usage(session.host, counters, usage_window_days)
+    top = max(usage.values(), default=0)
+    lowest = None
+    yield "usage", {"window_days": window_days}
+
+    def port_event(interface: dict, stats: dict) -> dict:
+        nonlocal lowest
+        port = PortRecord.from_detail(interface, stats)
+        port.rank(usage.get(port.port, port.total_packets), top)
+        if port.usage_percentage is not None and (lowest is None or port.usage_percentage < lowest.usage_percentage):
+            lowest = port
+        return port_response(port)
+
+    if collection == "bulk":
+        parser = InterfaceStreamParser()
+        for chunk in stream_command(session, "show interfaces", observer=scan_metrics):
+            for stats in parser.feed(chunk):
+                interface = notconnect.pop(short_interface_name(stats["interface"]), None)
+                if interface:
+                    cache.put(interface, stats)
+                    yield "port", port_event(interface, stats)
+        for stats in parser.close():
+            interface = notconnect.pop(short_interface_name(stats["interface"]), None)
+            if interface:
+                cache.put(interface, stats)
+                yield "port", port_event(interface, stats)
+
+    # Per-port detail for everything not already covered by a bulk stream
+    for interface in notconnect.values():
+        yield "port", port_event(interface, cached_port_stats(session, interface, cache, scan_metrics))
+
+    yield "poe", poe_response(poe_budgets(session, scan_metrics))
+    yield "lowest", lowest_response(lowest)
 
 @app.post("/api/disconnect")
-async def disconnect_switch():
-    """Disconnect from a switch"""
+async def disconnect_switch(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    switch: SwitchDisconnect | None = None
+):
+    """Disconnect from a switch, or from every switch when no IP is given"""
     try:
-        session_manager.close_session()
+        session_manager.close_session(current_user.username, switch.ip if switch else None)
         return {"status": "disconnected"}
     except Exception as exc:
         raise HTTPException(status_code=500, detail="Failed to disconnect properly") from exc
 
 @app.post("/api/logout")
-async def logout(current_user: Annotated[dict, Depends(get_current_user)]):
+async def logout(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    claims: Annotated[Dict[str, Any], Depends(get_token_claims)]
+):
     """Logout and invalidate the current token"""
-    try:
-        # TODO - need to blacklist_token in auth.py OR remove blacklist functionality (just handle token expiration)
-        await blacklist_token(current_user["username"])
-        return {"status": "logged out"}
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail="Logout failed") from exc
+    token_revocations.revoke(claims)
+    return {"status": "logged out"}
@@ -1,5 +1,6 @@
-from typing import Optional, List
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Literal
+from pydantic import BaseModel, Field, model_validator
 from sqlalchemy import Column, Integer, String, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -18,8 +19,31 @@ Base = declarative_base()
 
 class SwitchConnection(BaseModel):
     ip: str
-    username: str
-    password: str
+    username: Optional[str] = None
+    password: Optional[str] = None
+    backend: Literal["ssh", "snmp"] = "ssh"
+    community: Optional[str] = None
+    collection: Literal["per-port", "bulk", "counters"] = "per-port"
+    usage_window_days: Optional[int] = Field(default=None, ge=1)
+    incremental: bool = False
+    # SSH sessions the scan may open to the switch, sharing out its per-port detail, up to
+    # patchfinder_core.MAX_CHANNELS; add_user.py imports this module without the repo root on the path
+    channels: int = Field(default=1, ge=1, le=4)
+    site: Optional[str] = None
+    refresh: bool = False
+    port_events: bool = True
+
+    @model_validator(mode="after")
+    def check_credentials(self):
+        """SSH scans need a username and password, SNMP scans a community"""
+        if self.backend == "snmp" and not self.community:
+            raise ValueError("community is required for the snmp backend")
+        if self.backend == "ssh" and (self.username is None or self.password is None):
+            raise ValueError("username and password are required for the ssh backend")
+        return self
+
+class SwitchDisconnect(BaseModel):
+    ip: Optional[str] = None
 
 class DisconnectedPort(BaseModel):
     port: str
@@ -30,6 +54,11 @@ class DisconnectedPort(BaseModel):
     output_packets: str
     usage_percentage: float
 
+class PortPage(BaseModel):
+    items: List[DisconnectedPort]
+    total: int
+    next_cursor: Optional[str] = None
+
 class PoEStatus(BaseModel):
     switch_no: str
     available: str
@@ -40,12 +69,76 @@ class LowestUsage(BaseModel):
     interface: str
     usage_percentage: float
 
+class PhaseProfile(BaseModel):
+    name: str
+    seconds: float
+    calls: int
+    allocated_bytes: Optional[int] = None
+    peak_bytes: Optional[int] = None
+
+class PortTiming(BaseModel):
+    port: str
+    seconds: float
+
+class PortProfile(BaseModel):
+    count: int
+    median_seconds: Optional[float] = None
+    outliers: List[PortTiming]
+
+class ScanProfileReport(BaseModel):
+    wall_seconds: float
+    phases: List[PhaseProfile]
+    ports: PortProfile
+    allocations_shared: bool = False
+
 class SwitchResponse(BaseModel):
     hostname: str
     uptime: str
     disconnected_ports: List[DisconnectedPort]
     poe_status: Optional[List[PoEStatus]] = None
     lowest_usage_interface: Optional[LowestUsage] = None
+    usage_window_days: Optional[int] = None
+    scanned_at: Optional[datetime] = None
+    cache_age_seconds: Optional[float] = None
+    profile: Optional[ScanProfileReport] = None
+
+class FleetPortCandidate(BaseModel):
+    ip: str
+    hostname: str
+    site: Optional[str] = None
+    port: str
+    description: Optional[str] = None
+    vlan: Optional[str] = None
+    usage_percentage: float
+    last_input: Optional[str] = None
+    poe_free_watts: Optional[float] = None
+    scanned_at: datetime
+
+class UnusedPort(BaseModel):
+    ip: str
+    port: str
+    first_seen_at: datetime
+    last_active_at: datetime
+
+class ScanJobStatus(BaseModel):
+    job_id: str
+    ip: str
+    status: Literal["queued", "running", "completed", "failed"]
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class PrewarmStatus(BaseModel):
+    ip: str
+    site: Optional[str] = None
+    backend: Literal["ssh", "snmp"]
+    interval_seconds: int
+    off_peak: Optional[str] = None
+    next_scan_at: Optional[datetime] = None
+    last_scanned_at: Optional[datetime] = None
+    last_duration_seconds: Optional[float] = None
+    last_error: Optional[str] = None
 
 class UserCreate(BaseModel):
     username: str
@@ -69,4 +162,9 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
 
 def create_db_and_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+
+def mark_users_changed():
+    """Touch users.db so running servers drop their cached users"""
+    os.utime(DB_PATH)
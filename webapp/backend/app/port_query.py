@@ -0,0 +1,112 @@
+"""Filter, sort and page through the disconnected ports of a scan result, so clients only fetch the rows they show"""
+
+import base64
+import json
+import re
+from typing import Any, List, Optional, Tuple
+from patchfinder_core.parsers import last_input_seconds
+from .history import DAY
+from .models import DisconnectedPort, PortPage
+
+DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(value: str) -> Tuple:
+    """Order names with their numbers compared as numbers, so Gi1/0/2 comes before Gi1/0/10"""
+    # re.split with a capture group alternates text and digits, so the same positions always hold the same type
+    return tuple(int(part) if index % 2 else part.lower() for index, part in enumerate(DIGITS.split(value)))
+
+
+def idle_key(last_input: str) -> Tuple[int, int]:
+    """Order by time since the last input, most recent first; 'never' and unrecognised ages are the idlest"""
+    seconds = last_input_seconds(last_input)
+    return (1, 0) if seconds is None else (0, seconds)
+
+
+def sort_key(port: DisconnectedPort, sort: str) -> Tuple:
+    """The value a port is ordered by, ending with its name so every key on a switch is unique"""
+    if sort == "usage_percentage":
+        value: Any = port.usage_percentage
+    elif sort == "last_input":
+        value = idle_key(port.last_input)
+    elif sort == "vlan":
+        value = natural_key(port.vlan)
+    elif sort == "description":
+        value = port.description.lower()
+    else:
+        return (natural_key(port.port),)
+    return value, natural_key(port.port)
+
+
+def _tuples(value: Any) -> Any:
+    """JSON turns the tuples of a sort key into lists; turn them back so the key compares like the original"""
+    return tuple(_tuples(item) for item in value) if isinstance(value, list) else value
+
+
+def encode_cursor(sort: str, order: str, key: Tuple) -> str:
+    payload = json.dumps({"sort": sort, "order": order, "after": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple:
+    """Get the key of the last row a cursor was issued for; it is only valid for the same sort and order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        issued_for, after = (payload["sort"], payload["order"]), _tuples(payload["after"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if issued_for != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    return after
+
+
+def query_ports(
+    ports: List[DisconnectedPort],
+    vlan: Optional[str] = None,
+    min_usage: Optional[float] = None,
+    max_usage: Optional[float] = None,
+    min_idle_days: Optional[float] = None,
+    description: Optional[str] = None,
+    sort: str = "port",
+    order: str = "asc",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> PortPage:
+    """Get one page of the ports matching every filter given, with the cursor for the next page.
+
+    Pages are keyed on the last row's sort key rather than an offset, so a page does not skip or repeat rows when an
+    earlier one is re-fetched. A description filter matches anywhere in the description, ignoring case.
+    """
+    after = decode_cursor(cursor, sort, order) if cursor else None
+    needle = description.lower() if description else None
+    min_idle = int(min_idle_days * DAY) if min_idle_days is not None else None
+
+    matches = []
+    for port in ports:
+        if vlan is not None and port.vlan != vlan:
+            continue
+        if min_usage is not None and port.usage_percentage < min_usage:
+            continue
+        if max_usage is not None and port.usage_percentage > max_usage:
+            continue
+        if needle is not None and needle not in port.description.lower():
+            continue
+        if min_idle is not None:
+            # Ports that have never passed traffic count as idle for any age, as in the fleet index
+            idle = last_input_seconds(port.last_input)
+            if idle is not None and idle < min_idle:
+                continue
+        matches.append((sort_key(port, sort), port))
+
+    descending = order == "desc"
+    matches.sort(key=lambda match: match[0], reverse=descending)
+    matches_after = matches
+    if after is not None:
+        try:
+            matches_after = [match for match in matches if (match[0] < after if descending else match[0] > after)]
+        except TypeError as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    page = matches_after[:limit]
+    next_cursor = encode_cursor(sort, order, page[-1][0]) if len(matches_after) > limit else None
+    return PortPage(items=[port for _, port in page], total=len(matches), next_cursor=next_cursor)
@@ -0,0 +1,193 @@
+"""Scheduled background scans that keep results for configured switches in the scan cache"""
+
+import heapq
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from patchfinder_core import credential_prefix, reference_credentials
+from .metrics import PREWARM_SCANS
+from .models import SwitchConnection
+
+PREWARM_CONFIG = os.environ.get("PREWARM_CONFIG")
+PREWARM_WORKERS = int(os.environ.get("PREWARM_WORKERS", 2))
+PREWARM_INTERVAL = int(os.environ.get("PREWARM_INTERVAL", 900))
+# Each rescan is pushed back by up to this fraction of its interval, so switches drift apart instead of lining up
+PREWARM_JITTER = float(os.environ.get("PREWARM_JITTER", 0.1))
+
+PREWARM_OWNER = "prewarm"
+
+OFF_PEAK_WINDOW = re.compile(r"^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$")
+DAY_MINUTES = 24 * 60
+
+
+def parse_window(window: str) -> Tuple[int, int]:
+    """Parse an 'HH:MM-HH:MM' off-peak window into minutes after midnight; it may wrap past midnight"""
+    match = OFF_PEAK_WINDOW.match(window.strip())
+    if not match:
+        raise ValueError(f"Off-peak window '{window}' is not HH:MM-HH:MM")
+    start_hour, start_minute, end_hour, end_minute = (int(group) for group in match.groups())
+    if start_hour > 23 or end_hour > 23 or start_minute > 59 or end_minute > 59:
+        raise ValueError(f"Off-peak window '{window}' is not a time of day")
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
+
+
+def window_minutes(window: Tuple[int, int]) -> int:
+    """Length of a window in minutes; a window that starts where it ends covers the whole day"""
+    return (window[1] - window[0]) % DAY_MINUTES or DAY_MINUTES
+
+
+def next_off_peak(at: datetime, window: Tuple[int, int]) -> datetime:
+    """Get at if it falls inside the window (local time), otherwise when the window next opens"""
+    start = window[0]
+    minute = at.hour * 60 + at.minute
+    if (minute - start) % DAY_MINUTES < window_minutes(window):
+        return at
+    opens = at.replace(hour=start // 60, minute=start % 60, second=0, microsecond=0)
+    return opens if opens > at else opens + timedelta(days=1)
+
+
+def credential_environment(reference: str, backend: str) -> Dict[str, str]:
+    """Read switch credentials from PF_<REFERENCE>_USERNAME / _PASSWORD, or _COMMUNITY for SNMP, as the CLI does"""
+    credentials = reference_credentials(reference, backend)
+    missing = [credential_prefix(reference) + name.upper() for name, value in credentials.items() if not value]
+    if missing:
+        raise ValueError(f"Prewarm credentials not set: {', '.join(missing)}")
+    return credentials
+
+
+@dataclass
+class PrewarmTarget:
+    """A configured switch and the state of its scans"""
+    connection: SwitchConnection
+    interval: int
+    off_peak: Optional[Tuple[int, int]] = None
+    next_scan_at: Optional[float] = None
+    last_scanned_at: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+def load_targets(path: str) -> List[PrewarmTarget]:
+    """Read the prewarm configuration: 'switches' entries, with any setting left out taken from 'defaults'"""
+    import yaml
+
+    with open(path, "rt", encoding="utf-8") as config_file:
+        config = yaml.safe_load(config_file) or {}
+
+    defaults = config.get("defaults") or {}
+    targets = []
+    for entry in config.get("switches") or []:
+        settings = {**defaults, **entry}
+        host = str(settings.get("host") or "").strip()
+        if not host:
+            raise ValueError("Every prewarm switch needs a host")
+
+        backend = str(settings.get("backend") or "ssh")
+        connection = SwitchConnection(
+            ip=host,
+            backend=backend,
+            collection=settings.get("collection", "per-port"),
+            usage_window_days=settings.get("usage_window_days"),
+            incremental=bool(settings.get("incremental", False)),
+            channels=int(settings.get("channels", 1)),
+            site=settings.get("site"),
+            **credential_environment(str(settings.get("credentials") or ""), backend),
+        )
+        off_peak = settings.get("off_peak")
+        targets.append(PrewarmTarget(connection, int(settings.get("interval", PREWARM_INTERVAL)),
+                                     parse_window(str(off_peak)) if off_peak else None))
+    return targets
+
+
+class PrewarmCollector:
+    """Rescan configured switches on their own interval, on a small worker pool separate from interactive scans.
+
+    scan(connection, cache_ttl) runs one scan and returns False if it was left to a scan already in flight.
+    """
+    def __init__(
+        self,
+        targets: List[PrewarmTarget],
+        scan: Callable[[SwitchConnection, float], bool],
+        workers: int = PREWARM_WORKERS,
+        jitter: float = PREWARM_JITTER,
+    ):
+        self.targets = targets
+        self.jitter = jitter
+        self._scan = scan
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prewarm")
+        # (due time, target index), earliest first
+        self._queue: List[Tuple[float, int]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        now = time.time()
+        for index, target in enumerate(self.targets):
+            # Spread the first round over one interval, so a restart does not scan every switch at once
+            self._schedule(index, now + random.uniform(0, target.interval))
+        threading.Thread(target=self._run, name="prewarm-scheduler", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop scheduling and cancel scans still queued; scans already running finish"""
+        self._stopped.set()
+        self._wake.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self, index: int, at: float) -> None:
+        target = self.targets[index]
+        if target.off_peak:
+            opens = next_off_peak(datetime.fromtimestamp(at), target.off_peak).timestamp()
+            if opens != at:
+                # Switches waiting for the same window would otherwise all start the moment it opens
+                at = opens + random.uniform(0, min(target.interval, window_minutes(target.off_peak) * 60) * self.jitter)
+        target.next_scan_at = at
+        with self._lock:
+            heapq.heappush(self._queue, (at, index))
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            with self._lock:
+                delay = self._queue[0][0] - time.time() if self._queue else None
+                if delay is not None and delay <= 0:
+                    _, index = heapq.heappop(self._queue)
+            if delay is None or delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self._executor.submit(self._collect, index)
+            except RuntimeError:
+                # Shut down between the check and the submit
+                return
+
+    def _collect(self, index: int) -> None:
+        target = self.targets[index]
+        started = time.time()
+        next_scan_at = started + target.interval + random.uniform(0, target.interval * self.jitter)
+        if target.off_peak:
+            next_scan_at = next_off_peak(datetime.fromtimestamp(next_scan_at), target.off_peak).timestamp()
+        # Kept until the scan after next is due, so one failed rescan does not leave the switch cold
+        cache_ttl = next_scan_at - started + target.interval
+
+        try:
+            scanned = self._scan(target.connection, cache_ttl)
+        except Exception as exc:
+            target.last_error = getattr(exc, "detail", None) or str(exc) or type(exc).__name__
+            PREWARM_SCANS.inc(result="failed")
+        else:
+            if scanned:
+                target.last_error = None
+                target.last_scanned_at = time.time()
+                target.last_duration = target.last_scanned_at - started
+            PREWARM_SCANS.inc(result="completed" if scanned else "joined")
+        finally:
+            if not self._stopped.is_set():
+                self._schedule(index, max(next_scan_at, time.time()))
@@ -0,0 +1,84 @@
+"""Recent scan results per switch, and the scans still in flight, so requests for one switch share a single sweep"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from .jobs import ACTIVE_STATES, ScanJob
+from .metrics import SCAN_CACHE_REQUESTS
+from .models import SwitchConnection, SwitchResponse
+
+SCAN_CACHE_TTL = int(os.environ.get("SCAN_CACHE_TTL", 60))
+
+CacheKey = Tuple[str, str, str, str, Optional[int]]
+
+
+def ranking_source(connection: SwitchConnection, streamed: bool = False) -> str:
+    """The counters a scan ranks usage from: streams and counters collection rank from 'show interfaces counters',
+    other SSH scans from 'show interfaces' detail, and SNMP scans from IF-MIB"""
+    if connection.backend == "snmp":
+        return "snmp"
+    return "counters" if streamed or connection.collection == "counters" else "detail"
+
+
+def cache_key(connection: SwitchConnection, streamed: bool = False) -> CacheKey:
+    """Key a scan request by switch, the credentials that reach it, and the counters and usage window it is ranked
+    over.
+
+    Only requests made with the same switch credentials share a result, so nobody is shown a switch they could not
+    have scanned themselves. Scans ranked from different counters give different usage percentages, so they never
+    share one either.
+    """
+    if connection.backend == "snmp":
+        secret = connection.community or ""
+    else:
+        secret = f"{connection.username}\0{connection.password}"
+    fingerprint = hashlib.sha256(f"{connection.backend}\0{secret}".encode()).hexdigest()
+    return (connection.ip, connection.backend, fingerprint, ranking_source(connection, streamed),
+            connection.usage_window_days)
+
+
+class ScanCache:
+    """Completed results kept for ttl seconds (or as long as the scan that stored them asks), plus the job currently
+    scanning each key"""
+    def __init__(self, ttl: int = SCAN_CACHE_TTL):
+        self.ttl = ttl
+        # key -> (result, monotonic time it expires)
+        self._results: Dict[CacheKey, Tuple[SwitchResponse, float]] = {}
+        self._flights: Dict[CacheKey, ScanJob] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[SwitchResponse]:
+        """Get a result that has not expired"""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                return None
+            SCAN_CACHE_REQUESTS.inc(result="hit")
+            return entry[0]
+
+    def flight(self, key: CacheKey, start: Callable[[], ScanJob]) -> Tuple[ScanJob, bool]:
+        """Get the job already scanning key, or start one; returns (job, started)"""
+        with self._lock:
+            job = self._flights.get(key)
+            if job is not None and job.status in ACTIVE_STATES:
+                SCAN_CACHE_REQUESTS.inc(result="joined")
+                return job, False
+            # Started under the lock, so two requests arriving together cannot both start a scan
+            job = start()
+            self._flights[key] = job
+            SCAN_CACHE_REQUESTS.inc(result="miss")
+            return job, True
+
+    def store(self, key: CacheKey, result: SwitchResponse, ttl: Optional[float] = None) -> None:
+        """Keep a completed result for ttl seconds (default: the cache TTL), dropping any that have expired"""
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            for expired in [cached for cached, (_, expires_at) in self._results.items() if now >= expires_at]:
+                del self._results[expired]
+            for landed in [flight for flight, job in self._flights.items() if job.status not in ACTIVE_STATES]:
+                del self._flights[landed]
+            if ttl > 0:
+                self._results[key] = (result, now + ttl)
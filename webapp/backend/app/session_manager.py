@@ -1,38 +1,223 @@
 """Session manager for the application/switches"""
 
-from typing import Optional
-from netmiko import ConnectHandler, BaseConnection
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+from netmiko import ConnectHandler, BaseConnection, exceptions
 from fastapi import HTTPException
+from .metrics import CONNECT_DURATION, CONNECTION_FAILURES, SCAN_CHANNELS
+
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", 300))
+SESSION_KEEPALIVE_INTERVAL = int(os.environ.get("SESSION_KEEPALIVE_INTERVAL", 30))
+MAX_SESSIONS_PER_DEVICE = int(os.environ.get("MAX_SESSIONS_PER_DEVICE", 4))
+
+SessionKey = Tuple[str, str]
+
+
+@dataclass
+class PooledSession:
+    """A warm switch session owned by a single webapp user"""
+    connection: Optional[BaseConnection]
+    host: str
+    credentials: str
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _credential_fingerprint(username: str, password: str) -> str:
+    return hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
+
 
 class SessionManager:
-    """Manage the session for a switch"""
-    def __init__(self):
-        self._session: Optional[BaseConnection] = None
-
-    def create_session(self, host: str, username: str, password: str) -> BaseConnection:
-        """Create a new session for a switch"""
-        if self._session:
-            self.close_session()
-        
-        self._session = ConnectHandler(
+    """Manage a pool of switch sessions keyed by (user, switch)"""
+    def __init__(
+        self,
+        idle_timeout: int = SESSION_IDLE_TIMEOUT,
+        keepalive_interval: int = SESSION_KEEPALIVE_INTERVAL,
+        max_sessions_per_device: int = MAX_SESSIONS_PER_DEVICE,
+    ):
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.max_sessions_per_device = max_sessions_per_device
+        self._sessions: Dict[SessionKey, PooledSession] = {}
+        # Unpooled sessions open per host for multi-channel scans, counted against the device limit
+        self._channels: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._reaper = threading.Thread(target=self._maintain, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+    @contextmanager
+    def session(self, owner: str, host: str, username: str, password: str) -> Iterator[BaseConnection]:
+        """Check out a warm session for (owner, host), connecting only when none is usable"""
+        key = (owner, host)
+        credentials = _credential_fingerprint(username, password)
+
+        with self._lock:
+            pooled = self._sessions.get(key)
+            if pooled and pooled.credentials != credentials:
+                if pooled.lock.locked():
+                    raise HTTPException(status_code=409, detail=f"Session to {host} is busy")
+                self._discard(key)
+                pooled = None
+            if pooled is None:
+                self._reserve_device_slot(host)
+                pooled = PooledSession(connection=None, host=host, credentials=credentials)
+                self._sessions[key] = pooled
+
+        with pooled.lock:
+            try:
+                if pooled.connection is None or not pooled.connection.is_alive():
+                    if pooled.connection is not None:
+                        self._disconnect(pooled)
+                    pooled.connection = self._connect(host, username, password)
+                    with self._lock:
+                        self._sessions.setdefault(key, pooled)
+            except Exception:
+                self._drop(key, pooled)
+                raise
+
+            try:
+                yield pooled.connection
+            finally:
+                pooled.last_used = time.monotonic()
+                with self._lock:
+                    orphaned = self._sessions.get(key) is not pooled
+                if orphaned:
+                    self._disconnect(pooled)
+
+    @contextmanager
+    def channel(self, host: str, username: str, password: str) -> Iterator[BaseConnection]:
+        """Open an extra session to host for the length of one scan, closed afterwards rather than pooled.
+
+        Only a free device slot is used: warm sessions are never evicted to make room, so a busy switch answers 429.
+        """
+        with self._lock:
+            if self._device_sessions(host) >= self.max_sessions_per_device:
+                SCAN_CHANNELS.inc(result="refused")
+                raise HTTPException(status_code=429, detail=f"Too many active sessions to {host}")
+            self._channels[host] = self._channels.get(host, 0) + 1
+
+        try:
+            pooled = PooledSession(connection=self._connect(host, username, password), host=host, credentials="")
+            SCAN_CHANNELS.inc(result="opened")
+            try:
+                yield pooled.connection
+            finally:
+                self._disconnect(pooled)
+        finally:
+            with self._lock:
+                self._channels[host] -= 1
+                if not self._channels[host]:
+                    del self._channels[host]
+
+    def get_session(self, owner: str, host: str) -> BaseConnection:
+        """Get the current session for a user and switch"""
+        pooled = self._sessions.get((owner, host))
+        if not pooled or pooled.connection is None:
+            raise HTTPException(status_code=400, detail="No active session")
+        return pooled.connection
+
+    def close_session(self, owner: str, host: Optional[str] = None) -> None:
+        """Close a user's session to one switch, or all of the user's sessions"""
+        with self._lock:
+            keys = [key for key in self._sessions if key[0] == owner and host in (None, key[1])]
+            for key in keys:
+                self._discard(key)
+
+    def close_all(self) -> None:
+        """Stop the maintenance thread and close every pooled session"""
+        self._stopped.set()
+        with self._lock:
+            for key in list(self._sessions):
+                self._discard(key)
+
+    def active_sessions(self) -> int:
+        """Count the pooled sessions that are connected"""
+        with self._lock:
+            return sum(pooled.connection is not None for pooled in self._sessions.values())
+
+    def _connect(self, host: str, username: str, password: str) -> BaseConnection:
+        try:
+            with CONNECT_DURATION.time():
+                return self._open(host, username, password)
+        except exceptions.NetmikoAuthenticationException:
+            CONNECTION_FAILURES.inc(type="authentication")
+            raise
+        except exceptions.NetmikoTimeoutException:
+            CONNECTION_FAILURES.inc(type="timeout")
+            raise
+        except Exception:
+            CONNECTION_FAILURES.inc(type="other")
+            raise
+
+    def _open(self, host: str, username: str, password: str) -> BaseConnection:
+        return ConnectHandler(
             host=host,
             username=username,
             password=password,
-            device_type="cisco_ios"
+            device_type="cisco_ios",
+            keepalive=self.keepalive_interval
         )
-        return self._session
 
-    def get_session(self) -> BaseConnection:
-        """Get the current session"""
-        if not self._session:
-            raise HTTPException(status_code=400, detail="No active session")
-        return self._session
+    def _reserve_device_slot(self, host: str) -> None:
+        """Make room for one more session to host, evicting the stalest idle one if needed"""
+        if self._device_sessions(host) < self.max_sessions_per_device:
+            return
 
-    def close_session(self) -> None:
-        """Close the current session"""
-        if self._session:
-            try:
-                # Don't send logout command as it can hang
-                self._session.disconnect()
-            finally:
-                self._session = None
+        device_sessions = [(key, pooled) for key, pooled in self._sessions.items() if pooled.host == host]
+        for key, pooled in sorted(device_sessions, key=lambda item: item[1].last_used):
+            if not pooled.lock.locked():
+                self._discard(key)
+                return
+
+        raise HTTPException(status_code=429, detail=f"Too many active sessions to {host}")
+
+    def _device_sessions(self, host: str) -> int:
+        # Caller holds self._lock
+        return sum(pooled.host == host for pooled in self._sessions.values()) + self._channels.get(host, 0)
+
+    def _drop(self, key: SessionKey, pooled: PooledSession) -> None:
+        with self._lock:
+            if self._sessions.get(key) is pooled:
+                del self._sessions[key]
+        self._disconnect(pooled)
+
+    def _discard(self, key: SessionKey) -> None:
+        # Caller holds self._lock
+        pooled = self._sessions.pop(key, None)
+        if pooled:
+            self._disconnect(pooled)
+
+    @staticmethod
+    def _disconnect(pooled: PooledSession) -> None:
+        if pooled.connection is None:
+            return
+        try:
+            # Don't send logout command as it can hang
+            pooled.connection.disconnect()
+        except Exception:
+            pass
+
+    def _maintain(self) -> None:
+        """Evict idle sessions and keep the remaining ones alive"""
+        while not self._stopped.wait(self.keepalive_interval):
+            now = time.monotonic()
+            with self._lock:
+                pooled_items = list(self._sessions.items())
+
+            for key, pooled in pooled_items:
+                # Sessions checked out for a scan are left alone until the next pass
+                if not pooled.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if pooled.connection is None:
+                        continue
+                    if now - pooled.last_used > self.idle_timeout or not pooled.connection.is_alive():
+                        self._drop(key, pooled)
+                finally:
+                    pooled.lock.release()
@@ -1,7 +1,7 @@
 import { useState } from "react"
 import { ConnectionForm } from "@/components/ConnectionForm"
 import { SwitchInfo } from "@/components/SwitchInfo"
-import { DisconnectedPorts } from "@/components/DisconnectedPorts"
+import { DisconnectedPorts, PAGE_SIZE } from "@/components/DisconnectedPorts"
 import { PoEStatus } from "@/components/PoEStatus"
 import { useToast } from "@/hooks/use-toast"
 import { Toaster } from "@/components/ui/toaster"
@@ -11,6 +11,7 @@ import { AuthProvider, useAuth } from "@/contexts/AuthContext"
 import { LoginForm } from "@/components/LoginForm"
 import { ThemeProvider } from "./contexts/ThemeContext"
 import { ThemeToggle } from "./components/ThemeToggle"
+import { readScanEvents } from "@/lib/scan-stream"
 
 interface Port {
   port: string
@@ -32,7 +33,6 @@ interface PoEEntry {
 interface SwitchData {
   hostname: string
   uptime: string
-  disconnected_ports: Port[]
   poe_status: PoEEntry[] | null
   lowest_usage_interface: {
     interface: string
@@ -44,14 +44,20 @@ function AppContent() {
   const [isLoading, setIsLoading] = useState(false)
   const [switchData, setSwitchData] = useState<SwitchData | null>(null)
   const [connectedIp, setConnectedIp] = useState<string>("")
+  // Set once the scan has finished, so DisconnectedPorts can page through its ports
+  const [portsJobId, setPortsJobId] = useState<string | null>(null)
+  // The first page of ports streamed while the scan runs, and how many have arrived in all
+  const [streamedPorts, setStreamedPorts] = useState<{ items: Port[]; total: number }>({ items: [], total: 0 })
   const { toast } = useToast()
   const [isExporting, setIsExporting] = useState(false)
   const { isAuthenticated, token } = useAuth()
 
   const handleConnect = async (data: { ip: string; username: string; password: string }) => {
     setIsLoading(true)
+    setPortsJobId(null)
+    setStreamedPorts({ items: [], total: 0 })
     try {
-      const response = await fetch("http://localhost:8000/api/connect", {
+      const response = await fetch("http://localhost:8000/api/connect/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -64,13 +70,36 @@ function AppContent() {
         throw new Error(`Error: ${response.statusText}`)
       }
 
-      const result = await response.json()
-      setSwitchData(result)
-      setConnectedIp(data.ip)
-      toast({
-        title: "Connected successfully",
-        description: `Connected to ${result.hostname}`,
-      })
+      // Render the switch as soon as its details arrive and the first page of ports as they are parsed, then page
+      // through the finished scan
+      let jobId: string | null = null
+      for await (const { event, data: payload } of readScanEvents(response)) {
+        if (event === "switch") {
+          const { hostname, uptime, job_id } = payload as { hostname: string; uptime: string; job_id: string }
+          jobId = job_id
+          setSwitchData({ hostname, uptime, poe_status: null, lowest_usage_interface: null })
+          setConnectedIp(data.ip)
+          toast({
+            title: "Connected successfully",
+            description: `Connected to ${hostname}`,
+          })
+        } else if (event === "port") {
+          setStreamedPorts(current => ({
+            items: current.items.length < PAGE_SIZE ? [...current.items, payload as Port] : current.items,
+            total: current.total + 1,
+          }))
+        } else if (event === "poe") {
+          setSwitchData(current => current && { ...current, poe_status: payload as PoEEntry[] | null })
+        } else if (event === "lowest") {
+          setSwitchData(current => current && {
+            ...current,
+            lowest_usage_interface: payload as SwitchData["lowest_usage_interface"],
+          })
+        } else if (event === "error") {
+          throw new Error((payload as { detail: string }).detail)
+        }
+      }
+      setPortsJobId(jobId)
     } catch (error) {
       toast({
         variant: "destructive",
@@ -85,10 +114,17 @@ function AppContent() {
   const handleDisconnect = async () => {
     try {
       await fetch("http://localhost:8000/api/disconnect", {
-        method: "POST"
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "Authorization": `Bearer ${token}`,
+        },
+        body: JSON.stringify({ ip: connectedIp }),
       })
       setSwitchData(null)
       setConnectedIp("")
+      setPortsJobId(null)
+      setStreamedPorts({ items: [], total: 0 })
       toast({
         title: "Disconnected",
         description: "Successfully disconnected from switch"
@@ -103,10 +139,19 @@ function AppContent() {
   }
 
   const handleExport = async () => {
-    if (!switchData) return
+    if (!switchData || !portsJobId) return
 
     setIsExporting(true)
     try {
+      // The page on screen may be filtered, so export every port from the full result
+      const response = await fetch(`http://localhost:8000/api/jobs/${portsJobId}/result`, {
+        headers: { "Authorization": `Bearer ${token}` },
+      })
+      if (!response.ok) {
+        throw new Error(`Error: ${response.statusText}`)
+      }
+      const { disconnected_ports: ports } = await response.json() as { disconnected_ports: Port[] }
+
       const content = [
         "-".repeat(103),
         `PATCHFINDER RESULTS on hostname ${switchData.hostname}`,
@@ -118,7 +163,7 @@ function AppContent() {
         "Not-connect Interfaces:",
         "-".repeat(103),
         "Interface\tDescription\t\tVLAN\t\tLast Input\tPackets (in)\tPackets (out)\tPercent Use",
-        switchData.disconnected_ports.map(port => 
+        ports.map(port => 
           `${port.port.padEnd(10)}\t${port.description.padEnd(20)}\t${port.vlan.padEnd(8)}\t` +
           `${port.last_input.padEnd(12)}\t${port.input_packets.padEnd(12)}\t${port.output_packets.padEnd(12)}\t` +
           `${port.usage_percentage}%`
@@ -213,7 +258,7 @@ function AppContent() {
                   ip={connectedIp}
                 />
                 
-                <DisconnectedPorts ports={switchData.disconnected_ports} />
+                <DisconnectedPorts jobId={portsJobId} streamedPorts={streamedPorts} />
                 
                 {switchData.poe_status && (
                   <PoEStatus data={switchData.poe_status} />
@@ -1,7 +1,11 @@
-import { useState } from "react"
+import { useCallback, useEffect, useState } from "react"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { ArrowDown, ArrowUp } from "lucide-react"
 import { Button } from "@/components/ui/button"
+import { Input } from "@/components/ui/input"
+import { Label } from "@/components/ui/label"
+import { useAuth } from "@/contexts/AuthContext"
+import { useToast } from "@/hooks/use-toast"
 
 interface Port {
   port: string
@@ -13,14 +17,36 @@ interface Port {
   usage_percentage: number
 }
 
+interface PortPage {
+  items: Port[]
+  total: number
+  next_cursor: string | null
+}
+
 interface DisconnectedPortsProps {
-  ports: Port[]
+  // The scan job to page through, or null while the scan is still running
+  jobId: string | null
+  // Shown until jobId is set: the first page of ports streamed so far, in scan order, and how many have arrived
+  streamedPorts: { items: Port[]; total: number }
 }
 
-type SortKey = 'port' | 'usage_percentage'  // Limit sort keys
+type SortKey = 'port' | 'vlan' | 'last_input' | 'usage_percentage'
 type SortDirection = 'asc' | 'desc'
 
-export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
+export const PAGE_SIZE = 50
+
+const SORT_LABELS: Record<SortKey, string> = {
+  port: 'Port',
+  vlan: 'VLAN',
+  last_input: 'Last Input',
+  usage_percentage: 'Usage',
+}
+
+const NO_FILTERS = { vlan: "", description: "", maxUsage: "", minIdleDays: "" }
+
+export function DisconnectedPorts({ jobId, streamedPorts }: DisconnectedPortsProps) {
+  const { token } = useAuth()
+  const { toast } = useToast()
   const [sortConfig, setSortConfig] = useState<{
     key: SortKey
     direction: SortDirection
@@ -28,22 +54,80 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
     key: 'port',
     direction: 'asc'
   })
+  const [filterForm, setFilterForm] = useState(NO_FILTERS)
+  const [filters, setFilters] = useState(NO_FILTERS)
+  const [ports, setPorts] = useState<Port[]>([])
+  const [total, setTotal] = useState(0)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoading, setIsLoading] = useState(false)
+
+  // The backend filters, sorts and pages the scan, so only the rows on screen are sent
+  const fetchPage = useCallback(async (cursor: string | null): Promise<PortPage> => {
+    const params = new URLSearchParams({
+      sort: sortConfig.key,
+      order: sortConfig.direction,
+      limit: String(PAGE_SIZE),
+    })
+    if (filters.vlan) params.set("vlan", filters.vlan)
+    if (filters.description) params.set("description", filters.description)
+    if (filters.maxUsage) params.set("max_usage", filters.maxUsage)
+    if (filters.minIdleDays) params.set("min_idle_days", filters.minIdleDays)
+    if (cursor) params.set("cursor", cursor)
 
-  const sortedPorts = [...ports].sort((a, b) => {
-    if (sortConfig.key === 'usage_percentage') {
-      return sortConfig.direction === 'asc' 
-        ? a[sortConfig.key] - b[sortConfig.key]
-        : b[sortConfig.key] - a[sortConfig.key]
+    const response = await fetch(`http://localhost:8000/api/jobs/${jobId}/ports?${params}`, {
+      headers: { "Authorization": `Bearer ${token}` },
+    })
+    if (!response.ok) {
+      throw new Error(`Error: ${response.statusText}`)
     }
+    return response.json()
+  }, [jobId, token, sortConfig, filters])
+
+  const showPage = useCallback((page: PortPage, append: boolean) => {
+    setPorts(current => append ? [...current, ...page.items] : page.items)
+    setTotal(page.total)
+    setNextCursor(page.next_cursor)
+  }, [])
 
-    const aValue = String(a[sortConfig.key]).toLowerCase()
-    const bValue = String(b[sortConfig.key]).toLowerCase()
+  const showError = useCallback((error: unknown) => {
+    toast({
+      variant: "destructive",
+      title: "Failed to load ports",
+      description: error instanceof Error ? error.message : "Unknown error occurred",
+    })
+  }, [toast])
 
-    if (sortConfig.direction === 'asc') {
-      return aValue.localeCompare(bValue)
+  // Start again from the first page whenever the scan, sort order or filters change
+  useEffect(() => {
+    if (!jobId) {
+      showPage({ items: [], total: 0, next_cursor: null }, false)
+      return
     }
-    return bValue.localeCompare(aValue)
-  })
+
+    let cancelled = false
+    setIsLoading(true)
+    fetchPage(null)
+      .then(page => { if (!cancelled) showPage(page, false) })
+      .catch(error => { if (!cancelled) showError(error) })
+      .finally(() => { if (!cancelled) setIsLoading(false) })
+    return () => { cancelled = true }
+  }, [jobId, fetchPage, showPage, showError])
+
+  const loadMore = async () => {
+    setIsLoading(true)
+    try {
+      showPage(await fetchPage(nextCursor), true)
+    } catch (error) {
+      showError(error)
+    } finally {
+      setIsLoading(false)
+    }
+  }
+
+  const applyFilters = (e: React.FormEvent) => {
+    e.preventDefault()
+    setFilters(filterForm)
+  }
 
   const requestSort = (key: SortKey) => {
     setSortConfig(current => ({
@@ -59,9 +143,9 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
       className="h-8 px-2 lg:px-3"
       onClick={() => requestSort(column)}
     >
-      {column === 'port' ? 'Port' : 'Usage'}
+      {SORT_LABELS[column]}
       {sortConfig.key === column && (
-        sortConfig.direction === 'asc' 
+        sortConfig.direction === 'asc'
           ? <ArrowUp className="ml-2 h-4 w-4" />
           : <ArrowDown className="ml-2 h-4 w-4" />
       )}
@@ -71,9 +155,54 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
   return (
     <Card>
       <CardHeader>
-        <CardTitle>Disconnected Ports</CardTitle>
+        <CardTitle>
+          Disconnected Ports{jobId ? ` (${total})` : streamedPorts.total > 0 && ` (${streamedPorts.total} so far)`}
+        </CardTitle>
       </CardHeader>
-      <CardContent>
+      <CardContent className="space-y-4">
+        <form onSubmit={applyFilters} className="grid grid-cols-2 gap-4 md:grid-cols-5 items-end">
+          <div className="space-y-2">
+            <Label htmlFor="filter-vlan">VLAN</Label>
+            <Input
+              id="filter-vlan"
+              value={filterForm.vlan}
+              onChange={(e) => setFilterForm({ ...filterForm, vlan: e.target.value })}
+            />
+          </div>
+          <div className="space-y-2">
+            <Label htmlFor="filter-description">Description</Label>
+            <Input
+              id="filter-description"
+              value={filterForm.description}
+              onChange={(e) => setFilterForm({ ...filterForm, description: e.target.value })}
+            />
+          </div>
+          <div className="space-y-2">
+            <Label htmlFor="filter-usage">Max usage %</Label>
+            <Input
+              id="filter-usage"
+              type="number"
+              min="0"
+              step="any"
+              value={filterForm.maxUsage}
+              onChange={(e) => setFilterForm({ ...filterForm, maxUsage: e.target.value })}
+            />
+          </div>
+          <div className="space-y-2">
+            <Label htmlFor="filter-idle">Idle for days</Label>
+            <Input
+              id="filter-idle"
+              type="number"
+              min="0"
+              step="any"
+              value={filterForm.minIdleDays}
+              onChange={(e) => setFilterForm({ ...filterForm, minIdleDays: e.target.value })}
+            />
+          </div>
+          <Button type="submit" disabled={!jobId}>
+            Filter
+          </Button>
+        </form>
         <div className="rounded-md border">
           <div className="w-full overflow-auto">
             <table className="w-full caption-bottom text-sm">
@@ -86,10 +215,10 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
                     Description
                   </th>
                   <th className="h-12 px-4 text-left align-middle font-medium">
-                    VLAN
+                    <SortButton column="vlan" />
                   </th>
                   <th className="h-12 px-4 text-left align-middle font-medium">
-                    Last Input
+                    <SortButton column="last_input" />
                   </th>
                   <th className="h-12 px-4 text-left align-middle font-medium">
                     Input Packets
@@ -103,9 +232,9 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
                 </tr>
               </thead>
               <tbody>
-                {sortedPorts.map((port, i) => (
+                {(jobId ? ports : streamedPorts.items).map((port) => (
                   <tr
-                    key={port.port + i}
+                    key={port.port}
                     className="border-b transition-colors hover:bg-muted/50"
                   >
                     <td className="p-4 align-middle font-mono">{port.port}</td>
@@ -121,7 +250,15 @@ export function DisconnectedPorts({ ports }: DisconnectedPortsProps) {
             </table>
           </div>
         </div>
+        {!jobId && (
+          <p className="text-sm text-muted-foreground">Collecting ports...</p>
+        )}
+        {nextCursor && (
+          <Button variant="outline" className="w-full" onClick={loadMore} disabled={isLoading}>
+            {isLoading ? "Loading..." : `Show more (${ports.length} of ${total})`}
+          </Button>
+        )}
       </CardContent>
     </Card>
   )
-} 
\ No newline at end of file
+}
@@ -0,0 +1,42 @@
+export interface ScanEvent {
+  event: string
+  data: unknown
+}
+
+function parseEvent(block: string): ScanEvent | null {
+  let event = "message"
+  const data: string[] = []
+
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) {
+      event = line.slice(6).trim()
+    } else if (line.startsWith("data:")) {
+      data.push(line.slice(5).trimStart())
+    }
+  }
+
+  return data.length ? { event, data: JSON.parse(data.join("\n")) } : null
+}
+
+export async function* readScanEvents(response: Response): AsyncGenerator<ScanEvent> {
+  if (!response.body) {
+    throw new Error("Scan stream has no body")
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+  let buffer = ""
+
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+
+    buffer += value.replace(/\r\n?/g, "\n")
+    let boundary = buffer.indexOf("\n\n")
+    while (boundary !== -1) {
+      const parsed = parseEvent(buffer.slice(0, boundary))
+      buffer = buffer.slice(boundary + 2)
+      if (parsed) yield parsed
+      boundary = buffer.indexOf("\n\n")
+    }
+  }
+}